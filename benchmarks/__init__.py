@@ -0,0 +1,5 @@
+"""
+Benchmarks for the habit tracker's hot paths.
+
+Run the suite from the project directory with ``python -m benchmarks``.
+"""
@@ -0,0 +1,75 @@
+"""
+Measures the memory held per habit object, by habit type.
+
+Habits are created with an empty completion history, so the numbers show the
+fixed per-object overhead. Every habit gets its own schedule list, as when
+habits are loaded from a file. Run from the project directory:
+
+    python -m benchmarks.memory --habits 100000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from datetime import datetime
+
+from benchmarks.population import MONTHLY_SCHEDULES, WEEKLY_SCHEDULES
+from src.DailyHabit import DailyHabit
+from src.WeeklyHabit import WeeklyHabit
+from src.MonthlyHabit import MonthlyHabit
+
+
+def factories():
+    """
+    Returns one habit factory per habit type.
+
+    Returns:
+        list: ``(type name, callable(index))`` pairs.
+    """
+    start_date = datetime(2024, 1, 1)
+    return [
+        ('DailyHabit', lambda index: DailyHabit('Habit', start_date)),
+        ('WeeklyHabit', lambda index: WeeklyHabit('Habit', start_date, list(WEEKLY_SCHEDULES[index % len(WEEKLY_SCHEDULES)]))),
+        ('MonthlyHabit', lambda index: MonthlyHabit('Habit', start_date, list(MONTHLY_SCHEDULES[index % len(MONTHLY_SCHEDULES)]))),
+    ]
+
+
+def bytes_per_habit(factory, count):
+    """
+    Returns the mean number of bytes allocated and kept per habit created by a factory.
+
+    Args:
+        factory (callable): Called with the index of each habit.
+        count (int): Number of habits to create.
+
+    Returns:
+        float: Bytes per habit.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        habits = [factory(index) for index in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # The list holding the habits is not part of their overhead.
+    return (after - before - habits.__sizeof__()) / count
+
+
+def run(count):
+    """
+    Measures every habit type.
+
+    Returns:
+        dict: Bytes per habit, per type name.
+    """
+    return {name: bytes_per_habit(factory, count) for name, factory in factories()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--habits', type=int, default=100000)
+    arguments = parser.parse_args()
+    for name, size in run(arguments.habits).items():
+        print('{:<14} {:>8.1f} bytes/habit'.format(name, size))
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import numpy as np
+
+from src.CompletionBitmap import CompletionBitmap
+from src.DailyHabit import DailyHabit
+from src.WeeklyHabit import WeeklyHabit
+from src.MonthlyHabit import MonthlyHabit
+from src.schedule_index import days_of_month, weekdays_of
+
+# Schedules are drawn from a small set, as in real data where most users pick the same few.
+WEEKLY_SCHEDULES = [[0], [0, 2], [0, 2, 4], [1, 3], [5, 6]]
+MONTHLY_SCHEDULES = [[1], [1, 15], [5, 20], [10], [28]]
+
+
+def generate_population(daily=600, weekly=250, monthly=150, days=365, density=0.7, seed=0,
+                        start_date=datetime(2023, 1, 1), block_size=10000):
+    """
+    Generates a reproducible synthetic population of habits with completion history.
+
+    Every habit starts on ``start_date`` and is completed on each of its due
+    days in the following ``days`` days with probability ``density``. The same
+    arguments always produce the same population.
+
+    Args:
+        daily (int): Number of DailyHabit objects.
+        weekly (int): Number of WeeklyHabit objects.
+        monthly (int): Number of MonthlyHabit objects.
+        days (int): Length of the completion history in days.
+        density (float): Probability that a due day is completed.
+        seed (int): Random seed.
+        start_date (datetime): Start date of every habit.
+        block_size (int): Number of habits whose history is drawn at once.
+
+    Returns:
+        list: The habits, daily first, then weekly, then monthly.
+    """
+    generator = np.random.default_rng(seed)
+    origin = start_date.toordinal()
+    ordinals = np.arange(origin, origin + days)
+    weekdays, month_days = weekdays_of(ordinals), days_of_month(ordinals)
+
+    habits = []
+    kinds = [('Daily', daily, None), ('Weekly', weekly, WEEKLY_SCHEDULES), ('Monthly', monthly, MONTHLY_SCHEDULES)]
+    for kind, count, schedules in kinds:
+        schedule_choice = generator.integers(len(schedules), size=count) if schedules else None
+        for block in range(0, count, block_size):
+            size = min(block_size, count - block)
+            completed = generator.random((size, days)) < density
+            if kind == 'Weekly':
+                due = np.array([np.isin(weekdays, schedule) for schedule in schedules])
+                completed &= due[schedule_choice[block:block + size]]
+            elif kind == 'Monthly':
+                due = np.array([np.isin(month_days, schedule) for schedule in schedules])
+                completed &= due[schedule_choice[block:block + size]]
+            packed = np.packbits(completed, axis=1, bitorder='little')
+
+            for row in range(size):
+                number = block + row
+                name = '{} {}'.format(kind, number)
+                if kind == 'Weekly':
+                    habit = WeeklyHabit(name, start_date, list(schedules[schedule_choice[number]]))
+                elif kind == 'Monthly':
+                    habit = MonthlyHabit(name, start_date, list(schedules[schedule_choice[number]]))
+                else:
+                    habit = DailyHabit(name, start_date)
+                habit.completed_dates = CompletionBitmap.from_bytes(origin, packed[row].tobytes())
+                habits.append(habit)
+    return habits
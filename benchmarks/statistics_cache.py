@@ -0,0 +1,75 @@
+"""
+Compares recomputing the statistics view from scratch with HabitStatistics.
+
+Each round marks one habit as completed and then reads every aggregate shown
+by ``show_statistics``. Run from the project directory:
+
+    python -m benchmarks.statistics_cache --habits 10000 --rounds 50
+"""
+import argparse
+import random
+import time
+
+from datetime import datetime, timedelta
+
+from benchmarks.population import generate_population
+from src.DailyHabit import DailyHabit
+from src.habit_statistics import HabitStatistics
+from src.statistics_1 import (all_habits, create_dataframe_of_habit, current_daily_habits,
+                              daily_habits_longest_streak, habits_with_same_frequency)
+
+
+def read_from_scratch(habits):
+    daily_habits_longest_streak(habits)
+    current_daily_habits(habits)
+    all_habits(habits)
+    habits_with_same_frequency(habits, DailyHabit)
+    create_dataframe_of_habit(habits)
+
+
+def read_incrementally(statistics):
+    statistics.daily_habits_longest_streak()
+    statistics.current_daily_habits()
+    statistics.all_habits()
+    statistics.habits_with_same_frequency(DailyHabit)
+    statistics.dataframe()
+
+
+def run(habit_count, rounds, days=365, seed=0):
+    """
+    Times both strategies for the same sequence of single-habit mutations.
+
+    Returns:
+        dict: Mean seconds per round for each strategy.
+    """
+    habits = generate_population(daily=habit_count // 2, weekly=habit_count - habit_count // 2, monthly=0,
+                                 days=days, density=0.6, seed=seed, start_date=datetime(2024, 1, 1))
+    daily_habits = [habit for habit in habits if isinstance(habit, DailyHabit)]
+    generator = random.Random(seed)
+    mutation_days = [datetime(2024, 1, 1) + timedelta(days=generator.randrange(days)) for _ in range(rounds)]
+
+    started = time.perf_counter()
+    for day in mutation_days:
+        generator.choice(daily_habits).mark_as_completed(day)
+        read_from_scratch(habits)
+    from_scratch = (time.perf_counter() - started) / rounds
+
+    statistics = HabitStatistics(habits)
+    read_incrementally(statistics)
+    started = time.perf_counter()
+    for day in mutation_days:
+        generator.choice(daily_habits).mark_as_incomplete(day)
+        read_incrementally(statistics)
+    incremental = (time.perf_counter() - started) / rounds
+
+    return {'habits': habit_count, 'from_scratch': from_scratch, 'incremental': incremental}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--habits', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--rounds', type=int, default=20)
+    arguments = parser.parse_args()
+    for count in arguments.habits:
+        result = run(count, arguments.rounds)
+        print('{habits:>8} habits: from scratch {from_scratch:.6f}s/round, incremental {incremental:.6f}s/round'.format(**result))
@@ -0,0 +1,226 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import timedelta
+
+from benchmarks.population import generate_population
+from src.habit_tracker import load_habits_from_json_file, save_habits_to_json_file
+from src.statistics_1 import (create_dataframe_of_habit, daily_habits_longest_streak,
+                              find_habits_strugled_last_month, find_longest_run_streak_among_all_habits)
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+
+def benchmark_cases(habits, filename, today=None):
+    """
+    Returns the benchmarked operations for one population.
+
+    Args:
+        habits (list): The population.
+        filename (str): Scratch JSON file used by the save and load cases.
+        today (datetime, optional): Reference date of the struggle report. Defaults to the current date.
+
+    Returns:
+        list: ``(name, callable)`` pairs, in execution order.
+    """
+    return [
+        ('save_habits_to_json_file', lambda: save_habits_to_json_file(habits, filename)),
+        ('load_habits_from_json_file', lambda: load_habits_from_json_file(filename)),
+        ('save_habits_to_json_file_compact', lambda: save_habits_to_json_file(habits, filename, compact=True)),
+        ('load_habits_from_json_file_compact', lambda: load_habits_from_json_file(filename)),
+        ('daily_habits_longest_streak', lambda: daily_habits_longest_streak(habits)),
+        ('find_longest_run_streak_among_all_habits', lambda: find_longest_run_streak_among_all_habits(habits)),
+        ('create_dataframe_of_habit', lambda: create_dataframe_of_habit(habits)),
+        ('find_habits_strugled_last_month', lambda: find_habits_strugled_last_month(habits, today)),
+    ]
+
+
+def measure(function, trace_memory=True, repeat=5, warmup=1, min_time=1.0):
+    """
+    Measures the wall time and, optionally, the peak traced memory of an operation.
+
+    The operation first runs ``warmup`` times untimed, which keeps one-time
+    costs such as deferred imports and cold caches out of the timings, then
+    ``repeat`` times timed, and more until the timed runs add up to
+    ``min_time`` seconds, so fast cases get enough samples. The median run is
+    reported as the wall time: it is far more stable between processes than
+    a single call or the fastest run. ``spread`` is the interquartile range
+    of the runs relative to the median, a measure of the noise. The peak
+    memory comes from one more, traced call, since tracing slows Python down.
+
+    Args:
+        function (callable): The operation to measure.
+        trace_memory (bool): Whether to measure peak memory.
+        repeat (int): Minimum number of timed runs.
+        warmup (int): Number of untimed runs before them.
+        min_time (float): Seconds the timed runs last at least, in total.
+
+    Returns:
+        dict: ``seconds`` (median run), ``min_seconds``, ``runs``, ``spread`` and
+        ``peak_bytes`` (None when not traced), or ``error``.
+    """
+    timings = []
+    try:
+        for _ in range(warmup):
+            function()
+        while len(timings) < max(repeat, 1) or sum(timings) < min_time:
+            gc.collect()
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+    except Exception as error:
+        return {'error': '{}: {}'.format(type(error).__name__, error)}
+
+    seconds = statistics.median(timings)
+    spread = 0.0
+    if len(timings) > 1 and seconds:
+        quartiles = statistics.quantiles(timings, n=4)
+        spread = (quartiles[2] - quartiles[0]) / seconds
+
+    peak_bytes = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'min_seconds': min(timings), 'runs': len(timings), 'spread': spread,
+            'peak_bytes': peak_bytes}
+
+
+def run_suite(sizes=DEFAULT_SIZES, days=365, density=0.7, seed=0, trace_memory=True, log=print, repeat=5):
+    """
+    Runs every benchmark case for populations of the given sizes.
+
+    Populations are split into 60% daily, 25% weekly and 15% monthly habits.
+
+    Args:
+        sizes (list): Numbers of habits.
+        days (int): Length of the completion history in days.
+        density (float): Probability that a due day is completed.
+        seed (int): Random seed of the population generator.
+        trace_memory (bool): Whether to measure peak memory.
+        log (callable): Called with a progress line after each case, or None.
+        repeat (int): Minimum number of timed runs of every case, after one warm-up run.
+
+    Returns:
+        dict: The results document, with ``meta`` and ``results`` entries.
+    """
+    results = []
+    for size in sizes:
+        weekly, monthly = size * 25 // 100, size * 15 // 100
+        habits = generate_population(size - weekly - monthly, weekly, monthly, days, density, seed)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'habits.json')
+            # Report on the last month of the generated history.
+            today = habits[0].start_date + timedelta(days=days) if habits else None
+            for name, function in benchmark_cases(habits, filename, today):
+                result = dict(size=size, case=name, **measure(function, trace_memory, repeat))
+                results.append(result)
+                if log:
+                    log(format_result(result))
+        del habits
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'days': days,
+            'density': density,
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def format_result(result):
+    """
+    Formats one benchmark result as a line of text.
+    """
+    if 'error' in result:
+        return '{size:>9} {case:<42} error: {error}'.format(**result)
+    peak = '' if result['peak_bytes'] is None else '{:>10.1f} MiB'.format(result['peak_bytes'] / 2 ** 20)
+    return '{:>9} {:<42} {:>10.4f} s \u00b1{:>4.0%} {}'.format(result['size'], result['case'], result['seconds'],
+                                                          result['spread'], peak).rstrip()
+
+
+def compare_results(current, baseline, threshold=0.25):
+    """
+    Compares a results document against a baseline and lists the regressions.
+
+    A case regresses when it uses more than ``1 + threshold`` times the
+    baseline peak memory, when its median wall time grows by more than
+    ``threshold`` plus the larger ``spread`` of the two measurements, or when
+    it fails but did not before. Identical runs of the median timings differ
+    by up to about 20% on a busy machine, so the default threshold stays above
+    that and noisy measurements are given their own noise on top.
+
+    Args:
+        current (dict): The new results document.
+        baseline (dict): The baseline results document.
+        threshold (float): Allowed relative slowdown or memory growth.
+
+    Returns:
+        list: Human-readable descriptions of the regressions.
+    """
+    reference = {(result['size'], result['case']): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = reference.get((result['size'], result['case']))
+        if old is None or 'error' in old:
+            continue
+        label = '{} habits, {}'.format(result['size'], result['case'])
+        if 'error' in result:
+            regressions.append('{}: now fails ({})'.format(label, result['error']))
+            continue
+        noise = max(result.get('spread') or 0.0, old.get('spread') or 0.0)
+        for key, unit, allowed in (('seconds', 's', threshold + noise), ('peak_bytes', 'B', threshold)):
+            if result.get(key) is not None and old.get(key) and result[key] > old[key] * (1 + allowed):
+                regressions.append('{}: {} {:.4g}{} -> {:.4g}{} (+{:.0%})'.format(
+                    label, key, old[key], unit, result[key], unit, result[key] / old[key] - 1))
+    return regressions
+
+
+def main(arguments=None):
+    """
+    Command line entry point of ``python -m benchmarks``.
+
+    Returns:
+        int: Exit status, 1 when regressions against the baseline were found.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks the habit tracker hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of habits')
+    parser.add_argument('--days', type=int, default=365, help='length of the completion history')
+    parser.add_argument('--density', type=float, default=0.7, help='probability that a due day is completed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurement')
+    parser.add_argument('--output', default='benchmark_results.json', help='file the results are written to')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression')
+    parser.add_argument('--repeat', type=int, default=5, help='minimum number of timed runs of every case')
+    arguments = parser.parse_args(arguments)
+
+    results = run_suite(arguments.sizes, arguments.days, arguments.density, arguments.seed, not arguments.no_memory,
+                        repeat=arguments.repeat)
+    with open(arguments.output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare_results(results, json.load(file), arguments.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
@@ -0,0 +1,221 @@
+from collections.abc import MutableSet
+from datetime import date
+
+import numpy as np
+
+# Number of set bits for every possible byte value, used with bytes.translate
+# to count completions a whole byte at a time.
+_POPCOUNT_TABLE = bytes(bin(value).count('1') for value in range(256))
+
+
+class CompletionBitmap(MutableSet):
+    """
+    Stores the completion dates of a habit as a bit array indexed by day offset.
+
+    Bit ``i`` is set when the habit was completed on the day with ordinal
+    ``origin + i``. The origin is normally the habit's start date and is moved
+    back in whole bytes if an earlier date is added, so any date can be stored.
+
+    Attributes:
+        origin (int): Day ordinal of the first bit.
+        data (bytearray): The bit array, least significant bit first.
+        modifications (int): Number of changes made through the bitmap's
+            methods, so caches derived from it can tell when they are stale.
+
+    Methods:
+        add(day): Marks the given date as completed.
+        discard(day): Marks the given date as not completed.
+        add_ordinals(ordinals): Marks many day ordinals as completed at once.
+        count_range(first_day, last_day): Counts completions between two dates (inclusive).
+        ordinals(): Returns the ordinals of all completed days in ascending order.
+    """
+
+    __slots__ = ('origin', 'data', 'modifications')
+
+    def __init__(self, origin, dates=()):
+        """
+        Initializes a CompletionBitmap.
+
+        Args:
+            origin (date): The date (or datetime) corresponding to the first bit.
+            dates (iterable): Dates to mark as completed initially.
+        """
+        self.origin = origin.toordinal()
+        self.data = bytearray()
+        self.modifications = 0
+        for day in dates:
+            self.add(day)
+
+    @classmethod
+    def from_bytes(cls, origin, data):
+        """
+        Creates a bitmap from an already packed bit array.
+
+        Args:
+            origin (int): Day ordinal of the first bit.
+            data (bytes): The packed bits, least significant bit first.
+
+        Returns:
+            CompletionBitmap: The new bitmap.
+        """
+        bitmap = cls.__new__(cls)
+        bitmap.origin = origin
+        bitmap.data = bytearray(data)
+        bitmap.modifications = 0
+        return bitmap
+
+    def _offset(self, ordinal):
+        """
+        Returns the bit offset of a day ordinal, growing the array to cover it if needed.
+        """
+        offset = ordinal - self.origin
+        if offset < 0:
+            grow = (-offset + 7) // 8
+            self.data[:0] = bytes(grow)
+            self.origin -= grow * 8
+            offset += grow * 8
+        index = offset >> 3
+        if index >= len(self.data):
+            self.data.extend(bytes(index - len(self.data) + 1))
+        return offset
+
+    def add_ordinal(self, ordinal):
+        """
+        Marks the day with the given ordinal as completed.
+
+        Args:
+            ordinal (int): The day ordinal.
+        """
+        offset = self._offset(ordinal)
+        self.data[offset >> 3] |= 1 << (offset & 7)
+        self.modifications += 1
+
+    def add_ordinals(self, ordinals):
+        """
+        Marks many days as completed with one vectorized update.
+
+        Args:
+            ordinals (np.ndarray): Day ordinals to set. Must not be empty.
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        # Covering the extreme days first grows the array to the whole range.
+        self._offset(int(ordinals.min()))
+        self._offset(int(ordinals.max()))
+
+        bits = np.zeros(len(self.data) * 8, dtype=np.uint8)
+        bits[ordinals - self.origin] = 1
+        view = np.frombuffer(self.data, dtype=np.uint8)
+        view |= np.packbits(bits, bitorder='little')
+        del view
+        self.modifications += 1
+
+    def discard_ordinal(self, ordinal):
+        """
+        Marks the day with the given ordinal as not completed.
+
+        Args:
+            ordinal (int): The day ordinal.
+        """
+        offset = ordinal - self.origin
+        if 0 <= offset < len(self.data) * 8:
+            self.data[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+        self.modifications += 1
+
+    def contains_ordinal(self, ordinal):
+        """
+        Checks whether the day with the given ordinal is completed.
+
+        Args:
+            ordinal (int): The day ordinal.
+
+        Returns:
+            bool: True if the day is marked as completed.
+        """
+        offset = ordinal - self.origin
+        if 0 <= offset < len(self.data) * 8:
+            return bool(self.data[offset >> 3] & (1 << (offset & 7)))
+        return False
+
+    def add(self, day):
+        """
+        Marks the given date as completed.
+
+        Args:
+            day (date): The completed date. A datetime is reduced to its date.
+        """
+        self.add_ordinal(day.toordinal())
+
+    def discard(self, day):
+        """
+        Marks the given date as not completed. Unknown dates are ignored.
+
+        Args:
+            day (date): The date to clear.
+        """
+        self.discard_ordinal(day.toordinal())
+
+    def __contains__(self, day):
+        if not isinstance(day, date):
+            return False
+        return self.contains_ordinal(day.toordinal())
+
+    def __len__(self):
+        return sum(self.data.translate(_POPCOUNT_TABLE))
+
+    def __iter__(self):
+        for ordinal in self.ordinals():
+            yield date.fromordinal(ordinal)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, sorted(self))
+
+    def ordinals(self):
+        """
+        Returns the ordinals of all completed days in ascending order.
+
+        Returns:
+            list: Day ordinals of the completed days.
+        """
+        ordinals = []
+        base = self.origin
+        for index, byte in enumerate(self.data):
+            while byte:
+                low_bit = byte & -byte
+                ordinals.append(base + (index << 3) + low_bit.bit_length() - 1)
+                byte ^= low_bit
+        return ordinals
+
+    def count_range(self, first_day, last_day):
+        """
+        Counts the completed days between two dates, both inclusive.
+
+        Args:
+            first_day (date): The first date of the range.
+            last_day (date): The last date of the range.
+
+        Returns:
+            int: Number of completed days in the range.
+        """
+        first = max(first_day.toordinal() - self.origin, 0)
+        last = min(last_day.toordinal() - self.origin, len(self.data) * 8 - 1)
+        if first > last:
+            return 0
+
+        first_byte, last_byte = first >> 3, last >> 3
+        if first_byte == last_byte:
+            mask = (0xFF << (first & 7)) & (0xFF >> (7 - (last & 7)))
+            return _POPCOUNT_TABLE[self.data[first_byte] & mask]
+
+        count = _POPCOUNT_TABLE[self.data[first_byte] & (0xFF << (first & 7)) & 0xFF]
+        count += sum(self.data[first_byte + 1:last_byte].translate(_POPCOUNT_TABLE))
+        count += _POPCOUNT_TABLE[self.data[last_byte] & (0xFF >> (7 - (last & 7)))]
+        return count
+
+    def clear(self):
+        self.data = bytearray()
+        self.modifications += 1
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # Set operators such as ``&`` and ``|`` return plain sets of dates.
+        return set(iterable)
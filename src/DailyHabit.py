@@ -1,5 +1,10 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from src.Habit import Habit
+from src.RunIntervals import RunIntervals
+from src.streak_engine import completion_runs
+
+# Changes to more days than this rebuild the runs instead of merging each day.
+REBUILD_THRESHOLD = 64
 
 class DailyHabit(Habit):
     """
@@ -9,26 +14,88 @@ class DailyHabit(Habit):
         name (str): The name of the habit.
         start_date (datetime): The start date of the habit.
         end_date (datetime): The end date of the habit.
-        streak_count (int): The current streak count of consecutive completions.
+        streak_count (int): The length of the latest run of consecutive completed days.
+        runs (RunIntervals): The runs of consecutive completed days.
 
     Methods:
         calculate_end_date(start_date, frequency): Calculates the end date of the daily habit based on the start date and frequency.
         mark_completed(completion_date=None): Marks the habit as completed for the specified date.
+        current_streak(today=None): Gets the length of the run reaching today or yesterday.
+        longest_streak(): Gets the length of the longest run.
+        streak_history(): Gets every run of consecutive completed days.
         check_streak(target_streak): Checks if the habit has a streak of at least the specified number of consecutive days.
         get_streak_count(): Gets the current streak count of the habit.
+        schedule_key(): Returns the schedule key of the habit, which is due every day.
     """
 
+    # _runs caches the RunIntervals of _runs_bitmap, the completions it was built
+    # from, as of the bitmap's _runs_modifications-th change.
+    __slots__ = ('_runs', '_runs_bitmap', '_runs_modifications')
+
     def __init__(self, name, start_date):
         """
         Initializes a DailyHabit object.
 
+        The end date is calculated by Habit with a frequency of 1 (daily).
+
         Args:
             name (str): The name of the habit.
             start_date (datetime): The start date of the habit.
         """
         super().__init__(name, start_date)
-        self.streak_counter = 0
-        self.calculate_end_date(start_date, frequency=1)  # Assuming frequency is 1 (daily)
+        self._runs = None
+        self._runs_bitmap = None
+        self._runs_modifications = 0
+
+    @property
+    def runs(self):
+        """
+        RunIntervals: The runs of consecutive completed days.
+
+        Built from the completion dates on first access and kept up to date by
+        the marking methods. Assigning ``completed_dates`` or changing it
+        directly rebuilds it.
+        """
+        completed_dates = self.completed_dates
+        if self._runs_bitmap is not completed_dates or self._runs_modifications != completed_dates.modifications:
+            first_days, lengths, _ = completion_runs([self])
+            self._runs = RunIntervals(zip(first_days.tolist(), lengths.tolist()))
+            self._runs_bitmap = completed_dates
+            self._runs_modifications = completed_dates.modifications
+        return self._runs
+
+    def _completions_changed(self, ordinals, completed):
+        """
+        Applies completion changes to the runs, then updates the streak count and the end date.
+
+        The streak count is the length of the latest run and the end date
+        moves to the last day of that run when it is later.
+
+        Args:
+            ordinals (list): Day ordinals of the changed days.
+            completed (bool): True if the days were marked as completed, False if as incomplete.
+        """
+        # The marking methods change the bitmap once; the runs can follow that
+        # change only if they matched the bitmap before it.
+        bitmap = self._completed_dates
+        if self._runs_bitmap is bitmap and self._runs_modifications + 1 == bitmap.modifications:
+            if len(ordinals) > REBUILD_THRESHOLD:
+                # Rebuilding the runs once is cheaper than merging many days one by one.
+                self._runs_bitmap = None
+            else:
+                update = self._runs.add if completed else self._runs.discard
+                for ordinal in ordinals:
+                    update(ordinal)
+                self._runs_modifications = bitmap.modifications
+
+        last_run = self.runs.last_run()
+        if last_run is None:
+            self.streak_counter = 0
+            return
+        self.streak_counter = last_run[1] - last_run[0] + 1
+        last_day = datetime.fromordinal(last_run[1])
+        if last_day > self.end_date:
+            self.end_date = last_day
 
     def calculate_end_date(self, start_date, frequency):
         """
@@ -42,32 +109,63 @@ class DailyHabit(Habit):
             datetime: The calculated end date of the habit.
         """
         self.end_date = start_date + timedelta(days=frequency)
-        
+        return self.end_date
+
     def mark_completed(self, completion_date=None):
         """
         Marks the daily habit as completed for the specified date.
 
+        Dates may arrive in any order: a backfilled date merges into the runs
+        around it and the streak count is updated accordingly.
+
         Args:
-            completion_date (datetime): The date on which the habit is completed. Defaults to the current date.
+            completion_date (date or datetime): The date on which the habit is completed. Defaults to the current date.
 
         Raises:
-            ValueError: If the completion date is outside the habit period.
-        """
-        if completion_date is None:
-            completion_date = datetime.now().date()
-
-        if completion_date == self.end_date:
-            self.streak_counter += 1
-        elif completion_date > self.end_date:
-            # Check if the completion date is the day after the current end date (consecutive day)
-            if (completion_date - self.end_date).days == 1:
-                self.streak_counter += 1
-                self.end_date = completion_date
-            else:
-                self.streak_counter = 1  # Reset streak count if not consecutive
-                self.end_date = completion_date  # Update the end date to the new completion date
-        else:
-            raise ValueError("Completion date is outside the habit period.")
+            ValueError: If the completion date is earlier than the start date.
+        """
+        if completion_date is not None and not isinstance(completion_date, datetime):
+            completion_date = datetime.combine(completion_date, datetime.min.time())
+        self.mark_as_completed(completion_date)
+
+    def current_streak(self, today=None):
+        """
+        Gets the length of the run of completed days that reaches today or yesterday.
+
+        Args:
+            today (datetime, optional): The reference date. Defaults to the current date.
+
+        Returns:
+            int: The current streak of the habit.
+        """
+        return self.runs.current((today or datetime.now()).toordinal())
+
+    def longest_streak(self):
+        """
+        Gets the length of the longest run of completed days.
+
+        Returns:
+            int: The longest streak of the habit.
+        """
+        return self.runs.longest()
+
+    def streak_history(self):
+        """
+        Gets every run of consecutive completed days.
+
+        Returns:
+            list: ``(first date, last date)`` pairs in ascending order.
+        """
+        return [(date.fromordinal(first), date.fromordinal(last)) for first, last in self.runs.runs()]
+
+    def schedule_key(self):
+        """
+        Returns the schedule key of the daily habit.
+
+        Returns:
+            tuple: ``('daily',)``, since the habit is due every day.
+        """
+        return ('daily',)
 
     def check_streak(self, target_streak):
         """
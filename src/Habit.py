@@ -1,4 +1,9 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from src.CompletionBitmap import CompletionBitmap
+from src.schedule_index import to_ordinals
 
 class Habit:
     """
@@ -7,16 +12,33 @@ class Habit:
     Attributes:
         name (str): The name of the habit.
         start_date (datetime): The start date of the habit.
-        completed_dates (set): Dates on which the habit was completed.
+        completed_dates (CompletionBitmap): Dates on which the habit was completed, stored as a set-like bitmap.
         broken (bool): Indicates whether the habit has been broken.
+        streak_counter (int): The stored streak count of the habit (also available as ``streak_count``).
+        end_date (datetime): The end date of the current period of the habit.
+        dirty (bool): True if the habit changed since it was loaded from JSON or saved to a segment directory.
+        segment (tuple): ``(segment file, position)`` of the habit in the segment directory it was
+            loaded from or last saved to, or None.
 
     Methods:
         mark_completed(completion_date=None): Marks the habit as completed for the specified date.
         mark_incomplete(completion_date): Marks the habit as incomplete for the specified date.
+        mark_completed_many(dates): Marks the habit as completed for many dates at once.
         calculate_end_date(start_date, frequency): Calculates the end date of the habit.
         check_break_status(): Checks if the habit has been broken.
+        schedule_key(): Returns a hashable description of the habit's schedule.
+        add_listener(listener): Registers a callback for completion changes.
+        remove_listener(listener): Unregisters a callback.
+        defer_completed_dates(iso_dates): Sets completion dates that are parsed on first access.
     """
 
+    # Instances have no __dict__; every attribute has a fixed slot.
+    # _listeners holds the callbacks notified of completion changes, as
+    # ``listener(habit, event, days)``, and _deferred_dates holds unparsed ISO
+    # completion dates set by defer_completed_dates.
+    __slots__ = ('name', 'start_date', 'end_date', '_completed_dates', '_deferred_dates', 'broken',
+                 'streak_counter', 'dirty', 'segment', '_listeners')
+
     def __init__(self, name, start_date):
         """
         Initializes a Habit instance.
@@ -27,8 +49,57 @@ class Habit:
         """
         self.name = name
         self.start_date = start_date
-        self.completed_dates = set()
+        self.end_date = self.calculate_end_date(start_date, frequency=1)
+        self._completed_dates = CompletionBitmap(start_date)
+        self._deferred_dates = None
         self.broken = False
+        self.streak_counter = 0
+        self.dirty = True
+        self.segment = None
+        self._listeners = ()
+
+    @property
+    def completed_dates(self):
+        """
+        CompletionBitmap: Dates on which the habit was completed.
+
+        Assigning any iterable of dates (for example a set) replaces the stored completions.
+        """
+        if self._completed_dates is None:
+            self._completed_dates = CompletionBitmap(
+                self.start_date, (datetime.fromisoformat(day).date() for day in self._deferred_dates))
+            self._deferred_dates = None
+        return self._completed_dates
+
+    @completed_dates.setter
+    def completed_dates(self, dates):
+        if not isinstance(dates, CompletionBitmap):
+            dates = CompletionBitmap(self.start_date, dates)
+        self._completed_dates = dates
+        self._deferred_dates = None
+        self.dirty = True
+
+    def defer_completed_dates(self, iso_dates):
+        """
+        Sets the completion dates from ISO strings that are only parsed on first access.
+
+        Parameters:
+            iso_dates (list): Completion dates as ISO formatted strings.
+        """
+        self._completed_dates = None
+        self._deferred_dates = iso_dates
+        self.dirty = True
+
+    @property
+    def streak_count(self):
+        """
+        int: Alias of ``streak_counter`` under the name used in the JSON file.
+        """
+        return self.streak_counter
+
+    @streak_count.setter
+    def streak_count(self, value):
+        self.streak_counter = value
 
     def mark_as_completed(self, completion_date=None):
         """
@@ -39,12 +110,59 @@ class Habit:
         """
         completion_date = completion_date or datetime.now()
 
-        if self.start_date <= completion_date:
+        # Days are compared like in mark_completed_many, so a time earlier on the start day is accepted.
+        if self.start_date.toordinal() <= completion_date.toordinal():
             self.completed_dates.add(completion_date.date())
             self.broken = False
+            self.dirty = True
+            self._completions_changed((completion_date.toordinal(),), True)
+            if self._listeners:
+                self._notify('completed', (completion_date.date(),))
         else:
             raise ValueError("Completion date cannot be earlier than the start date.")
 
+    def mark_completed_many(self, dates):
+        """
+        Marks the habit as completed for many dates in one vectorized pass.
+
+        All dates are validated together and the valid ones are stored at once.
+        Invalid dates do not stop the others from being recorded; they are
+        returned instead of raising on the first one.
+
+        Parameters:
+            dates (iterable): Dates or datetimes, or a NumPy datetime64 array.
+
+        Returns:
+            list: The rejected dates, in input order.
+        """
+        if not isinstance(dates, np.ndarray):
+            dates = list(dates)
+        ordinals = to_ordinals(dates)
+        valid = self._completion_mask(ordinals)
+
+        accepted = np.unique(ordinals[valid])
+        if len(accepted):
+            self.completed_dates.add_ordinals(accepted)
+            self.broken = False
+            self.dirty = True
+            self._completions_changed(accepted.tolist(), True)
+            if self._listeners:
+                self._notify('completed', tuple(date.fromordinal(int(ordinal)) for ordinal in accepted))
+
+        return [dates[index] for index in np.flatnonzero(~valid)]
+
+    def _completion_mask(self, ordinals):
+        """
+        Returns which day ordinals are valid completion days for the habit.
+
+        Parameters:
+            ordinals (np.ndarray): Day ordinals.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the day is not before the start date.
+        """
+        return ordinals >= self.start_date.toordinal()
+
     def mark_as_incomplete(self, completion_date):
         """
         Marks the habit as incomplete for the specified date.
@@ -53,16 +171,74 @@ class Habit:
             completion_date (datetime): The date on which the habit is marked incomplete.
         """
         self.completed_dates.discard(completion_date.date())
+        self.dirty = True
+        self._completions_changed((completion_date.toordinal(),), False)
+        if self._listeners:
+            self._notify('incomplete', (completion_date.date(),))
+
+    def _completions_changed(self, ordinals, completed):
+        """
+        Hook called after completions were added or removed, before the listeners are notified.
+
+        Parameters:
+            ordinals (list): Day ordinals of the changed days.
+            completed (bool): True if the days were marked as completed, False if as incomplete.
+        """
 
-    def end_date(self, start_date, frequency):
+    def add_listener(self, listener):
+        """
+        Registers a callback that is called whenever completions change.
+
+        The callback is called as ``listener(habit, event, days)`` where ``event``
+        is ``'completed'`` or ``'incomplete'`` and ``days`` is a tuple of dates.
+
+        Parameters:
+            listener (callable): The callback to register.
+        """
+        self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener):
+        """
+        Unregisters a callback previously registered with add_listener.
+
+        Parameters:
+            listener (callable): The callback to remove.
+        """
+        self._listeners = tuple(registered for registered in self._listeners if registered != listener)
+
+    def _notify(self, event, days):
+        """
+        Calls every registered listener with a completion change.
+        """
+        for listener in self._listeners:
+            listener(self, event, days)
+
+    def calculate_end_date(self, start_date, frequency):
         """
         Calculates the end date of the habit based on the start date and frequency.
 
+        Subclasses override it with their period; a plain habit's period is ``frequency`` days.
+
         Parameters:
             start_date (datetime): The start date of the habit.
             frequency (int): The frequency of the habit.
+
+        Returns:
+            datetime: The calculated end date of the habit.
+        """
+        return start_date + timedelta(days=frequency)
+
+    def schedule_key(self):
+        """
+        Returns a hashable description of the days on which the habit is due.
+
+        Habits with equal keys share the same due dates, which lets schedule
+        computations be cached and reused across habits.
+
+        Returns:
+            tuple: The schedule key.
         """
-        raise NotImplementedError("Subclasses must implement the end_date method.")
+        raise NotImplementedError("Subclasses must implement the schedule_key method.")
 
     def check_break(self):
         """
@@ -1,17 +1,10 @@
-import sys
-import os
-
-# Get the absolute path of the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Add the parent directory (root directory) to the Python path
-parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
-sys.path.append(parent_dir)
-
-
 from src.Habit import *
 from datetime import timedelta
 
+import numpy as np
+
+from src.schedule_index import MONTH_DAYS, days_of_month, period_streaks, schedule_days, schedule_mask
+
 class MonthlyHabit(Habit):
     """
     Represents a habit that repeats monthly and can be tracked and marked as completed.
@@ -22,7 +15,8 @@ class MonthlyHabit(Habit):
         target_days (list): List of days in the month when the habit should be completed.
 
     Attributes:
-        target_days (list): List of days in the month when the habit should be completed.
+        target_days (tuple): Sorted, distinct days in the month when the habit should be completed.
+            Stored as an interned bitmask shared by all habits with the same schedule; assign a new list to change it.
 
     Inherits from:
         Habit
@@ -30,8 +24,12 @@ class MonthlyHabit(Habit):
     Methods:
         mark_completed(completion_date=None): Marks the habit as completed for the specified date.
         calculate_end_date(start_date, frequency): Calculates the end date of the habit based on the start date and frequency.
+        schedule_key(): Returns the schedule key of the habit.
+        get_streak_count(today=None): Gets the number of consecutive due dates on which the habit was completed.
     """
 
+    __slots__ = ('_target_mask',)
+
     def __init__(self, name, start_date, target_days):
         """
         Initializes a MonthlyHabit object.
@@ -43,8 +41,25 @@ class MonthlyHabit(Habit):
         """
         super().__init__(name, start_date)
         self.target_days = target_days
-        next_month = start_date.replace(day=28) + timedelta(days=4)
-        self.end_date = (next_month.replace(day=1) - timedelta(days=1)).replace(hour=23, minute=59, second=59)
+
+    @property
+    def target_days(self):
+        """
+        Gets the days in the month when the habit should be completed.
+
+        The tuple is immutable because it is shared; assign a new list of days to change the schedule.
+
+        Returns:
+            tuple: The sorted, distinct days in the month.
+
+        Raises:
+            ValueError: When set, if a day is not between 1 and 31.
+        """
+        return schedule_days(self._target_mask)
+
+    @target_days.setter
+    def target_days(self, target_days):
+        self._target_mask = schedule_mask(target_days, MONTH_DAYS)
 
     def mark_completed(self, completion_date=None):
         """
@@ -58,12 +73,46 @@ class MonthlyHabit(Habit):
         """
         if completion_date is None:
             completion_date = datetime.now()
-        if completion_date.day in self.target_days:
+        if self._target_mask >> completion_date.day & 1:
             super().mark_as_completed(completion_date)
         else:
             raise ValueError("Completion date is not on a specified day.")
 
-    def end_date(self, start_date, frequency):
+    def _completion_mask(self, ordinals):
+        """
+        Returns which day ordinals are valid completion days for the habit.
+
+        Args:
+            ordinals (np.ndarray): Day ordinals.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the day is on or after the start date and on a specified day of the month.
+        """
+        return super()._completion_mask(ordinals) & np.isin(days_of_month(ordinals), schedule_days(self._target_mask))
+
+    def schedule_key(self):
+        """
+        Returns the schedule key of the monthly habit.
+
+        Returns:
+            tuple: ``('monthly', days)`` where ``days`` are the sorted, distinct target days.
+        """
+        return ('monthly', schedule_days(self._target_mask))
+
+    def get_streak_count(self, today=None):
+        """
+        Gets the number of consecutive due dates, up to today, on which the habit was completed.
+
+        Args:
+            today (datetime, optional): The reference date. Defaults to the current date.
+
+        Returns:
+            int: The current streak count of the habit.
+        """
+        current, _, _ = period_streaks([self], last_day=today)
+        return int(current[0])
+
+    def calculate_end_date(self, start_date, frequency):
         """
         Calculates the end date of the monthly habit based on the start date and frequency.
 
@@ -0,0 +1,199 @@
+from bisect import bisect_right
+
+
+class RunIntervals:
+    """
+    Sorted set of the runs of consecutive completed days of a habit.
+
+    Each run is stored as its first and last day ordinal in two parallel
+    sorted lists. Adding a day merges it into the neighbouring runs and
+    removing a day splits its run, so both are a binary search plus at most
+    one list insertion or deletion, whatever the order in which days arrive.
+    The number of runs of every length is counted, so the longest run is
+    known without a scan.
+
+    Attributes:
+        starts (list): First day ordinal of every run, ascending.
+        ends (list): Last day ordinal of every run, aligned with ``starts``.
+
+    Methods:
+        add(ordinal): Adds a completed day.
+        discard(ordinal): Removes a completed day.
+        run_containing(ordinal): Returns the run holding a day.
+        last_run(): Returns the latest run.
+        current(today): Length of the run reaching today or yesterday.
+        longest(): Length of the longest run.
+        runs(): Returns all runs.
+    """
+
+    __slots__ = ('starts', 'ends', '_length_counts', '_longest')
+
+    def __init__(self, runs=()):
+        """
+        Initializes a RunIntervals object.
+
+        Args:
+            runs (iterable): ``(first ordinal, length)`` pairs of non-adjacent runs in ascending order,
+                as returned by ``streak_engine.completion_runs``.
+        """
+        self.starts = []
+        self.ends = []
+        self._length_counts = {}
+        self._longest = 0
+        for first, length in runs:
+            self.starts.append(first)
+            self.ends.append(first + length - 1)
+            self._count(length, 1)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _count(self, length, change):
+        """
+        Updates the number of runs of a length and the longest length.
+        """
+        count = self._length_counts.get(length, 0) + change
+        if count:
+            self._length_counts[length] = count
+        else:
+            del self._length_counts[length]
+        if change > 0 and length > self._longest:
+            self._longest = length
+        elif not count and length == self._longest:
+            self._longest = max(self._length_counts, default=0)
+
+    def _find(self, ordinal):
+        """
+        Returns the index of the run containing a day, or -1.
+        """
+        index = bisect_right(self.starts, ordinal) - 1
+        if index >= 0 and ordinal <= self.ends[index]:
+            return index
+        return -1
+
+    def add(self, ordinal):
+        """
+        Adds a completed day, merging it with the adjacent runs.
+
+        Args:
+            ordinal (int): The day ordinal.
+
+        Returns:
+            bool: False if the day was already part of a run.
+        """
+        index = bisect_right(self.starts, ordinal) - 1
+        if index >= 0 and ordinal <= self.ends[index]:
+            return False
+        joins_left = index >= 0 and self.ends[index] == ordinal - 1
+        joins_right = index + 1 < len(self.starts) and self.starts[index + 1] == ordinal + 1
+
+        if joins_left and joins_right:
+            self._count(self.ends[index] - self.starts[index] + 1, -1)
+            self._count(self.ends[index + 1] - self.starts[index + 1] + 1, -1)
+            self.ends[index] = self.ends[index + 1]
+            del self.starts[index + 1]
+            del self.ends[index + 1]
+        elif joins_left:
+            self._count(self.ends[index] - self.starts[index] + 1, -1)
+            self.ends[index] = ordinal
+        elif joins_right:
+            index += 1
+            self._count(self.ends[index] - self.starts[index] + 1, -1)
+            self.starts[index] = ordinal
+        else:
+            index += 1
+            self.starts.insert(index, ordinal)
+            self.ends.insert(index, ordinal)
+        self._count(self.ends[index] - self.starts[index] + 1, 1)
+        return True
+
+    def discard(self, ordinal):
+        """
+        Removes a completed day, splitting its run.
+
+        Args:
+            ordinal (int): The day ordinal.
+
+        Returns:
+            bool: False if the day was not part of a run.
+        """
+        index = self._find(ordinal)
+        if index < 0:
+            return False
+        start, end = self.starts[index], self.ends[index]
+        self._count(end - start + 1, -1)
+        if start == end:
+            del self.starts[index]
+            del self.ends[index]
+            return True
+
+        if ordinal == start:
+            self.starts[index] = ordinal + 1
+        elif ordinal == end:
+            self.ends[index] = ordinal - 1
+        else:
+            self.ends[index] = ordinal - 1
+            self.starts.insert(index + 1, ordinal + 1)
+            self.ends.insert(index + 1, end)
+            self._count(end - ordinal, 1)
+        self._count(self.ends[index] - self.starts[index] + 1, 1)
+        return True
+
+    def run_containing(self, ordinal):
+        """
+        Returns the run that contains a day.
+
+        Args:
+            ordinal (int): The day ordinal.
+
+        Returns:
+            tuple: ``(first ordinal, last ordinal)``, or None if the day is not completed.
+        """
+        index = self._find(ordinal)
+        return None if index < 0 else (self.starts[index], self.ends[index])
+
+    def last_run(self):
+        """
+        Returns the latest run.
+
+        Returns:
+            tuple: ``(first ordinal, last ordinal)``, or None when there are no runs.
+        """
+        return (self.starts[-1], self.ends[-1]) if self.starts else None
+
+    def current(self, today):
+        """
+        Returns the length of the current streak.
+
+        As in ``streak_engine.compute_streaks``, the current streak is the
+        latest run starting no later than today, provided it reaches today or
+        yesterday; completions after today are not counted.
+
+        Args:
+            today (int): Ordinal of the reference day.
+
+        Returns:
+            int: The current streak length.
+        """
+        index = bisect_right(self.starts, today) - 1
+        if index < 0 or self.ends[index] < today - 1:
+            return 0
+        return min(self.ends[index], today) - self.starts[index] + 1
+
+    def longest(self):
+        """
+        Returns the length of the longest run.
+
+        Returns:
+            int: The longest run length, 0 when there are no runs.
+        """
+        return self._longest
+
+    def runs(self):
+        """
+        Returns all runs in ascending order.
+
+        Returns:
+            list: ``(first ordinal, last ordinal)`` pairs.
+        """
+        return list(zip(self.starts, self.ends))
@@ -1,17 +1,10 @@
-import sys
-import os
-
-# Get the absolute path of the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Add the parent directory (root directory) to the Python path
-parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
-sys.path.append(parent_dir)
-
-
 from src.Habit import *
 from datetime import timedelta
 
+import numpy as np
+
+from src.schedule_index import WEEKDAYS, period_streaks, schedule_days, schedule_mask, weekdays_of
+
 class WeeklyHabit(Habit):
     """
     Represents a habit that recurs weekly and can be tracked and marked as completed.
@@ -19,13 +12,18 @@ class WeeklyHabit(Habit):
     Attributes:
         name (str): The name of the habit.
         start_date (datetime): The start date of the habit.
-        weekdays (list): List of weekdays when the habit should be completed (0 for Monday, 1 for Tuesday, ..., 6 for Sunday).
+        weekdays (tuple): Sorted, distinct weekdays when the habit should be completed (0 for Monday, 1 for Tuesday, ..., 6 for Sunday).
+            Stored as an interned bitmask shared by all habits with the same schedule; assign a new list to change it.
 
     Methods:
         mark_completed(completion_date=None): Marks the habit as completed for the specified date.
         calculate_end_date(start_date, frequency): Calculates the end date of the habit based on the start date and frequency.
+        schedule_key(): Returns the schedule key of the habit.
+        get_streak_count(today=None): Gets the number of consecutive due dates on which the habit was completed.
     """
 
+    __slots__ = ('_weekday_mask',)
+
     def __init__(self, name, start_date, weekdays):
         """
         Initializes a WeeklyHabit object.
@@ -37,7 +35,25 @@ class WeeklyHabit(Habit):
         """
         super().__init__(name, start_date)
         self.weekdays = weekdays
-        self.end_date = start_date + timedelta(weeks=1)
+
+    @property
+    def weekdays(self):
+        """
+        Gets the weekdays when the habit should be completed.
+
+        The tuple is immutable because it is shared; assign a new list of weekdays to change the schedule.
+
+        Returns:
+            tuple: The sorted, distinct weekdays.
+
+        Raises:
+            ValueError: When set, if a weekday is not between 0 and 6.
+        """
+        return schedule_days(self._weekday_mask)
+
+    @weekdays.setter
+    def weekdays(self, weekdays):
+        self._weekday_mask = schedule_mask(weekdays, WEEKDAYS)
 
     def mark_as_completed(self, completion_date=None):
         """
@@ -51,12 +67,46 @@ class WeeklyHabit(Habit):
         """
         if completion_date is None:
             completion_date = datetime.now()
-        if completion_date.weekday() in self.weekdays:
+        if self._weekday_mask >> completion_date.weekday() & 1:
             super().mark_as_completed(completion_date)
         else:
             raise ValueError("Completion date is not on a specified weekday.")
 
-    def end_date(self, start_date, frequency):
+    def _completion_mask(self, ordinals):
+        """
+        Returns which day ordinals are valid completion days for the habit.
+
+        Args:
+            ordinals (np.ndarray): Day ordinals.
+
+        Returns:
+            np.ndarray: Boolean mask, True where the day is on or after the start date and on a specified weekday.
+        """
+        return super()._completion_mask(ordinals) & np.isin(weekdays_of(ordinals), schedule_days(self._weekday_mask))
+
+    def schedule_key(self):
+        """
+        Returns the schedule key of the weekly habit.
+
+        Returns:
+            tuple: ``('weekly', days)`` where ``days`` are the sorted, distinct weekdays.
+        """
+        return ('weekly', schedule_days(self._weekday_mask))
+
+    def get_streak_count(self, today=None):
+        """
+        Gets the number of consecutive due dates, up to today, on which the habit was completed.
+
+        Args:
+            today (datetime, optional): The reference date. Defaults to the current date.
+
+        Returns:
+            int: The current streak count of the habit.
+        """
+        current, _, _ = period_streaks([self], last_day=today)
+        return int(current[0])
+
+    def calculate_end_date(self, start_date, frequency):
         """
         Calculates the end date of the weekly habit based on the start date and frequency.
 
@@ -0,0 +1,3 @@
+from src.main import main
+
+main()
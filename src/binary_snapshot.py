@@ -0,0 +1,270 @@
+import mmap
+import struct
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.CompletionBitmap import CompletionBitmap
+from src.DailyHabit import DailyHabit
+from src.habit_tracker import save_file_atomically
+from src.WeeklyHabit import WeeklyHabit
+from src.MonthlyHabit import MonthlyHabit
+from src.schedule_index import MONTH_DAYS, WEEKDAYS, schedule_days, schedule_mask
+from src.streak_engine import completion_ordinals
+
+MAGIC = b'HABITSNP'
+VERSION = 1
+
+# magic, version, habit count, table offset, strings offset, strings size, days offset, day count
+HEADER = struct.Struct('<8sIIQQQQQ')
+
+# One fixed-size row per habit. Names are stored in a separate UTF-8 blob and
+# completions in one contiguous int32 array of day ordinals.
+HABIT_DTYPE = np.dtype([
+    ('name_offset', '<u8'),
+    ('name_length', '<u4'),
+    ('type', 'u1'),
+    ('broken', 'u1'),
+    ('start_day', '<i4'),
+    ('start_microseconds', '<i8'),
+    ('schedule', '<u4'),
+    ('streak_count', '<i4'),
+    ('days_offset', '<u8'),
+    ('days_count', '<u4'),
+])
+
+TYPE_CODES = {DailyHabit: 0, WeeklyHabit: 1, MonthlyHabit: 2}
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def save_habits_to_binary_file(habits, filename):
+    """
+    Saves a list of habit objects to a binary snapshot file.
+
+    The file holds a header, a table with one fixed-size row per habit, the
+    habit names and, for every habit, a contiguous array of int32 day ordinals
+    of its completions in ascending order. It is replaced atomically, so open
+    snapshots of the previous file keep their mapping intact.
+
+    Args:
+        habits (list): List of Habit objects to be saved.
+        filename (str): The name of the snapshot file.
+
+    Returns:
+        None
+    """
+    table = np.zeros(len(habits), dtype=HABIT_DTYPE)
+
+    names = [habit.name.encode('utf-8') for habit in habits]
+    name_lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+    table['name_length'] = name_lengths
+    table['name_offset'][1:] = np.cumsum(name_lengths)[:-1]
+
+    for row, habit in enumerate(habits):
+        table['type'][row] = TYPE_CODES.get(type(habit), 0)
+        table['broken'][row] = habit.broken
+        start = habit.start_date
+        table['start_day'][row] = start.toordinal()
+        if isinstance(start, datetime):
+            table['start_microseconds'][row] = (start - datetime.combine(start.date(), datetime.min.time())) // timedelta(microseconds=1)
+        if isinstance(habit, WeeklyHabit):
+            table['schedule'][row] = schedule_mask(habit.weekdays, WEEKDAYS)
+        elif isinstance(habit, MonthlyHabit):
+            table['schedule'][row] = schedule_mask(habit.target_days, MONTH_DAYS)
+        table['streak_count'][row] = habit.streak_counter or 0
+
+    ordinals = np.zeros(0, dtype=np.int32)
+    if habits:
+        ordinals, owners = completion_ordinals(habits)
+        ordinals = ordinals.astype('<i4')
+        counts = np.bincount(owners, minlength=len(habits))
+        table['days_count'] = counts
+        table['days_offset'][1:] = np.cumsum(counts)[:-1]
+
+    table_offset = _align(HEADER.size)
+    strings_offset = table_offset + table.nbytes
+    strings = b''.join(names)
+    days_offset = _align(strings_offset + len(strings))
+
+    def write(file):
+        file.write(HEADER.pack(MAGIC, VERSION, len(habits), table_offset, strings_offset, len(strings),
+                               days_offset, len(ordinals)))
+        file.write(bytes(table_offset - HEADER.size))
+        file.write(table.tobytes())
+        file.write(strings)
+        file.write(bytes(days_offset - strings_offset - len(strings)))
+        file.write(ordinals.tobytes())
+
+    save_file_atomically(filename, write)
+
+
+class BinarySnapshot:
+    """
+    Read-only, memory-mapped view of a binary habit snapshot file.
+
+    The habit table and the completion arrays are NumPy views directly on the
+    mapped file, so opening a snapshot copies nothing and several processes
+    reading the same file share its pages.
+
+    Attributes:
+        table (np.ndarray): Structured array with one row per habit.
+        days (np.ndarray): All completion day ordinals (int32), habit after habit.
+
+    Methods:
+        name(index): Returns the name of a habit.
+        ordinals(index): Returns the completion day ordinals of a habit as a view.
+        habit(index): Builds the Habit object of one row.
+        habits(): Builds all Habit objects.
+        close(): Unmaps the file.
+    """
+
+    def __init__(self, filename):
+        """
+        Opens a binary snapshot file.
+
+        Args:
+            filename (str): The name of the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot or has an unsupported version.
+        """
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError("File is not a habit snapshot.")
+        magic, version, count, table_offset, strings_offset, strings_size, days_offset, day_count = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError("File is not a habit snapshot.")
+        if version != VERSION:
+            self._map.close()
+            raise ValueError("Unsupported habit snapshot version {}.".format(version))
+
+        self.table = np.frombuffer(self._map, dtype=HABIT_DTYPE, count=count, offset=table_offset)
+        self.days = np.frombuffer(self._map, dtype='<i4', count=day_count, offset=days_offset)
+        self._strings_offset = strings_offset
+
+    def __len__(self):
+        return len(self.table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def name(self, index):
+        """
+        Returns the name of the habit in a row.
+
+        Args:
+            index (int): The row index.
+
+        Returns:
+            str: The habit name.
+        """
+        start = self._strings_offset + int(self.table['name_offset'][index])
+        return self._map[start:start + int(self.table['name_length'][index])].decode('utf-8')
+
+    def ordinals(self, index):
+        """
+        Returns the completion day ordinals of the habit in a row without copying.
+
+        The view reads the mapped file, so it keeps the mapping alive after close().
+
+        Args:
+            index (int): The row index.
+
+        Returns:
+            np.ndarray: Read-only int32 view of the ascending day ordinals.
+        """
+        start = int(self.table['days_offset'][index])
+        return self.days[start:start + int(self.table['days_count'][index])]
+
+    def habit(self, index):
+        """
+        Builds the Habit object stored in a row.
+
+        Args:
+            index (int): The row index.
+
+        Returns:
+            Habit: The DailyHabit, WeeklyHabit or MonthlyHabit of the row.
+        """
+        row = self.table[index]
+        name = self.name(index)
+        start_date = datetime.fromordinal(int(row['start_day'])) + timedelta(microseconds=int(row['start_microseconds']))
+        if row['type'] == TYPE_CODES[WeeklyHabit]:
+            habit = WeeklyHabit(name, start_date, schedule_days(int(row['schedule'])))
+        elif row['type'] == TYPE_CODES[MonthlyHabit]:
+            habit = MonthlyHabit(name, start_date, schedule_days(int(row['schedule'])))
+        else:
+            habit = DailyHabit(name, start_date)
+
+        ordinals = self.ordinals(index)
+        if len(ordinals):
+            origin = min(int(ordinals[0]), habit.completed_dates.origin)
+            bits = np.zeros(int(ordinals[-1]) - origin + 1, dtype=np.uint8)
+            bits[ordinals - origin] = 1
+            habit.completed_dates = CompletionBitmap.from_bytes(origin, np.packbits(bits, bitorder='little').tobytes())
+        habit.broken = bool(row['broken'])
+        habit.streak_counter = int(row['streak_count'])
+        habit.dirty = False
+        return habit
+
+    def habits(self):
+        """
+        Builds the Habit objects of all rows.
+
+        Returns:
+            list: List of Habit objects.
+        """
+        return [self.habit(index) for index in range(len(self))]
+
+    def close(self):
+        """
+        Unmaps the snapshot file.
+
+        If views returned by ordinals() are still alive, the file stays mapped
+        until the last of them is released.
+        """
+        self.table = self.days = None
+        try:
+            self._map.close()
+        except BufferError:
+            # Outstanding views hold the mapping; it is unmapped when they are garbage collected.
+            pass
+
+
+def open_binary_snapshot(filename):
+    """
+    Opens a binary snapshot file for read-only, memory-mapped access.
+
+    Args:
+        filename (str): The name of the snapshot file.
+
+    Returns:
+        BinarySnapshot: The open snapshot.
+    """
+    return BinarySnapshot(filename)
+
+
+def load_habits_from_binary_file(filename):
+    """
+    Loads a list of habit objects from a binary snapshot file.
+
+    Args:
+        filename (str): The name of the snapshot file.
+
+    Returns:
+        list: List of loaded Habit objects.
+    """
+    with BinarySnapshot(filename) as snapshot:
+        return snapshot.habits()
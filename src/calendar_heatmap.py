@@ -0,0 +1,176 @@
+from datetime import date
+
+import numpy as np
+
+from src.schedule_index import EPOCH_ORDINAL, weekdays_of
+from src.streak_engine import completion_ordinals
+
+# Week columns of a year view. Week 0 holds January 1st; a year touches at most 54 weeks.
+WEEKS = 54
+
+
+def calendar_cells(ordinals):
+    """
+    Returns the year, week column and weekday of day ordinals.
+
+    Week columns start on Monday and count from the week holding January 1st,
+    as in the usual calendar heatmap layout.
+
+    Args:
+        ordinals (np.ndarray): Day ordinals.
+
+    Returns:
+        tuple: ``(years, weeks, weekdays)`` NumPy integer arrays.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    years = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[Y]')
+    new_years = years.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+    weeks = (ordinals - new_years + weekdays_of(new_years)) // 7
+    return years.astype(np.int64) + 1970, weeks, weekdays_of(ordinals)
+
+
+def calendar_mask(year):
+    """
+    Returns which cells of a year view are days of that year.
+
+    Args:
+        year (int): The year.
+
+    Returns:
+        np.ndarray: Boolean ``(WEEKS, 7)`` matrix, True for the days of the year.
+    """
+    first, last = date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+    _, weeks, weekdays = calendar_cells(np.arange(first, last + 1))
+    mask = np.zeros((WEEKS, 7), dtype=bool)
+    mask[weeks, weekdays] = True
+    return mask
+
+
+def heatmap_counts(habits, years=None):
+    """
+    Counts the completions of many habits per year, week column and weekday.
+
+    All completion days are binned in one vectorized pass.
+
+    Args:
+        habits (list): List of Habit objects.
+        years (iterable, optional): The years to count. Defaults to every year with completions.
+
+    Returns:
+        tuple: ``(years, counts)`` where ``years`` is the sorted NumPy array of
+        years and ``counts`` an integer array of shape ``(len(years), WEEKS, 7)``.
+    """
+    ordinals = completion_ordinals(habits)[0] if habits else np.zeros(0, dtype=np.int64)
+    day_years, weeks, weekdays = calendar_cells(ordinals)
+    years = np.unique(day_years) if years is None else np.unique(np.asarray(list(years), dtype=np.int64))
+
+    positions = np.searchsorted(years, day_years)
+    keep = positions < len(years)
+    keep[keep] = years[positions[keep]] == day_years[keep]
+    cells = (positions[keep] * WEEKS + weeks[keep]) * 7 + weekdays[keep]
+    counts = np.bincount(cells, minlength=len(years) * WEEKS * 7)
+    return years, counts.reshape(len(years), WEEKS, 7)
+
+
+class CalendarHeatmap:
+    """
+    Year views of the completions of a set of habits, cached per year.
+
+    Every year view is a ``(WEEKS, 7)`` matrix of completion counts per week
+    column and weekday. Computed years are kept as tiles; a completion change
+    only discards the tile of the year it falls in, and all missing tiles are
+    recomputed together in one pass.
+
+    Attributes:
+        habits (list): The aggregated habits.
+
+    Methods:
+        add_habit(habit): Adds a habit to the aggregation.
+        remove_habit(habit): Removes a habit from the aggregation.
+        year_view(year): Returns the count matrix of one year.
+        year_views(years): Returns the count matrices of many years.
+    """
+
+    def __init__(self, habits=()):
+        """
+        Initializes a CalendarHeatmap object.
+
+        Args:
+            habits (iterable): Habits to aggregate initially.
+        """
+        self._habits = {}
+        self._tiles = {}
+        for habit in habits:
+            self.add_habit(habit)
+
+    @property
+    def habits(self):
+        return list(self._habits)
+
+    def add_habit(self, habit):
+        """
+        Adds a habit and starts listening to its completion changes.
+
+        Args:
+            habit (Habit): The habit to add.
+        """
+        if habit in self._habits:
+            return
+        self._habits[habit] = None
+        habit.add_listener(self._on_change)
+        self._tiles.clear()
+
+    def remove_habit(self, habit):
+        """
+        Removes a habit from the aggregation.
+
+        Args:
+            habit (Habit): The habit to remove.
+        """
+        if habit not in self._habits:
+            return
+        habit.remove_listener(self._on_change)
+        del self._habits[habit]
+        self._tiles.clear()
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that discards the tiles of the changed years.
+        """
+        for day in days:
+            self._tiles.pop(day.year, None)
+
+    def year_views(self, years):
+        """
+        Returns the completion counts of many years.
+
+        Args:
+            years (iterable): The years.
+
+        Returns:
+            np.ndarray: Integer array of shape ``(len(years), WEEKS, 7)``.
+        """
+        years = list(years)
+        missing = [year for year in years if year not in self._tiles]
+        if missing:
+            counted, counts = heatmap_counts(self.habits, missing)
+            for year, tile in zip(counted.tolist(), counts):
+                tile.setflags(write=False)
+                self._tiles[year] = tile
+        if not years:
+            return np.zeros((0, WEEKS, 7), dtype=np.int64)
+        return np.stack([self._tiles[year] for year in years])
+
+    def year_view(self, year):
+        """
+        Returns the completion counts of one year.
+
+        Args:
+            year (int): The year.
+
+        Returns:
+            np.ndarray: Read-only ``(WEEKS, 7)`` integer matrix of counts per week column and weekday.
+        """
+        if year not in self._tiles:
+            self.year_views([year])
+        return self._tiles[year]
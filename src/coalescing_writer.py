@@ -0,0 +1,153 @@
+import atexit
+import threading
+
+from src.habit_tracker import habit_to_record, save_records_to_json_file
+
+
+class CoalescingWriter:
+    """
+    Merges bursts of saves of a habits JSON file into single writes.
+
+    save() takes the records of the habits and returns immediately; a
+    background thread writes only the latest records it has received. Saves
+    that arrive while a write is running, or within ``delay`` seconds of the
+    first save of a burst, are merged into the next write, so a burst of
+    saves costs one or two atomic writes instead of one per save.
+
+    With a ``version``, every write checks that no other process saved the
+    file since this writer's last write. Failed writes are kept and raised by
+    the next flush() or close(); later saves are not written until then, and
+    a writer closed after a failure writes nothing more.
+
+    A writer that is never closed is closed when the interpreter exits, so
+    its pending saves are written before the background thread is stopped.
+
+    Attributes:
+        filename (str): The habits JSON file.
+        delay (float): Seconds a write waits for more saves of the same burst.
+        version (tuple): Version of the file after the last write, or None.
+        writes (int): Number of completed writes.
+
+    Methods:
+        save(habits): Schedules a save of the habits.
+        flush(): Waits until every scheduled save is written.
+        close(): Flushes and stops the background thread.
+    """
+
+    def __init__(self, filename, delay=0.01, version=None):
+        """
+        Initializes a CoalescingWriter and starts its background thread.
+
+        Args:
+            filename (str): The habits JSON file.
+            delay (float): Seconds a write waits for more saves of the same burst.
+            version (tuple, optional): Expected version of the file, as returned by
+                load_habits_with_version. Enables the version checks.
+        """
+        self.filename = filename
+        self.delay = delay
+        self.version = version
+        self.writes = 0
+        self._check_version = version is not None
+        self._condition = threading.Condition()
+        self._pending = None
+        self._submitted = 0
+        self._written = 0
+        self._errors = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='CoalescingWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def save(self, habits):
+        """
+        Schedules a save of the habits and returns without waiting for it.
+
+        The records are taken immediately, so the habits may change afterwards.
+
+        Args:
+            habits (iterable): The habits to save.
+
+        Raises:
+            ValueError: If the writer is closed.
+        """
+        records = [habit_to_record(habit) for habit in habits]
+        with self._condition:
+            if self._closed:
+                raise ValueError('The writer is closed.')
+            self._pending = records
+            self._submitted += 1
+            self._condition.notify_all()
+
+    def flush(self):
+        """
+        Waits until every save scheduled so far is written.
+
+        Raises:
+            VersionConflictError: If another writer changed the file.
+            OSError: If a write failed.
+        """
+        with self._condition:
+            target = self._submitted
+            self._condition.wait_for(lambda: self._written >= target or self._errors)
+            self._raise_errors()
+
+    def close(self):
+        """
+        Writes the pending saves, unless a write failed, and stops the background thread.
+
+        Raises:
+            VersionConflictError: If another writer changed the file.
+            OSError: If a write failed.
+        """
+        atexit.unregister(self.close)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        with self._condition:
+            self._raise_errors()
+
+    def _raise_errors(self):
+        """
+        Raises the failed writes not reported yet, the latest one with the earlier ones as its context.
+        """
+        if not self._errors:
+            return
+        errors, self._errors = self._errors, []
+        self._condition.notify_all()
+        for earlier, later in zip(errors, errors[1:]):
+            later.__context__ = earlier
+        raise errors[-1]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or (self._pending is not None and not self._errors))
+                if self._pending is None or self._errors:
+                    return
+                # Let the rest of the burst arrive before taking the records.
+                self._condition.wait_for(lambda: self._closed, self.delay)
+                records, self._pending = self._pending, None
+                submitted = self._submitted
+            try:
+                version = save_records_to_json_file(records, self.filename,
+                                                    self.version if self._check_version else None)
+            except Exception as error:
+                with self._condition:
+                    self._errors.append(error)
+                    self._written = submitted
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                self.version = version
+                self.writes += 1
+                self._written = submitted
+                self._condition.notify_all()
+
@@ -0,0 +1,147 @@
+"""
+Compact text encoding of completion histories.
+
+The completed days of a habit are stored as its runs of consecutive days.
+Every run becomes two numbers, the gap since the previous run and the run
+length, written as LEB128 varints and base64 encoded. The first gap is
+counted from the habit's start date and may be negative. Years of daily
+completions fit in a few bytes per run instead of 14 characters per date,
+and both directions are vectorized with NumPy.
+"""
+import base64
+
+import numpy as np
+
+from src.CompletionBitmap import CompletionBitmap
+from src.streak_engine import completion_runs
+
+
+def encode_varints(values):
+    """
+    Encodes non-negative integers as consecutive LEB128 varints.
+
+    Args:
+        values (np.ndarray): Integers below 2**63.
+
+    Returns:
+        np.ndarray: The encoded bytes as a uint8 array.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    sizes = _varint_sizes(values)
+    owners = np.repeat(np.arange(len(values)), sizes)
+    positions = np.arange(len(owners)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    encoded = (values[owners] >> (positions * 7).astype(np.uint64)) & np.uint64(0x7f)
+    encoded |= (positions < sizes[owners] - 1).astype(np.uint64) << np.uint64(7)
+    return encoded.astype(np.uint8)
+
+
+def _varint_sizes(values):
+    """
+    Returns the number of bytes of the varint of every value.
+    """
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def decode_varints(data):
+    """
+    Decodes consecutive LEB128 varints.
+
+    Args:
+        data (bytes): The encoded bytes.
+
+    Returns:
+        np.ndarray: The decoded integers as an int64 array.
+
+    Raises:
+        ValueError: If the last varint is truncated.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    last_bytes = data < 0x80
+    if not last_bytes[-1]:
+        raise ValueError('Truncated varint.')
+    ends = np.flatnonzero(last_bytes) + 1
+    starts = np.concatenate(([0], ends[:-1]))
+    positions = np.arange(len(data)) - np.repeat(starts, ends - starts)
+    parts = (data & 0x7f).astype(np.uint64) << (positions * 7).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+def encode_completions(habits):
+    """
+    Encodes the completed days of many habits in one vectorized pass.
+
+    Args:
+        habits (list): List of Habit objects.
+
+    Returns:
+        list: The encoded completions of every habit, as ASCII strings.
+    """
+    if not habits:
+        return []
+    first_days, lengths, owners = completion_runs(habits)
+    origins = np.fromiter((habit.start_date.toordinal() for habit in habits), dtype=np.int64, count=len(habits))
+
+    # Gap before every run: from the previous run's end, or from the start date for a habit's first run.
+    previous_ends = np.concatenate(([0], first_days[:-1] + lengths[:-1]))
+    firsts = np.ones(len(first_days), dtype=bool)
+    firsts[1:] = owners[1:] != owners[:-1]
+    gaps = first_days - previous_ends - 1
+    first_offsets = first_days[firsts] - origins[owners[firsts]]
+    # Zigzag encoding keeps negative first offsets small.
+    gaps[firsts] = (first_offsets << 1) ^ (first_offsets >> 63)
+
+    values = np.empty(2 * len(first_days), dtype=np.int64)
+    values[0::2] = gaps
+    values[1::2] = lengths - 1
+    encoded = encode_varints(values)
+
+    value_ends = np.cumsum(_varint_sizes(values.astype(np.uint64)))
+    run_counts = np.bincount(owners, minlength=len(habits))
+    byte_ends = np.concatenate(([0], value_ends))[2 * np.cumsum(run_counts)]
+    data = encoded.tobytes()
+    byte_starts = np.concatenate(([0], byte_ends[:-1]))
+    return [base64.b64encode(data[start:end]).decode('ascii')
+            for start, end in zip(byte_starts.tolist(), byte_ends.tolist())]
+
+
+def decode_completions(text, start_date):
+    """
+    Decodes completions written by encode_completions.
+
+    Args:
+        text (str): The encoded completions.
+        start_date (date or datetime): The start date of the habit.
+
+    Returns:
+        CompletionBitmap: The completed days.
+
+    Raises:
+        ValueError: If the text is not a valid encoding.
+    """
+    values = decode_varints(base64.b64decode(text, validate=True))
+    if len(values) % 2:
+        raise ValueError('Incomplete completion run.')
+    origin = start_date.toordinal()
+    if not len(values):
+        return CompletionBitmap(start_date)
+
+    lengths = values[1::2] + 1
+    # Every run starts one day after the previous run's end plus its gap.
+    steps = np.empty(len(lengths), dtype=np.int64)
+    first_offset = int(values[0])
+    steps[0] = origin + ((first_offset >> 1) ^ -(first_offset & 1))
+    steps[1:] = lengths[:-1] + values[2::2] + 1
+    first_days = np.cumsum(steps)
+
+    bitmap_origin = min(origin, int(first_days[0]))
+    span = int(first_days[-1] + lengths[-1]) - bitmap_origin
+    edges = np.zeros(span + 1, dtype=np.int8)
+    edges[first_days - bitmap_origin] += 1
+    edges[first_days + lengths - bitmap_origin] -= 1
+    bits = np.cumsum(edges[:-1], dtype=np.int8).astype(bool)
+    return CompletionBitmap.from_bytes(bitmap_origin, np.packbits(bits, bitorder='little').tobytes())
@@ -0,0 +1,290 @@
+from datetime import date
+
+import numpy as np
+
+from src.streak_engine import completion_ordinals
+
+
+class DateIndex:
+    """
+    Inverted index from completion days to the habits completed on them.
+
+    Every indexed habit gets an integer id. The index maps each day ordinal to
+    a sorted NumPy array of the ids of the habits completed on that day, and
+    keeps the completed day ordinals of every habit in a sorted array, so "who
+    completed what on day D" and range counts cost time in the size of the
+    answer instead of a scan of every habit's history.
+
+    The index listens to the completion changes of the indexed habits. Dates
+    assigned directly to ``completed_dates`` bypass the listeners; call
+    refresh(habit) afterwards.
+
+    Attributes:
+        habits (list): The indexed habits, in insertion order.
+
+    Methods:
+        add_habits(habits): Indexes many habits in one vectorized pass.
+        add_habit(habit): Indexes one habit.
+        remove_habit(habit): Removes a habit from the index.
+        refresh(habit): Re-reads the completions of a habit.
+        habit_id(habit): Returns the id of an indexed habit.
+        habits_on(day): Habits completed on a day.
+        names_on(day): Names of the habits completed on a day.
+        days_between(habit, first_day, last_day): Completed days of a habit in a range.
+        count_between(habit, first_day, last_day): Number of completed days of a habit in a range.
+        completions_between(first_day, last_day): Habits completed on each day of a range.
+    """
+
+    def __init__(self, habits=()):
+        """
+        Initializes a DateIndex object.
+
+        Args:
+            habits (iterable): Habits to index initially.
+        """
+        self._habits = []
+        self._ids = {}
+        self._ordinals = []
+        self._days = {}
+        self._day_keys = np.empty(0, dtype=np.int64)
+        self.add_habits(habits)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, habit):
+        return habit in self._ids
+
+    @property
+    def habits(self):
+        return list(self._ids)
+
+    def add_habits(self, habits):
+        """
+        Indexes many habits, reading all their completions in one vectorized pass.
+
+        Args:
+            habits (iterable): The habits to add. Habits already indexed are skipped.
+        """
+        new_habits = []
+        for habit in habits:
+            if habit not in self._ids:
+                self._ids[habit] = len(self._habits)
+                self._habits.append(habit)
+                new_habits.append(habit)
+        if not new_habits:
+            return
+
+        first_id = len(self._ordinals)
+        ordinals, owners = completion_ordinals(new_habits)
+        counts = np.bincount(owners, minlength=len(new_habits))
+        self._ordinals.extend(np.split(ordinals, np.cumsum(counts)[:-1]))
+        for habit in new_habits:
+            habit.add_listener(self._on_change)
+        if not len(ordinals):
+            return
+
+        # Completions span few distinct days, so sorting small day offsets is
+        # a fast radix sort. The sort is stable, which keeps the ids of every
+        # day in ascending order.
+        first_day = int(ordinals.min())
+        offsets = ordinals - first_day
+        if offsets.max() < 1 << 16:
+            offsets = offsets.astype(np.uint16)
+        order = np.argsort(offsets, kind='stable')
+        day_counts = np.bincount(offsets)
+        days = np.flatnonzero(day_counts)
+        ids = owners[order] + first_id
+        new_days = []
+        for day, day_ids in zip((days + first_day).tolist(), np.split(ids, np.cumsum(day_counts[days])[:-1])):
+            existing = self._days.get(day)
+            if existing is None:
+                self._days[day] = day_ids
+                new_days.append(day)
+            else:
+                self._days[day] = np.concatenate([existing, day_ids])
+        self._insert_day_keys(new_days)
+
+    def add_habit(self, habit):
+        """
+        Indexes one habit and starts listening to its completion changes.
+
+        Args:
+            habit (Habit): The habit to add.
+        """
+        self.add_habits([habit])
+
+    def remove_habit(self, habit):
+        """
+        Removes a habit from the index. Its id is not reused.
+
+        Args:
+            habit (Habit): The habit to remove.
+        """
+        habit_id = self._ids.pop(habit, None)
+        if habit_id is None:
+            return
+        habit.remove_listener(self._on_change)
+        self._discard_days(self._ordinals[habit_id].tolist(), habit_id)
+        self._ordinals[habit_id] = self._ordinals[habit_id][:0]
+        self._habits[habit_id] = None
+
+    def refresh(self, habit):
+        """
+        Re-reads all completions of an indexed habit.
+
+        Needed after completions were changed without notifying listeners, for
+        example by assigning ``completed_dates``.
+
+        Args:
+            habit (Habit): The habit to refresh.
+        """
+        habit_id = self._ids[habit]
+        self._discard_days(self._ordinals[habit_id].tolist(), habit_id)
+        self._ordinals[habit_id] = np.array(habit.completed_dates.ordinals(), dtype=np.int64)
+        self._add_days(self._ordinals[habit_id].tolist(), habit_id)
+
+    def _insert_day_keys(self, ordinals):
+        """
+        Merges new day ordinals into the sorted day keys with a single insert.
+        """
+        if ordinals:
+            ordinals = np.sort(np.array(ordinals, dtype=np.int64))
+            self._day_keys = np.insert(self._day_keys, np.searchsorted(self._day_keys, ordinals), ordinals)
+
+    def _add_days(self, ordinals, habit_id):
+        """
+        Adds a habit id to the entries of some days.
+        """
+        new_days = []
+        for ordinal in ordinals:
+            ids = self._days.get(ordinal)
+            if ids is None:
+                self._days[ordinal] = np.array([habit_id], dtype=np.int64)
+                new_days.append(ordinal)
+            else:
+                self._days[ordinal] = np.insert(ids, np.searchsorted(ids, habit_id), habit_id)
+        self._insert_day_keys(new_days)
+
+    def _discard_days(self, ordinals, habit_id):
+        """
+        Removes a habit id from the entries of some days, dropping the emptied days in a single delete.
+        """
+        empty_days = []
+        for ordinal in ordinals:
+            ids = self._days[ordinal]
+            if len(ids) == 1:
+                del self._days[ordinal]
+                empty_days.append(ordinal)
+            else:
+                self._days[ordinal] = np.delete(ids, np.searchsorted(ids, habit_id))
+        if empty_days:
+            self._day_keys = np.delete(self._day_keys, np.searchsorted(self._day_keys, empty_days))
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that updates the entries of the changed days.
+        """
+        habit_id = self._ids[habit]
+        ordinals = self._ordinals[habit_id]
+        changed = np.unique(np.array([day.toordinal() for day in days], dtype=np.int64))
+        positions = np.searchsorted(ordinals, changed)
+        present = np.zeros(len(changed), dtype=bool)
+        inside = positions < len(ordinals)
+        present[inside] = ordinals[positions[inside]] == changed[inside]
+        if event == 'completed':
+            added = ~present
+            self._ordinals[habit_id] = np.insert(ordinals, positions[added], changed[added])
+            self._add_days(changed[added].tolist(), habit_id)
+        elif event == 'incomplete':
+            self._ordinals[habit_id] = np.delete(ordinals, positions[present])
+            self._discard_days(changed[present].tolist(), habit_id)
+
+    def habit_id(self, habit):
+        """
+        Returns the id of an indexed habit.
+
+        Args:
+            habit (Habit): An indexed habit.
+
+        Returns:
+            int: The id, assigned in insertion order.
+        """
+        return self._ids[habit]
+
+    def habits_on(self, day):
+        """
+        Retrieves the habits completed on a day.
+
+        Args:
+            day (date or datetime): The day.
+
+        Returns:
+            list: The habits, in insertion order.
+        """
+        ids = self._days.get(day.toordinal())
+        if ids is None:
+            return []
+        return [self._habits[habit_id] for habit_id in ids.tolist()]
+
+    def names_on(self, day):
+        """
+        Retrieves the names of the habits completed on a day.
+
+        Args:
+            day (date or datetime): The day.
+
+        Returns:
+            list: Names of the habits, in insertion order.
+        """
+        return [habit.name for habit in self.habits_on(day)]
+
+    def days_between(self, habit, first_day, last_day):
+        """
+        Retrieves the completed days of a habit within a date range.
+
+        Args:
+            habit (Habit): An indexed habit.
+            first_day (date or datetime): First day of the range.
+            last_day (date or datetime): Last day of the range, included.
+
+        Returns:
+            list: The completed dates in ascending order.
+        """
+        ordinals = self._ordinals[self._ids[habit]]
+        start, stop = np.searchsorted(ordinals, [first_day.toordinal(), last_day.toordinal() + 1])
+        return [date.fromordinal(ordinal) for ordinal in ordinals[start:stop].tolist()]
+
+    def count_between(self, habit, first_day, last_day):
+        """
+        Counts the completed days of a habit within a date range.
+
+        Args:
+            habit (Habit): An indexed habit.
+            first_day (date or datetime): First day of the range.
+            last_day (date or datetime): Last day of the range, included.
+
+        Returns:
+            int: Number of completed days in the range.
+        """
+        start, stop = np.searchsorted(self._ordinals[self._ids[habit]], [first_day.toordinal(), last_day.toordinal() + 1])
+        return int(stop - start)
+
+    def completions_between(self, first_day, last_day):
+        """
+        Retrieves the habits completed on each day of a date range.
+
+        Days without completions are left out.
+
+        Args:
+            first_day (date or datetime): First day of the range.
+            last_day (date or datetime): Last day of the range, included.
+
+        Returns:
+            dict: Completed habits per date, in ascending date order.
+        """
+        start, stop = np.searchsorted(self._day_keys, [first_day.toordinal(), last_day.toordinal() + 1])
+        return {
+            date.fromordinal(ordinal): [self._habits[habit_id] for habit_id in self._days[ordinal].tolist()]
+            for ordinal in self._day_keys[start:stop].tolist()
+        }
@@ -0,0 +1,287 @@
+import asyncio
+import heapq
+import itertools
+
+from collections import defaultdict
+from datetime import date, datetime
+
+import numpy as np
+
+from src.schedule_index import next_due_ordinal, schedule_index
+from src.streak_engine import completion_matrix
+
+# Windows, in days, searched for open due days with one vectorized pass each.
+# Every schedule has a due day within the last one; habits completed on all
+# of its due days are handled one by one.
+SEARCH_WINDOWS = (64, 400)
+
+# Number of habits evaluated together in one matrix.
+BLOCK_SIZE = 4096
+
+
+class DueScheduler:
+    """
+    Priority queue of the next due occurrence of every scheduled habit.
+
+    The next due day of a habit is the first day of its schedule, on or after
+    its start date and the scheduler's current day, on which it was not
+    completed yet. Entries live in a binary heap ordered by due day, so adding,
+    rescheduling and popping a habit cost O(log n). Rescheduled entries are
+    left in the heap and skipped when they reach the top.
+
+    The scheduler listens to the completion changes of its habits, so
+    completing a habit on its due day moves it to its next due day.
+
+    Attributes:
+        today (date): The current day; due days are never before it.
+
+    Methods:
+        add_habit(habit) / add_habits(habits): Schedules habits.
+        remove_habit(habit): Stops scheduling a habit.
+        next_due(habit): Returns the next due day of a habit.
+        peek(): Returns the earliest due habit and day without removing it.
+        pop_due_until(now): Removes and returns the habits due on or before a day.
+        run(callback, ...): Asyncio loop that fires reminders when habits become due.
+    """
+
+    def __init__(self, habits=(), today=None):
+        """
+        Initializes a DueScheduler object.
+
+        Args:
+            habits (iterable): Habits to schedule initially.
+            today (datetime, optional): The current day. Defaults to the current date.
+        """
+        self._today = (today or datetime.now()).toordinal()
+        self._heap = []
+        self._entries = {}
+        self._sequence = itertools.count()
+        self.add_habits(habits)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, habit):
+        return habit in self._entries
+
+    @property
+    def today(self):
+        return date.fromordinal(self._today)
+
+    def _first_open_day(self, habit, ordinal):
+        """
+        Returns the first due day of a habit on or after a day that is not completed yet.
+        """
+        ordinal = max(ordinal, habit.start_date.toordinal())
+        schedule_key = habit.schedule_key()
+        completed = habit.completed_dates
+        due = next_due_ordinal(schedule_key, ordinal)
+        while due is not None and completed.contains_ordinal(due):
+            due = next_due_ordinal(schedule_key, due + 1)
+        return due
+
+    def _first_open_days(self, habits, floor):
+        """
+        Returns the first open due day of many habits on or after a day.
+
+        Habits sharing a schedule are evaluated together as habits x due-days
+        matrices, first over a short window and then, for the habits without
+        an open due day in it, over longer SEARCH_WINDOWS.
+        """
+        result = [None] * len(habits)
+        groups = defaultdict(list)
+        for position, habit in enumerate(habits):
+            groups[habit.schedule_key()].append(position)
+
+        for schedule_key, group in groups.items():
+            for block in range(0, len(group), BLOCK_SIZE):
+                members = group[block:block + BLOCK_SIZE]
+                for horizon in SEARCH_WINDOWS:
+                    members = self._search_window(habits, members, schedule_key, floor, horizon, result)
+                for position in members:
+                    result[position] = self._first_open_day(habits[position], floor)
+        return result
+
+    @staticmethod
+    def _search_window(habits, members, schedule_key, floor, horizon, result):
+        """
+        Fills the open due days found within ``horizon`` days and returns the members without one.
+        """
+        last = floor + horizon - 1
+        due = schedule_index.due_ordinals(schedule_key, floor, last)
+        if not members or not len(due):
+            return members
+        block_habits = [habits[position] for position in members]
+        starts = np.fromiter((habit.start_date.toordinal() for habit in block_habits), dtype=np.int64,
+                             count=len(block_habits))
+        open_days = ~completion_matrix(block_habits, floor, last)[:, due - floor] & (due[None, :] >= starts[:, None])
+        first = open_days.argmax(axis=1)
+        found = open_days[np.arange(len(members)), first]
+        for position, day in zip(np.asarray(members)[found].tolist(), due[first[found]].tolist()):
+            result[position] = day
+        return np.asarray(members)[~found].tolist()
+
+    def _push(self, habit, floor, due=False):
+        """
+        Schedules a habit at its first open due day on or after ``floor``.
+
+        ``due`` may pass that day when it is already known.
+        """
+        old = self._entries.pop(habit, None)
+        if old is not None:
+            old[-1] = None
+        if due is False:
+            due = self._first_open_day(habit, floor)
+        if due is None:
+            # The schedule has no due days; the habit stays known without an entry.
+            self._entries[habit] = None
+            return
+        # [due day, tie breaker, floor, habit]; the habit is set to None when the entry is replaced.
+        entry = [due, next(self._sequence), floor, habit]
+        self._entries[habit] = entry
+        heapq.heappush(self._heap, entry)
+
+    def add_habits(self, habits):
+        """
+        Schedules many habits, building the heap in one pass.
+
+        Args:
+            habits (iterable): The habits to add. Habits already scheduled are skipped.
+        """
+        new_habits = []
+        for habit in habits:
+            if habit not in self._entries:
+                self._entries[habit] = None
+                new_habits.append(habit)
+
+        for habit, due in zip(new_habits, self._first_open_days(new_habits, self._today)):
+            habit.add_listener(self._on_change)
+            if due is not None:
+                entry = self._entries[habit] = [due, next(self._sequence), self._today, habit]
+                self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def add_habit(self, habit):
+        """
+        Schedules a habit and starts listening to its completion changes.
+
+        Args:
+            habit (Habit): The habit to add.
+        """
+        if habit not in self._entries:
+            habit.add_listener(self._on_change)
+            self._push(habit, self._today)
+
+    def remove_habit(self, habit):
+        """
+        Stops scheduling a habit.
+
+        Args:
+            habit (Habit): The habit to remove.
+        """
+        habit.remove_listener(self._on_change)
+        entry = self._entries.pop(habit, None)
+        if entry is not None:
+            entry[-1] = None
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that reschedules a habit when one of its open due days changes.
+        """
+        entry = self._entries.get(habit)
+        if entry is None:
+            return
+        due, floor = entry[0], entry[2]
+        ordinals = [day.toordinal() for day in days]
+        # The floor is kept, so completed days are skipped and reopened days return.
+        if event == 'completed' and due in ordinals:
+            self._push(habit, floor)
+        elif event == 'incomplete' and any(floor <= ordinal < due for ordinal in ordinals):
+            self._push(habit, floor)
+
+    def _discard_stale(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+
+    def next_due(self, habit):
+        """
+        Returns the next due day of a scheduled habit.
+
+        Args:
+            habit (Habit): A scheduled habit.
+
+        Returns:
+            date: The next due day, or None if the habit is not scheduled.
+        """
+        entry = self._entries.get(habit)
+        return None if entry is None else date.fromordinal(entry[0])
+
+    def peek(self):
+        """
+        Returns the habit that is due first without removing it.
+
+        Returns:
+            tuple: ``(habit, due date)``, or None when nothing is scheduled.
+        """
+        self._discard_stale()
+        if not self._heap:
+            return None
+        due, _, _, habit = self._heap[0]
+        return habit, date.fromordinal(due)
+
+    def pop_due_until(self, now=None):
+        """
+        Returns the habits due on or before a day and schedules their next occurrence.
+
+        The current day of the scheduler moves to ``now``. Every returned habit
+        is rescheduled at its first open due day after ``now``.
+
+        Args:
+            now (datetime, optional): The current day. Defaults to the current date.
+
+        Returns:
+            list: ``(habit, due date)`` pairs in due order.
+        """
+        now = (now or datetime.now()).toordinal()
+        self._today = max(self._today, now)
+        due_habits = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            due, _, _, habit = heapq.heappop(self._heap)
+            del self._entries[habit]
+            due_habits.append((habit, date.fromordinal(due)))
+        habits = [habit for habit, _ in due_habits]
+        for habit, due in zip(habits, self._first_open_days(habits, now + 1)):
+            self._push(habit, now + 1, due)
+        return due_habits
+
+    async def run(self, callback, clock=datetime.now, interval=60.0):
+        """
+        Fires a reminder for every habit when it becomes due, until cancelled.
+
+        Each time a day starts, the habits due on it are popped and
+        ``callback(habit, due_date)`` is called for each of them; coroutine
+        callbacks are awaited. Between checks the loop sleeps until the next
+        due day starts, but never longer than ``interval`` seconds, so a
+        changed clock or newly scheduled habits are noticed.
+
+        Args:
+            callback (callable): Called as ``callback(habit, due_date)``.
+            clock (callable): Returns the current datetime.
+            interval (float): Maximum number of seconds between checks.
+        """
+        while True:
+            now = clock()
+            for habit, due in self.pop_due_until(now):
+                result = callback(habit, due)
+                if asyncio.iscoroutine(result):
+                    await result
+
+            next_entry = self.peek()
+            delay = interval
+            if next_entry is not None:
+                starts = datetime.combine(next_entry[1], datetime.min.time())
+                delay = min(interval, max((starts - clock()).total_seconds(), 0))
+            await asyncio.sleep(delay)
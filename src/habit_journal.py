@@ -0,0 +1,177 @@
+import json
+import os
+
+from datetime import datetime
+from src.habit_tracker import habit_from_record, habit_to_record, load_habits_from_json_file, save_habits_to_json_file
+
+
+class HabitJournal:
+    """
+    Records habit changes in an append-only journal next to a JSON snapshot.
+
+    Each habit creation and each completion change is appended to the journal
+    as one JSON line, so recording a check-in costs a small append instead of
+    rewriting the whole habits file. Appends are fsynced in batches. The
+    journal is periodically compacted into the snapshot, which is an ordinary
+    habits JSON file, and is replayed on top of the snapshot when loading.
+
+    Attributes:
+        filename (str): Path of the journal file.
+        snapshot_filename (str): Path of the JSON snapshot file.
+        sync_every (int): Number of appended records after which the journal is fsynced.
+        compact_every (int): Number of appended records after which the journal is compacted, or None.
+        habits (dict): The tracked habits by name.
+
+    Methods:
+        load(): Loads the snapshot, replays the journal and returns the habits.
+        add_habit(habit): Records a new habit and starts tracking its completions.
+        sync(): Flushes pending records to disk.
+        compact(): Writes all habits to the snapshot and empties the journal.
+        close(): Syncs and closes the journal file.
+    """
+
+    def __init__(self, filename, snapshot_filename, sync_every=100, compact_every=None):
+        """
+        Initializes a HabitJournal.
+
+        Args:
+            filename (str): Path of the journal file.
+            snapshot_filename (str): Path of the JSON snapshot file.
+            sync_every (int): Number of appended records after which the journal is fsynced.
+            compact_every (int, optional): Number of appended records after which the journal is compacted.
+        """
+        self.filename = filename
+        self.snapshot_filename = snapshot_filename
+        self.sync_every = sync_every
+        self.compact_every = compact_every
+        self.habits = {}
+        self._file = None
+        self._unsynced = 0
+        self._since_compaction = 0
+
+    def load(self):
+        """
+        Loads the snapshot, replays the journal on top of it and tracks the result.
+
+        A truncated last line, left by a crash in the middle of an append, is
+        cut off the journal, so the next append starts on a fresh line.
+
+        Returns:
+            list: List of loaded Habit objects.
+        """
+        self.habits = {}
+        if os.path.exists(self.snapshot_filename):
+            for habit in load_habits_from_json_file(self.snapshot_filename):
+                self.habits[habit.name] = habit
+
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r+b') as file:
+                good_offset = 0
+                for line in file:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError('Torn journal record.')
+                        record = json.loads(line)
+                    except ValueError:
+                        file.truncate(good_offset)
+                        break
+                    good_offset += len(line)
+                    self._replay(record)
+                    self._since_compaction += 1
+
+        for habit in self.habits.values():
+            habit.add_listener(self._on_change)
+        return list(self.habits.values())
+
+    def _replay(self, record):
+        """
+        Applies one journal record to the tracked habits.
+        """
+        if record['op'] == 'create':
+            # A habit already present in the snapshot was created before the last compaction.
+            if record['habit']['name'] not in self.habits:
+                habit = habit_from_record(record['habit'])
+                self.habits[habit.name] = habit
+            return
+
+        habit = self.habits.get(record['name'])
+        if habit is None:
+            return
+        # Replayed through the habit API, so streaks and dirty flags follow the changes.
+        days = [datetime.fromisoformat(day) for day in record['dates']]
+        if record['op'] == 'completed':
+            habit.mark_completed_many(days)
+        else:
+            for day in days:
+                habit.mark_as_incomplete(day)
+
+    def add_habit(self, habit):
+        """
+        Records a new habit and starts tracking its completions.
+
+        Args:
+            habit (Habit): The habit to add.
+
+        Raises:
+            ValueError: If a habit with the same name is already tracked.
+        """
+        if habit.name in self.habits:
+            raise ValueError("A habit named '{}' already exists.".format(habit.name))
+        self.habits[habit.name] = habit
+        habit.add_listener(self._on_change)
+        self._append({'op': 'create', 'habit': habit_to_record(habit)})
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that appends completion changes to the journal.
+        """
+        self._append({'op': event, 'name': habit.name, 'dates': [day.isoformat() for day in days]})
+
+    def _append(self, record):
+        """
+        Appends a record, syncing and compacting when the configured thresholds are reached.
+        """
+        if self._file is None:
+            self._file = open(self.filename, 'a')
+        self._file.write(json.dumps(record) + '\n')
+        self._unsynced += 1
+        self._since_compaction += 1
+
+        if self.compact_every and self._since_compaction >= self.compact_every:
+            self.compact()
+        elif self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """
+        Flushes the pending journal records and fsyncs the journal file.
+        """
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def compact(self):
+        """
+        Writes all tracked habits to the snapshot and empties the journal.
+
+        The snapshot is saved atomically before the journal is truncated. If
+        the process stops in between, replaying the old journal on the new
+        snapshot gives the same habits.
+        """
+        save_habits_to_json_file(list(self.habits.values()), self.snapshot_filename)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.filename, 'w')
+        self._unsynced = 0
+        self._since_compaction = 0
+
+    def close(self):
+        """
+        Syncs and closes the journal file.
+        """
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,343 @@
+"""
+Serves habits held in memory to many concurrent clients over a local socket.
+
+The protocol is newline-delimited JSON: every request is one JSON object on
+one line, and every response is one JSON object on one line, in request
+order. Requests carrying an ``id`` get it back in their response.
+
+    {"op": "complete", "name": "Sleep Early Daily", "date": "2024-01-03"}
+    {"op": "incomplete", "name": "Sleep Early Daily", "date": "2024-01-03"}
+    {"op": "streak", "name": "Sleep Early Daily", "today": "2024-01-04"}
+    {"op": "stats"}
+    {"op": "habits"}
+    {"op": "flush"}
+
+Changes are applied in memory and written to the habits JSON file by a
+write-behind task, which saves all changes of a cycle in one write on a
+worker thread. With a segment directory instead of a file, only the
+changed habits are written. Start the server with:
+
+    python -m src.habit_service habits.json --port 8765
+"""
+import asyncio
+import json
+import logging
+import os
+
+from datetime import datetime
+
+from src.DailyHabit import DailyHabit
+from src.habit_statistics import HabitStatistics
+from src.habit_tracker import (habit_segments, habit_to_record, load_habits_from_json_file,
+                               save_records_to_json_file, save_records_to_segments)
+from src.MonthlyHabit import MonthlyHabit
+from src.schedule_index import period_streaks
+from src.WeeklyHabit import WeeklyHabit
+
+# Pending connections queued by the listening socket, sized for thousands of clients connecting at once.
+BACKLOG = 4096
+
+logger = logging.getLogger(__name__)
+
+
+class HabitService:
+    """
+    Asyncio server holding habits in memory with write-behind persistence.
+
+    Requests are handled on the event loop without blocking, so in-memory
+    queries answer immediately whatever the number of connected clients.
+    Every completion change sets a dirty flag; a background task checks the
+    flag every ``flush_interval`` seconds and, when set, takes the records of
+    all habits on the loop and writes them on a worker thread. Changes made
+    during a write are picked up by the next cycle, and a failed write is
+    logged and retried by it.
+
+    Attributes:
+        filename (str): The habits JSON file or segment directory.
+        flush_interval (float): Seconds between write-behind cycles.
+        habits (dict): The habits by name.
+        statistics (HabitStatistics): Aggregates of the habits.
+        writes (int): Number of completed writes.
+
+    Methods:
+        load(): Loads the habits from the JSON file.
+        start(host, port): Starts serving and the write-behind task.
+        stop(): Stops serving and writes the pending changes.
+        flush(): Writes the pending changes now.
+        handle(request): Answers one request.
+    """
+
+    def __init__(self, filename, flush_interval=1.0):
+        """
+        Initializes a HabitService.
+
+        Args:
+            filename (str): The habits JSON file or segment directory.
+            flush_interval (float): Seconds between write-behind cycles.
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.habits = {}
+        self.statistics = HabitStatistics()
+        self.writes = 0
+        self._dirty = False
+        self._server = None
+        self._flusher = None
+        self._flush_lock = None
+
+    def load(self):
+        """
+        Loads the habits from the JSON file and starts tracking their changes.
+
+        Requests address habits by name, so a file holding two habits with the
+        same name is refused: one of them could never be reached and the next
+        write would drop it.
+
+        Returns:
+            list: The loaded habits.
+
+        Raises:
+            ValueError: If two habits have the same name.
+        """
+        habits = load_habits_from_json_file(self.filename)
+        names = set()
+        for habit in habits:
+            if habit.name in names:
+                raise ValueError("Duplicate habit name '{}'.".format(habit.name))
+            names.add(habit.name)
+        for habit in habits:
+            self.habits[habit.name] = habit
+            self.statistics.add_habit(habit)
+            habit.add_listener(self._on_change)
+        return list(self.habits.values())
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that marks the state as dirty.
+        """
+        self._dirty = True
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Starts serving clients and the write-behind task.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on; 0 picks a free port.
+
+        Returns:
+            tuple: The ``(host, port)`` the server listens on.
+        """
+        self._flush_lock = asyncio.Lock()
+        self._server = await asyncio.start_server(self._serve_client, host, port, backlog=BACKLOG)
+        self._flusher = asyncio.ensure_future(self._write_behind())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """
+        Stops serving clients and writes the pending changes.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    async def _write_behind(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # flush() keeps the changes dirty, so the next cycle retries the write.
+                logger.exception('Writing %s failed; retrying in %s seconds.', self.filename, self.flush_interval)
+
+    async def flush(self):
+        """
+        Writes the habits to the JSON file if they changed since the last write.
+
+        The records are taken on the event loop, so the worker thread never
+        sees a habit while it changes.
+
+        Returns:
+            bool: True if a write happened.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return False
+            self._dirty = False
+            if os.path.isdir(self.filename):
+                # Segment directories only need the records of the changed habits, which were loaded from them.
+                changed = [habit for habit in self.habits.values() if habit.dirty]
+                records = list(zip(habit_segments(changed), (habit_to_record(habit) for habit in changed)))
+                save = save_records_to_segments
+            else:
+                changed = list(self.habits.values())
+                records = [habit_to_record(habit) for habit in changed]
+                save = save_records_to_json_file
+            for habit in changed:
+                habit.dirty = False
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, save, records, self.filename)
+            except BaseException:
+                self._dirty = True
+                for habit in changed:
+                    habit.dirty = True
+                raise
+            self.writes += 1
+            return True
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('A request must be a JSON object.')
+                    if request.get('op') == 'flush':
+                        response = {'ok': True, 'written': await self.flush()}
+                    else:
+                        response = self.handle(request)
+                except (KeyError, TypeError, ValueError, OSError) as error:
+                    # A failed flush keeps its changes dirty for the next write-behind cycle.
+                    response = {'ok': False, 'error': str(error)}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _habit(self, request):
+        name = request.get('name')
+        if name not in self.habits:
+            raise KeyError("No habit named '{}'.".format(name))
+        return self.habits[name]
+
+    @staticmethod
+    def _date(request, key):
+        value = request.get(key)
+        return datetime.fromisoformat(value) if value else datetime.now()
+
+    def handle(self, request):
+        """
+        Answers one request against the in-memory habits.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The response, with ``ok`` set to False and an ``error`` message on failure.
+        """
+        operation = request.get('op')
+        try:
+            if operation == 'complete':
+                habit = self._habit(request)
+                # Monthly and daily habits validate completions in mark_completed.
+                mark = getattr(habit, 'mark_completed', habit.mark_as_completed)
+                mark(self._date(request, 'date'))
+                return {'ok': True, 'streak': habit.streak_counter}
+            if operation == 'incomplete':
+                habit = self._habit(request)
+                habit.mark_as_incomplete(datetime.fromisoformat(request['date']))
+                return {'ok': True, 'streak': habit.streak_counter}
+            if operation == 'streak':
+                return dict(self.streak(self._habit(request), self._date(request, 'today')), ok=True)
+            if operation == 'stats':
+                return dict(self.stats(), ok=True)
+            if operation == 'habits':
+                return {'ok': True, 'habits': self.statistics.all_habits()}
+        except KeyError as error:
+            return {'ok': False, 'error': error.args[0]}
+        except ValueError as error:
+            return {'ok': False, 'error': str(error)}
+        return {'ok': False, 'error': "Unknown operation '{}'.".format(operation)}
+
+    @staticmethod
+    def streak(habit, today):
+        """
+        Returns the current and longest streak of a habit.
+
+        Daily habits count consecutive completed days; weekly and monthly
+        habits count consecutive completed due dates.
+
+        Args:
+            habit (Habit): The habit.
+            today (datetime): The reference date.
+
+        Returns:
+            dict: ``current`` and ``longest`` streak lengths.
+        """
+        if isinstance(habit, DailyHabit):
+            return {'current': habit.current_streak(today), 'longest': habit.longest_streak()}
+        current, longest, _ = period_streaks([habit], last_day=today)
+        return {'current': int(current[0]), 'longest': int(longest[0])}
+
+    def stats(self):
+        """
+        Returns the aggregates of the statistics view.
+
+        Returns:
+            dict: Habit names per periodicity and the longest daily streak.
+        """
+        return {
+            'daily': self.statistics.habits_with_same_frequency(DailyHabit),
+            'weekly': self.statistics.habits_with_same_frequency(WeeklyHabit),
+            'monthly': self.statistics.habits_with_same_frequency(MonthlyHabit),
+            'longest_daily_streak': self.statistics.daily_habits_longest_streak(),
+        }
+
+
+async def serve(filename, host='127.0.0.1', port=8765, flush_interval=1.0):
+    """
+    Loads the habits and serves them until cancelled, then writes the pending changes.
+
+    Args:
+        filename (str): The habits JSON file or segment directory.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        flush_interval (float): Seconds between write-behind cycles.
+    """
+    service = HabitService(filename, flush_interval)
+    service.load()
+    host, port = await service.start(host, port)
+    print('Serving {} habits on {}:{}'.format(len(service.habits), host, port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+def main(arguments=None):
+    """
+    Command line entry point of ``python -m src.habit_service``.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m src.habit_service', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filename', help='habits JSON file or segment directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--flush-interval', type=float, default=1.0, help='seconds between writes of changed habits')
+    arguments = parser.parse_args(arguments)
+    try:
+        asyncio.run(serve(arguments.filename, arguments.host, arguments.port, arguments.flush_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
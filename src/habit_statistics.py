@@ -0,0 +1,193 @@
+from collections import defaultdict
+
+from src.DailyHabit import DailyHabit
+
+
+class HabitStatistics:
+    """
+    Keeps the aggregates shown by the statistics view up to date incrementally.
+
+    The object listens to completion changes of every habit it tracks and only
+    recomputes what belongs to the changed habit, so reading an aggregate after
+    a small change does not rescan the whole collection.
+
+    Attributes:
+        habits (list): The tracked habits, in insertion order.
+
+    Methods:
+        add_habit(habit): Starts tracking a habit.
+        remove_habit(habit): Stops tracking a habit.
+        all_habits(): Names of all tracked habits.
+        current_daily_habits(): Names of the tracked daily habits.
+        habits_with_same_frequency(habit_type): Names of the habits of a type.
+        daily_habits_longest_streak(): Longest streak among daily habits.
+        dataframe(): DataFrame with one row of habit information per habit.
+    """
+
+    def __init__(self, habits=()):
+        """
+        Initializes a HabitStatistics object.
+
+        Args:
+            habits (iterable): Habits to track initially.
+        """
+        self._names = {}
+        self._by_type = defaultdict(dict)
+        self._daily_longest = {}
+        self._max_daily_longest = 0
+        self._max_is_stale = False
+        self._frame = None
+        self._rows = {}
+        self._next_row = 0
+        for habit in habits:
+            self.add_habit(habit)
+
+    @property
+    def habits(self):
+        return list(self._names)
+
+    def add_habit(self, habit):
+        """
+        Starts tracking a habit and listening to its completion changes.
+
+        Args:
+            habit (Habit): The habit to add.
+        """
+        if habit in self._names:
+            return
+        self._names[habit] = habit.name
+        self._by_type[type(habit)][habit] = habit.name
+        if isinstance(habit, DailyHabit):
+            self._update_longest(habit)
+        habit.add_listener(self._on_change)
+        if self._frame is not None:
+            self._append_row(habit)
+
+    def remove_habit(self, habit):
+        """
+        Stops tracking a habit.
+
+        Args:
+            habit (Habit): The habit to remove.
+        """
+        if habit not in self._names:
+            return
+        habit.remove_listener(self._on_change)
+        del self._names[habit]
+        del self._by_type[type(habit)][habit]
+        if self._daily_longest.pop(habit, 0) == self._max_daily_longest:
+            self._max_is_stale = True
+        if self._frame is not None:
+            self._frame = self._frame.drop(index=self._rows.pop(habit))
+            for column in ('Name', 'Type'):
+                self._frame[column] = self._frame[column].cat.remove_unused_categories()
+
+    def _append_row(self, habit):
+        """
+        Appends the row of a new habit to the cached DataFrame, keeping its categorical columns.
+        """
+        import pandas as pd
+        from pandas.api.types import union_categoricals
+        from src.statistics_1 import create_dataframe_of_habit
+
+        row = create_dataframe_of_habit([habit]).astype({'End Date': object})
+        row.index = [self._next_row]
+        frame = pd.concat([self._frame, row])
+        for column in ('Name', 'Type'):
+            frame[column] = union_categoricals([self._frame[column], row[column]])
+        self._frame = frame
+        self._rows[habit] = self._next_row
+        self._next_row += 1
+
+    def _on_change(self, habit, event, days):
+        """
+        Habit listener that refreshes the aggregates of the changed habit.
+        """
+        if isinstance(habit, DailyHabit):
+            self._update_longest(habit)
+        if self._frame is not None:
+            row = self._rows[habit]
+            self._frame.at[row, 'Completed Dates'] = len(habit.completed_dates)
+            self._frame.at[row, 'Broken'] = not habit.completed_dates
+            self._frame.at[row, 'End Date'] = habit.end_date
+            self._frame.at[row, 'Streak Count'] = habit.streak_counter
+
+    def _update_longest(self, habit):
+        """
+        Recomputes the longest streak of one daily habit and the maximum over all of them.
+        """
+        previous = self._daily_longest.get(habit, 0)
+        streak = habit.longest_streak()
+        self._daily_longest[habit] = streak
+        if streak >= self._max_daily_longest:
+            self._max_daily_longest = streak
+        elif previous == self._max_daily_longest:
+            # The habit may have held the maximum; find the new one on the next read.
+            self._max_is_stale = True
+
+    def all_habits(self):
+        """
+        Retrieves names of all tracked habits.
+
+        Returns:
+            list: Names of all tracked habits.
+        """
+        return list(self._names.values())
+
+    def current_daily_habits(self):
+        """
+        Retrieves names of the tracked daily habits.
+
+        Returns:
+            list: Names of the tracked daily habits.
+        """
+        return self.habits_with_same_frequency(DailyHabit)
+
+    def habits_with_same_frequency(self, habit_type):
+        """
+        Retrieves names of habits with the same periodicity.
+
+        Args:
+            habit_type (type): Type of Habit (DailyHabit, WeeklyHabit, MonthlyHabit).
+
+        Returns:
+            list: Names of habits with the specified periodicity.
+        """
+        names = []
+        for tracked_type, habits in self._by_type.items():
+            if issubclass(tracked_type, habit_type):
+                names.extend(habits.values())
+        return names
+
+    def daily_habits_longest_streak(self):
+        """
+        Finds the longest streak among daily habits.
+
+        Returns:
+            int: Length of the longest streak among daily habits.
+        """
+        if self._max_is_stale:
+            self._max_daily_longest = max(self._daily_longest.values(), default=0)
+            self._max_is_stale = False
+        return self._max_daily_longest
+
+    def dataframe(self):
+        """
+        Returns a pandas DataFrame containing information about each habit.
+
+        The DataFrame is built once and then updated in place when a habit's
+        completions change. Adding or removing a habit appends or drops its
+        row in a new DataFrame, so row labels are not reused and may have gaps.
+        Callers must not modify the returned DataFrame.
+
+        Returns:
+            pd.DataFrame: DataFrame with habit information.
+        """
+        if self._frame is None:
+            from src.statistics_1 import create_dataframe_of_habit
+
+            self._rows = {habit: row for row, habit in enumerate(self._names)}
+            self._next_row = len(self._rows)
+            # End dates may become dates or datetimes as habits are completed.
+            self._frame = create_dataframe_of_habit(list(self._names)).astype({'End Date': object})
+        return self._frame
@@ -1,69 +1,604 @@
-
+import gzip
+import io
 import json
-import sys
+import lzma
 import os
+import stat
+import tempfile
 
-# Get the absolute path of the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Add the parent directory (root directory) to the Python path
-parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
-sys.path.append(parent_dir)
-
-
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import quote
 from src.DailyHabit import DailyHabit
 from src.WeeklyHabit import WeeklyHabit
 from src.MonthlyHabit import MonthlyHabit
+from src.completion_codec import decode_completions, encode_completions
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Permissions of newly created habit files.
+DEFAULT_FILE_MODE = 0o644
+
+# Extension of the per-habit files of a segment directory.
+SEGMENT_SUFFIX = '.json'
+
+# Compression modules of the habit files, by file name extension.
+COMPRESSIONS = {'.gz': gzip, '.xz': lzma}
+
+def habit_to_record(habit, completed_runs=None):
+    """
+    Converts a habit object to a JSON-serializable dictionary.
+
+    Args:
+        habit (Habit): The habit to convert.
+        completed_runs (str, optional): The completions encoded by
+            completion_codec.encode_completions. When given, they are stored
+            as ``completed_runs`` instead of the list of ISO dates.
+
+    Returns:
+        dict: The habit record as stored in the JSON file.
+    """
+    record = {
+        'name': habit.name,
+        'type': type(habit).__name__,
+        'start_date': habit.start_date.isoformat(),
+        'broken': habit.broken,
+        'streak_count': getattr(habit, 'streak_count', None)
+    }
+    if completed_runs is None:
+        record['completed_dates'] = [date.isoformat() for date in habit.completed_dates]
+    else:
+        record['completed_runs'] = completed_runs
+    if isinstance(habit, WeeklyHabit):
+        record['weekdays'] = habit.weekdays
+    elif isinstance(habit, MonthlyHabit):
+        record['target_days'] = habit.target_days
+    return record
+
+def habits_to_records(habits, compact=False):
+    """
+    Converts habit objects to JSON-serializable dictionaries.
+
+    Args:
+        habits (list): List of Habit objects.
+        compact (bool): If True, completions are stored as delta-encoded runs
+            (``completed_runs``), encoded for all habits in one pass, instead of ISO dates.
+
+    Returns:
+        list: The habit records.
+    """
+    habits = list(habits)
+    if not compact:
+        return [habit_to_record(habit) for habit in habits]
+    return [habit_to_record(habit, runs) for habit, runs in zip(habits, encode_completions(habits))]
+
+HABIT_TYPES = {'DailyHabit': DailyHabit, 'WeeklyHabit': WeeklyHabit, 'MonthlyHabit': MonthlyHabit}
 
-def save_habits_to_json_file(habits, filename):
+def record_type(data):
     """
-    Saves a list of habit objects to a JSON file.
+    Determines the habit class described by a record without constructing it.
+
+    Args:
+        data (dict): The habit record.
+
+    Returns:
+        type: DailyHabit, WeeklyHabit or MonthlyHabit.
+    """
+    if data.get('weekdays'):
+        return WeeklyHabit
+    if data.get('target_days'):
+        return MonthlyHabit
+    return HABIT_TYPES.get(data.get('type'), DailyHabit)
+
+def habit_from_record(data, lazy=False):
+    """
+    Creates a habit object from a dictionary read from the JSON file.
+
+    Args:
+        data (dict): The habit record.
+        lazy (bool): If True, completion dates are parsed on first access instead of immediately.
+
+    Returns:
+        Habit: The DailyHabit, WeeklyHabit or MonthlyHabit described by the record.
+    """
+    habit_type = record_type(data)
+    if habit_type is WeeklyHabit:
+        habit = WeeklyHabit(data['name'], datetime.fromisoformat(data['start_date']), data['weekdays'])
+    elif habit_type is MonthlyHabit:
+        habit = MonthlyHabit(data['name'], datetime.fromisoformat(data['start_date']), data['target_days'])
+    else:
+        habit = DailyHabit(data['name'], datetime.fromisoformat(data['start_date']))
+
+    if 'completed_runs' in data:
+        # Run-encoded completions decode faster than deferring would save.
+        habit.completed_dates = decode_completions(data['completed_runs'], habit.start_date)
+    elif lazy:
+        habit.defer_completed_dates(data['completed_dates'])
+    else:
+        habit.completed_dates = {datetime.fromisoformat(date).date() for date in data['completed_dates']}
+    habit.broken = data['broken']
+    habit.streak_counter = data.get('streak_count') or 0
+    habit.dirty = False
+    return habit
+
+class VersionConflictError(Exception):
+    """
+    Raised when a file changed since the version a save expected.
+    """
+
+def file_version(filename):
+    """
+    Returns a token identifying the current content of a file.
+
+    Every save replaces the file with a new one, so the token changes with
+    each save. Compare tokens for equality only.
+
+    Args:
+        filename (str): The name of the file.
+
+    Returns:
+        tuple: The version token, or None if the file does not exist.
+    """
+    try:
+        return _stat_version(os.stat(filename))
+    except FileNotFoundError:
+        return None
+
+def _stat_version(stat_result):
+    return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+@contextmanager
+def locked(filename):
+    """
+    Holds an exclusive advisory lock on a file for writer processes.
+
+    Saving replaces the file itself, so the lock is taken on the directory
+    holding it, or on the directory itself for a segment directory. No lock
+    file is created, and writers of files sharing a directory are serialized
+    with each other. Only processes taking the lock are serialized; readers
+    never need it because saves are atomic. On platforms without ``fcntl``
+    no lock is taken.
+
+    Args:
+        filename (str): The name of the locked file or segment directory.
+    """
+    if fcntl is None:
+        yield
+        return
+    path = filename if os.path.isdir(filename) else os.path.dirname(os.path.abspath(filename))
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(descriptor)
+
+def save_habits_to_json_file(habits, filename, expected_version=None, compact=False):
+    """
+    Saves a list of habit objects to a JSON file or a segment directory.
+
+    If ``filename`` is a directory, every habit is stored in its own segment
+    file together with its position in the list. Only the habits that
+    changed since they were loaded from or last saved to this directory,
+    moved, or were not loaded from it are written. Segments of habits
+    missing from the list are removed. Files ending in ``.gz`` or ``.xz``
+    are compressed with gzip or lzma.
 
     Args:
         habits (list): List of Habit objects to be saved.
+        filename (str): The name of the JSON file or of the segment directory.
+        expected_version (tuple, optional): Only save if the file is still at
+            this version, as returned by load_habits_with_version or a previous save.
+        compact (bool): If True, completions are stored as delta-encoded runs instead of ISO dates.
+
+    Returns:
+        tuple: The version of the saved file or directory.
+
+    Raises:
+        VersionConflictError: If the file changed since ``expected_version``.
+    """
+    if not os.path.isdir(filename):
+        return save_records_to_json_file(habits_to_records(habits, compact), filename, expected_version)
+
+    habits = list(habits)
+    with locked(filename):
+        _check_version(filename, expected_version)
+        stored = _segment_files(filename)
+        changed = _assign_segments(habits, filename, stored)
+        _write_segments(zip(habit_segments(changed), habits_to_records(changed, compact)))
+        for segment in stored.difference(habit.segment[0] for habit in habits):
+            os.remove(segment)
+        version = file_version(filename)
+    for habit in changed:
+        habit.dirty = False
+    return version
+
+def save_records_to_json_file(records, filename, expected_version=None):
+    """
+    Atomically saves habit records, as returned by habit_to_record, to a JSON file.
+
+    The records are written and fsynced to a temporary file in the same
+    directory, which then replaces the target. A crash leaves either the old
+    or the new file, never a truncated one. Writers are serialized with an
+    advisory lock, and with ``expected_version`` a save fails instead of
+    overwriting changes another process saved in the meantime.
+
+    Records are plain data, so they can be taken on one thread and written
+    on another while the habits keep changing.
+
+    Args:
+        records (list): The habit records.
         filename (str): The name of the JSON file.
+        expected_version (tuple, optional): Only save if the file is still at this version.
 
     Returns:
-        None
+        tuple: The version of the saved file.
+
+    Raises:
+        VersionConflictError: If the file changed since ``expected_version``.
+    """
+    with locked(filename):
+        _check_version(filename, expected_version)
+        version = _write_atomically(records, filename)
+        _sync_directory(os.path.dirname(os.path.abspath(filename)))
+    return version
+
+def save_records_to_segments(records, directory):
+    """
+    Atomically writes habit records to their segment files in a segment directory.
+
+    Segments of other habits are left untouched, so the cost is proportional
+    to the number of records.
+
+    Args:
+        records (list): ``(segment, record)`` pairs, the segment as returned by
+            habit_segments and the record by habit_to_record.
+        directory (str): The segment directory.
+
+    Returns:
+        tuple: The version of the directory.
+    """
+    with locked(directory):
+        _write_segments(records)
+        return file_version(directory)
+
+def habit_segments(habits):
+    """
+    Returns the segments of habits loaded from or saved to a segment directory.
+
+    Args:
+        habits (list): The habits.
+
+    Returns:
+        list: The ``segment`` of every habit, for save_records_to_segments.
+
+    Raises:
+        ValueError: If a habit has no segment.
+    """
+    for habit in habits:
+        if habit.segment is None:
+            raise ValueError("Habit '{}' has no segment.".format(habit.name))
+    return [habit.segment for habit in habits]
+
+def segment_filename(directory, name, occurrence=1):
     """
-    habit_data = []
+    Returns the segment file of a habit in a segment directory.
+
+    Habits with the same name get numbered files.
+
+    Args:
+        directory (str): The segment directory.
+        name (str): The habit name.
+        occurrence (int): 1 for the first habit with this name, 2 for the second and so on.
+
+    Returns:
+        str: Path of the segment file.
+    """
+    stem = quote(name, safe='')
+    if occurrence > 1:
+        stem += '~{}'.format(occurrence)
+    return os.path.join(os.path.abspath(directory), stem + SEGMENT_SUFFIX)
+
+def _segment_files(directory):
+    """
+    Returns the paths of the segment files of a segment directory.
+    """
+    directory = os.path.abspath(directory)
+    return {os.path.join(directory, entry) for entry in os.listdir(directory) if entry.endswith(SEGMENT_SUFFIX)}
+
+def _assign_segments(habits, directory, stored):
+    """
+    Gives every habit a segment file and a position in a segment directory.
+
+    A habit keeps the segment it was loaded from or last saved to in this
+    directory; the others get a free file named after them. Positions only
+    have to increase along the list, so a habit keeps its stored position
+    while that holds and removing habits rewrites nothing.
+
+    Returns:
+        list: The habits whose segment has to be written.
+    """
+    claimed = set()
+    kept = []
     for habit in habits:
-        habit_data.append({
-            'name': habit.name,
-            'start_date': habit.start_date.isoformat(),
-            'completed_dates': [date.isoformat() for date in habit.completed_dates],
-            'broken': habit.broken,
-            'streak_count': getattr(habit, 'streak_count', None)
-        })
+        segment = habit.segment[0] if habit.segment else None
+        keep = segment in stored and segment not in claimed
+        if keep:
+            claimed.add(segment)
+        kept.append(keep)
 
-    with open(filename, 'w') as file:
-        json.dump(habit_data, file)
+    changed = []
+    last_position = -1
+    for habit, keep in zip(habits, kept):
+        if keep:
+            segment, position = habit.segment
+        else:
+            occurrence = 1
+            while segment_filename(directory, habit.name, occurrence) in claimed:
+                occurrence += 1
+            segment, position = segment_filename(directory, habit.name, occurrence), None
+            claimed.add(segment)
+        if position is None or position <= last_position:
+            position = last_position + 1
+            keep = False
+        last_position = position
+        habit.segment = (segment, position)
+        if habit.dirty or not keep:
+            changed.append(habit)
+    return changed
+
+def _check_version(filename, expected_version):
+    if expected_version is not None and file_version(filename) != expected_version:
+        raise VersionConflictError("'{}' was changed by another writer.".format(filename))
+
+def _write_segments(records):
+    """
+    Writes every record with its position to its segment file, fsyncing each directory once.
+    """
+    directories = set()
+    for (segment, position), record in records:
+        _write_atomically(dict(record, position=position), segment)
+        directories.add(os.path.dirname(segment))
+    for directory in directories:
+        _sync_directory(directory)
+
+def save_file_atomically(filename, write):
+    """
+    Atomically replaces a file with the bytes written by a callback.
+
+    Uses the same locked, fsynced temporary file and rename as the JSON
+    saves, so a crash leaves either the old or the new file, and readers
+    that still have the old file open or memory-mapped keep seeing it whole.
+
+    Args:
+        filename (str): The name of the file.
+        write (callable): Called with the temporary file, opened for binary writing.
+
+    Returns:
+        tuple: The version of the saved file.
+    """
+    with locked(filename):
+        version = _replace_file(filename, write)
+        _sync_directory(os.path.dirname(os.path.abspath(filename)))
+    return version
+
+def _write_atomically(data, filename):
+    """
+    Writes JSON data to a fsynced temporary file and renames it over ``filename``.
+
+    Returns:
+        tuple: The version of the written file.
+    """
+    def write(file):
+        compression = _compression(filename)
+        stream = compression.open(file, 'wb') if compression else file
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        json.dump(data, text)
+        text.flush()
+        text.detach()
+        if stream is not file:
+            # Writes the end of the compressed stream; the file stays open.
+            stream.close()
+
+    return _replace_file(filename, write)
+
+def _replace_file(filename, write):
+    """
+    Writes a fsynced temporary file with ``write`` and renames it over ``filename``.
+
+    Returns:
+        tuple: The version of the written file.
+    """
+    descriptor, temporary_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                                      prefix=os.path.basename(filename) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+            version = _stat_version(os.fstat(file.fileno()))
+        mode = os.stat(filename).st_mode if os.path.exists(filename) else DEFAULT_FILE_MODE
+        os.chmod(temporary_filename, stat.S_IMODE(mode))
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise
+    return version
+
+def _sync_directory(directory):
+    """
+    Fsyncs a directory so a rename in it survives a crash, where the platform supports it.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def _read_segments(directory):
+    """
+    Reads the records of a segment directory in their saved order.
+
+    Returns:
+        list: ``(segment file, record)`` pairs.
+    """
+    segments = []
+    for segment in _segment_files(directory):
+        with open(segment, 'r') as file:
+            segments.append((segment, json.load(file)))
+    # Segments written before positions were stored sort last, by file name.
+    segments.sort(key=lambda item: (item[1].get('position') is None, item[1].get('position') or 0, item[0]))
+    return segments
 
 def load_habits_from_json_file(filename):
     """
-    Loads a list of habit objects from a JSON file.
+    Loads a list of habit objects from a JSON file or a segment directory.
 
     Args:
-        filename (str): The name of the JSON file.
+        filename (str): The name of the JSON file or of the segment directory.
 
     Returns:
         list: List of loaded Habit objects.
     """
-    habits = []
-    with open(filename, 'r') as file:
-        habit_data = json.load(file)
-        for data in habit_data:
-            if data.get('weekdays'):
-                habit = WeeklyHabit(data['name'], datetime.fromisoformat(data['start_date']), data['weekdays'])
-            elif data.get('target_days'):
-                habit = MonthlyHabit(data['name'], datetime.fromisoformat(data['start_date']), data['target_days'])
-            else:
-                habit = DailyHabit(data['name'], datetime.fromisoformat(data['start_date']))
-
-            habit.completed_dates = {datetime.fromisoformat(date).date() for date in data['completed_dates']}
-            habit.broken = data['broken']
-            setattr(habit, 'streak_counter', data.get('streak_counter', 0))
+    return load_habits_with_version(filename)[0]
+
+def load_habits_with_version(filename):
+    """
+    Loads a list of habit objects from a JSON file or a segment directory together with its version.
+
+    Pass the version to save_habits_to_json_file to detect concurrent saves.
+
+    Args:
+        filename (str): The name of the JSON file or of the segment directory.
+
+    Returns:
+        tuple: ``(habits, version)``.
+    """
+    if os.path.isdir(filename):
+        version = file_version(filename)
+        habits = []
+        for segment, data in _read_segments(filename):
+            habit = habit_from_record(data)
+            habit.segment = (segment, data.get('position'))
             habits.append(habit)
+        return habits, version
+
+    with open_habit_file(filename) as file:
+        version = _stat_version(os.fstat(file.fileno()))
+        habit_data = json.load(file)
+    return [habit_from_record(data) for data in habit_data], version
+
+def save_habits_to_ndjson_file(habits, filename, compact=False):
+    """
+    Saves habit objects to a newline-delimited JSON file, one habit record per line.
+
+    Args:
+        habits (iterable): Habit objects to be saved.
+        filename (str): The name of the file. Names ending in ``.gz`` or ``.xz`` are compressed.
+        compact (bool): If True, completions are stored as delta-encoded runs instead of ISO dates.
+
+    Returns:
+        None
+    """
+    with open_habit_file(filename, 'w') as file:
+        for habit in habits:
+            completed_runs = encode_completions([habit])[0] if compact else None
+            file.write(json.dumps(habit_to_record(habit, completed_runs)))
+            file.write('\n')
+
+def _compression(filename):
+    return COMPRESSIONS.get(os.path.splitext(filename)[1])
 
-    return habits
+def open_habit_file(filename, mode='r'):
+    """
+    Opens a habit file as text, compressed with gzip or lzma if its name ends in ``.gz`` or ``.xz``.
+
+    Args:
+        filename (str): The name of the file.
+        mode (str): ``'r'`` or ``'w'``.
+
+    Returns:
+        file: The open text file.
+    """
+    compression = _compression(filename)
+    if compression is None:
+        return open(filename, mode)
+    return compression.open(filename, mode + 't', encoding='utf-8')
+
+def iter_habit_records(filename, chunk_size=1 << 16):
+    """
+    Yields the habit records of a JSON array file or a newline-delimited JSON file one at a time.
+
+    JSON arrays are decoded incrementally from fixed-size chunks, so the whole
+    file is never held in memory at once.
+
+    Args:
+        filename (str): The name of the file.
+        chunk_size (int): Number of characters read at a time.
+
+    Yields:
+        dict: The habit records in file order.
+    """
+    decoder = json.JSONDecoder()
+    with open_habit_file(filename) as file:
+        buffer = file.read(chunk_size)
+        position = len(buffer) - len(buffer.lstrip())
+        in_array = buffer[position:position + 1] == '['
+        if in_array:
+            position += 1
+
+        while True:
+            # Skip whitespace and, inside an array, the separating commas.
+            while True:
+                while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ',')):
+                    position += 1
+                if position < len(buffer):
+                    break
+                buffer, position = file.read(chunk_size), 0
+                if not buffer:
+                    return
+            if in_array and buffer[position] == ']':
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                more = file.read(chunk_size)
+                if not more:
+                    raise
+                buffer, position = buffer[position:] + more, 0
+                continue
+            yield record
+            position = end
+
+def iter_habits_from_json_file(filename, habit_type=None, names=None, lazy=True):
+    """
+    Lazily loads habit objects from a JSON array file or a newline-delimited JSON file.
+
+    Records are filtered by type and name before any habit object is created,
+    and with ``lazy`` the completion dates of each habit are only parsed when
+    first accessed.
+
+    Args:
+        filename (str): The name of the file.
+        habit_type (type, optional): Only yield habits of this type (DailyHabit, WeeklyHabit, MonthlyHabit).
+        names (iterable, optional): Only yield habits with these names.
+        lazy (bool): If True, defer parsing of completion dates until first access.
+
+    Yields:
+        Habit: The loaded habit objects in file order.
+    """
+    names = set(names) if names is not None else None
+    for data in iter_habit_records(filename):
+        if names is not None and data['name'] not in names:
+            continue
+        if habit_type is not None and not issubclass(record_type(data), habit_type):
+            continue
+        yield habit_from_record(data, lazy=lazy)
@@ -0,0 +1,277 @@
+import functools
+import importlib
+import os
+import sys
+import time
+
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0, float('inf'))
+
+# Functions wrapped by enable(): (module, attribute, kind). The kind decides
+# which extra measurements are taken from the arguments and result.
+INSTRUMENTED_FUNCTIONS = [
+    ('src.habit_tracker', 'save_habits_to_json_file', 'save'),
+    ('src.habit_tracker', 'load_habits_from_json_file', 'load'),
+    ('src.habit_tracker', 'save_habits_to_ndjson_file', 'save'),
+    ('src.statistics_1', 'daily_habits_longest_streak', 'statistics'),
+    ('src.statistics_1', 'current_daily_habits', 'statistics'),
+    ('src.statistics_1', 'find_habits_strugled_last_month', 'statistics'),
+    ('src.statistics_1', 'struggle_report', 'statistics'),
+    ('src.statistics_1', 'all_habits', 'statistics'),
+    ('src.statistics_1', 'habits_with_same_frequency', 'statistics'),
+    ('src.statistics_1', 'daily_digest', 'call'),
+    ('src.statistics_1', 'find_longest_run_streak_among_all_habits', 'statistics'),
+    ('src.statistics_1', 'find_longest_run_streak_for_specific_habit', 'call'),
+    ('src.statistics_1', 'create_dataframe_of_habit', 'statistics'),
+    ('src.statistics_1', 'create_dataframe_of_completions', 'statistics'),
+    ('src.statistics_1', 'view_completed_habits_calender', 'call'),
+    ('src.statistics_1', 'view_daily_habits_streak_count', 'call'),
+    ('src.statistics_1', 'view_broken_habit', 'call'),
+]
+
+# Habit mutation methods wrapped by enable(): (module, class, method).
+INSTRUMENTED_METHODS = [
+    ('src.Habit', 'Habit', 'mark_as_completed'),
+    ('src.Habit', 'Habit', 'mark_as_incomplete'),
+    ('src.Habit', 'Habit', 'mark_completed_many'),
+    ('src.DailyHabit', 'DailyHabit', 'mark_completed'),
+    ('src.WeeklyHabit', 'WeeklyHabit', 'mark_as_completed'),
+    ('src.MonthlyHabit', 'MonthlyHabit', 'mark_completed'),
+]
+
+
+class MetricsRegistry:
+    """
+    Collects per-function call counts, latency histograms, bytes and object counts.
+
+    Attributes:
+        metrics (dict): Metrics per function name, each a dict with ``calls``,
+            ``errors``, ``seconds``, ``buckets``, ``bytes_read``,
+            ``bytes_written`` and ``objects``.
+
+    Methods:
+        record(name, seconds, ...): Records one call.
+        as_dict(): Returns a copy of all metrics.
+        to_prometheus(): Renders the metrics in the Prometheus text format.
+        report(limit): Renders the functions with the highest total time as a table.
+        reset(): Clears all metrics.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty MetricsRegistry.
+        """
+        self.metrics = {}
+
+    def record(self, name, seconds, error=False, bytes_read=0, bytes_written=0, objects=0):
+        """
+        Records one call of an instrumented function.
+
+        Args:
+            name (str): The function name.
+            seconds (float): The call duration.
+            error (bool): Whether the call raised.
+            bytes_read (int): Bytes read from disk by the call.
+            bytes_written (int): Bytes written to disk by the call.
+            objects (int): Number of habits processed by the call.
+        """
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = {
+                'calls': 0, 'errors': 0, 'seconds': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+                'bytes_read': 0, 'bytes_written': 0, 'objects': 0,
+            }
+        metric['calls'] += 1
+        metric['errors'] += error
+        metric['seconds'] += seconds
+        metric['buckets'][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        metric['bytes_read'] += bytes_read
+        metric['bytes_written'] += bytes_written
+        metric['objects'] += objects
+
+    def as_dict(self):
+        """
+        Returns a copy of all metrics.
+
+        Returns:
+            dict: Metrics per function name.
+        """
+        return {name: dict(metric, buckets=list(metric['buckets'])) for name, metric in self.metrics.items()}
+
+    def to_prometheus(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines = []
+        counters = [
+            ('habit_calls_total', 'calls', 'Number of calls.'),
+            ('habit_call_errors_total', 'errors', 'Number of calls that raised.'),
+            ('habit_bytes_read_total', 'bytes_read', 'Bytes read from disk.'),
+            ('habit_bytes_written_total', 'bytes_written', 'Bytes written to disk.'),
+            ('habit_objects_total', 'objects', 'Habits processed.'),
+        ]
+        for metric_name, key, help_text in counters:
+            lines.append('# HELP {} {}'.format(metric_name, help_text))
+            lines.append('# TYPE {} counter'.format(metric_name))
+            for name, metric in sorted(self.metrics.items()):
+                lines.append('{}{{function="{}"}} {}'.format(metric_name, name, metric[key]))
+
+        lines.append('# HELP habit_call_duration_seconds Call latency.')
+        lines.append('# TYPE habit_call_duration_seconds histogram')
+        for name, metric in sorted(self.metrics.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, metric['buckets']):
+                cumulative += count
+                label = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('habit_call_duration_seconds_bucket{{function="{}",le="{}"}} {}'.format(name, label, cumulative))
+            lines.append('habit_call_duration_seconds_sum{{function="{}"}} {}'.format(name, metric['seconds']))
+            lines.append('habit_call_duration_seconds_count{{function="{}"}} {}'.format(name, metric['calls']))
+        return '\n'.join(lines) + '\n'
+
+    def report(self, limit=15):
+        """
+        Renders the instrumented functions with the highest total time as a table.
+
+        Args:
+            limit (int): Maximum number of rows.
+
+        Returns:
+            str: The table.
+        """
+        rows = sorted(self.metrics.items(), key=lambda item: item[1]['seconds'], reverse=True)[:limit]
+        lines = ['{:<56} {:>8} {:>10} {:>12} {:>12} {:>10}'.format(
+            'function', 'calls', 'total s', 'bytes read', 'bytes written', 'objects')]
+        for name, metric in rows:
+            lines.append('{:<56} {:>8} {:>10.4f} {:>12} {:>12} {:>10}'.format(
+                name, metric['calls'], metric['seconds'], metric['bytes_read'], metric['bytes_written'], metric['objects']))
+        return '\n'.join(lines)
+
+    def reset(self):
+        """
+        Clears all metrics.
+        """
+        self.metrics.clear()
+
+
+# Registry filled by the instrumented functions.
+registry = MetricsRegistry()
+
+# Original functions replaced by enable(), restored by disable().
+_originals = {}
+
+
+def _file_size(filename):
+    try:
+        return os.path.getsize(filename)
+    except (OSError, TypeError):
+        return 0
+
+
+def _wrap(name, function, kind):
+    """
+    Returns a wrapper that records every call of ``function`` in the registry.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        error = True
+        result = None
+        try:
+            result = function(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            seconds = time.perf_counter() - started
+            bytes_read = bytes_written = objects = 0
+            if kind == 'load':
+                bytes_read = _file_size(args[0] if args else kwargs.get('filename'))
+                objects = len(result) if isinstance(result, list) else 0
+            elif kind == 'save':
+                bytes_written = _file_size(args[1] if len(args) > 1 else kwargs.get('filename'))
+                objects = len(args[0]) if args and hasattr(args[0], '__len__') else 0
+            elif kind == 'statistics':
+                objects = len(args[0]) if args and hasattr(args[0], '__len__') else 0
+            registry.record(name, seconds, error, bytes_read, bytes_written, objects)
+
+    return wrapper
+
+
+def _replace_everywhere(original, replacement):
+    """
+    Replaces a function in every loaded module that imported it by name.
+    """
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, '__dict__', None)
+        if not namespace:
+            continue
+        for attribute, value in list(namespace.items()):
+            if value is original:
+                setattr(module, attribute, replacement)
+
+
+def is_enabled():
+    """
+    Returns whether instrumentation is currently enabled.
+
+    Returns:
+        bool: True if the instrumented functions are wrapped.
+    """
+    return bool(_originals)
+
+
+def enable():
+    """
+    Wraps the storage functions, statistics functions and Habit mutation methods.
+
+    While disabled, nothing is wrapped, so the instrumentation costs nothing.
+    Names bound by ``from module import name`` in already loaded modules are
+    replaced as well.
+    """
+    if _originals:
+        return
+    for module_name, attribute, kind in INSTRUMENTED_FUNCTIONS:
+        module = importlib.import_module(module_name)
+        original = getattr(module, attribute)
+        wrapper = _wrap('{}.{}'.format(module_name.rsplit('.', 1)[-1], attribute), original, kind)
+        _originals[(module_name, None, attribute)] = (original, wrapper)
+        _replace_everywhere(original, wrapper)
+
+    for module_name, class_name, method in INSTRUMENTED_METHODS:
+        cls = getattr(importlib.import_module(module_name), class_name)
+        original = cls.__dict__[method]
+        wrapper = _wrap('{}.{}'.format(class_name, method), original, 'call')
+        _originals[(module_name, class_name, method)] = (original, wrapper)
+        setattr(cls, method, wrapper)
+
+
+def disable():
+    """
+    Restores the original, uninstrumented functions and methods.
+    """
+    for (module_name, class_name, attribute), (original, wrapper) in _originals.items():
+        if class_name is None:
+            _replace_everywhere(wrapper, original)
+        else:
+            setattr(getattr(sys.modules[module_name], class_name), attribute, original)
+    _originals.clear()
+
+
+@contextmanager
+def enabled():
+    """
+    Context manager that enables instrumentation for the duration of a block.
+
+    Yields:
+        MetricsRegistry: The registry receiving the measurements.
+    """
+    enable()
+    try:
+        yield registry
+    finally:
+        disable()
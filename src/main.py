@@ -67,12 +67,17 @@ def start_new():
     save_habits_to_json_file([brushteath_daily, cleaningroom_daily, Exercise_weekly, anycourse_study_weekly, skills_monthly, visiting_firends_Monthly], 'habits.json')
 
 
-def show_statistics():
+def show_statistics(output_directory=None, formats=('png',)):
     """
     This function demonstrates habit statistics.
 
     It loads habits from a JSON file, showcases different statistics,
     and visualizes completed dates, streak count, and broken status using Pandas and Matplotlib.
+    With an output directory the charts are written to files instead of shown.
+
+    Args:
+        output_directory (str, optional): Directory the charts are rendered to.
+        formats (tuple): File formats of the rendered charts.
 
     Example:
     - To find the longest habit streak:
@@ -117,6 +122,13 @@ def show_statistics():
     # Create DataFrame
     data_frame_habit = create_dataframe_of_habit(habits)
 
+    if output_directory:
+        from src.report_rendering import ReportRenderer
+
+        for path in ReportRenderer(formats).render(data_frame_habit, output_directory):
+            print(path)
+        return
+
     # Visualize completed dates
     view_completed_habits_calender(data_frame_habit)
 
@@ -127,9 +139,61 @@ def show_statistics():
     # Visualize broken status
     view_broken_habit(data_frame_habit)
 
-if __name__ == "__main__":
+def main(arguments=None):
+    """
+    Entry point of the habit tracker, used by ``python -m src``.
+
+    It records the demo habits and then shows their statistics. With
+    ``--profile`` the run is instrumented and profiled, and the hot spots
+    are printed at the end. With ``--output-dir`` the charts are rendered to
+    files instead of being shown, so the run needs no display.
+
+    Args:
+        arguments (list, optional): Command line arguments. Defaults to ``sys.argv[1:]``.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m src', description='Tracks daily, weekly and monthly habits.')
+    parser.add_argument('--profile', action='store_true', help='print the top hot spots after the run')
+    parser.add_argument('--output-dir', help='render the charts to files in this directory')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg'], dest='formats',
+                        help='file formats of the rendered charts')
+    arguments = parser.parse_args(arguments)
+
+    if arguments.profile:
+        run_profiled(output_directory=arguments.output_dir, formats=arguments.formats)
+        return
 
     """Uncomment the below code to add habit and track them."""
     start_new()
     """Uncomment the below code to show statistics."""
-    show_statistics()
\ No newline at end of file
+    show_statistics(arguments.output_dir, arguments.formats)
+
+def run_profiled(limit=15, output_directory=None, formats=('png',)):
+    """
+    Runs the demo with instrumentation and cProfile enabled and prints the hot spots.
+
+    Args:
+        limit (int): Number of functions listed in each report.
+        output_directory (str, optional): Directory the charts are rendered to instead of shown.
+        formats (tuple): File formats of the rendered charts.
+    """
+    import cProfile
+    import pstats
+    from src import instrumentation
+
+    profiler = cProfile.Profile()
+    with instrumentation.enabled() as registry:
+        profiler.enable()
+        try:
+            start_new()
+            show_statistics(output_directory, formats)
+        finally:
+            # Report the hot spots even when the run fails part way.
+            profiler.disable()
+            print(registry.report(limit))
+            print()
+            pstats.Stats(profiler).sort_stats('tottime').print_stats(limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Renders the statistics charts to image files without a display.
+
+Charts are drawn on a matplotlib Figure attached to the non-interactive Agg
+canvas, so nothing blocks and no window system is needed. Per-user chart sets
+can be rendered in parallel from the command line:
+
+    python -m src.report_rendering users/ reports/ --format png svg --processes 8
+
+where ``users/`` holds one habits JSON file per user, named ``<user>.json``.
+"""
+import os
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.calendar_heatmap import CalendarHeatmap
+from src.habit_tracker import load_habits_from_json_file
+from src.statistics_1 import (create_dataframe_of_habit, plot_broken_habit, plot_calendar_heatmap,
+                              plot_completed_dates, plot_daily_habits_streak_count)
+
+# Chart file names and the functions drawing them. The streak chart only shows daily habits.
+CHARTS = [
+    ('completed_dates', plot_completed_dates, False),
+    ('daily_streak_count', plot_daily_habits_streak_count, True),
+    ('broken_status', plot_broken_habit, False),
+]
+
+
+class ReportRenderer:
+    """
+    Renders the statistics charts of a habit DataFrame to files.
+
+    One figure is created per renderer and cleared between charts, so
+    rendering many chart sets does not create and tear down a figure each time.
+
+    Attributes:
+        formats (tuple): File formats written for every chart, such as ``'png'`` and ``'svg'``.
+        figure (matplotlib.figure.Figure): The reused figure.
+
+    Methods:
+        render(data_frame_habit, directory, prefix=''): Writes all charts of a DataFrame.
+        render_calendar(year_view, year, directory, prefix=''): Writes a calendar heatmap.
+    """
+
+    def __init__(self, formats=('png',), figsize=(8, 5), dpi=100):
+        """
+        Initializes a ReportRenderer.
+
+        Args:
+            formats (iterable): File formats to write.
+            figsize (tuple): Figure size in inches.
+            dpi (int): Resolution of raster formats.
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.formats = tuple(formats)
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+
+    def render(self, data_frame_habit, directory, prefix=''):
+        """
+        Writes every chart of a habit DataFrame in every format.
+
+        Args:
+            data_frame_habit (pd.DataFrame): DataFrame created by create_dataframe_of_habit.
+            directory (str): Directory the files are written to. It is created if needed.
+            prefix (str): Prepended to every file name.
+
+        Returns:
+            list: Paths of the written files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        daily_habits = data_frame_habit[data_frame_habit['Type'] == 'DailyHabit']
+        paths = []
+        for name, plot, daily_only in CHARTS:
+            self.figure.clear()
+            plot(daily_habits if daily_only else data_frame_habit, self.figure.add_subplot())
+            self.figure.tight_layout()
+            for file_format in self.formats:
+                path = os.path.join(directory, '{}{}.{}'.format(prefix, name, file_format))
+                self.figure.savefig(path, format=file_format)
+                paths.append(path)
+        return paths
+
+    def render_calendar(self, year_view, year, directory, prefix=''):
+        """
+        Writes the calendar heatmap of a year in every format.
+
+        Args:
+            year_view (np.ndarray): Year view from CalendarHeatmap.year_view().
+            year (int): The year shown.
+            directory (str): Directory the files are written to. It is created if needed.
+            prefix (str): Prepended to every file name.
+
+        Returns:
+            list: Paths of the written files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.figure.clear()
+        ax = self.figure.add_subplot()
+        self.figure.colorbar(plot_calendar_heatmap(year_view, year, ax), ax=ax, label='Completions',
+                             orientation='horizontal')
+        paths = []
+        for file_format in self.formats:
+            path = os.path.join(directory, '{}calendar_{}.{}'.format(prefix, year, file_format))
+            self.figure.savefig(path, format=file_format)
+            paths.append(path)
+        return paths
+
+
+# Renderer of the current worker process, created once by _start_worker.
+_renderer = None
+
+
+def _start_worker(formats):
+    global _renderer
+    _renderer = ReportRenderer(formats)
+
+
+def _render_user(job):
+    user, filename, directory, year = job
+    habits = load_habits_from_json_file(filename)
+    user_directory = os.path.join(directory, user)
+    paths = _renderer.render(create_dataframe_of_habit(habits), user_directory)
+    if year is not None:
+        paths += _renderer.render_calendar(CalendarHeatmap(habits).year_view(year), year, user_directory)
+    return user, paths
+
+
+def render_user_reports(users, directory, formats=('png',), processes=None, year=None):
+    """
+    Renders the chart set of many users, each into its own subdirectory.
+
+    Every user is rendered as a separate job, so a user whose charts cannot
+    be rendered is recorded in the failures and the other users are still
+    rendered.
+
+    Args:
+        users (dict): Habits JSON file name per user name.
+        directory (str): Output directory; user ``name`` gets ``directory/name``.
+        formats (iterable): File formats to write.
+        processes (int, optional): Number of worker processes. Defaults to the
+            number of CPUs; 1 renders in the current process.
+        year (int, optional): Also renders the calendar heatmap of this year.
+
+    Returns:
+        tuple: ``(reports, failures)``, the paths of the written files per
+        user name and the error message per user name that failed.
+    """
+    jobs = [(user, filename, directory, year) for user, filename in users.items()]
+    reports, failures = {}, {}
+    if processes == 1:
+        _start_worker(formats)
+        for job in jobs:
+            try:
+                reports[job[0]] = _render_user(job)[1]
+            except Exception as error:
+                failures[job[0]] = '{}: {}'.format(type(error).__name__, error)
+        return reports, failures
+
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=_start_worker, initargs=(tuple(formats),)) as executor:
+        futures = {executor.submit(_render_user, job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            user = futures[future]
+            try:
+                reports[user] = future.result()[1]
+            except Exception as error:
+                failures[user] = '{}: {}'.format(type(error).__name__, error)
+    return reports, failures
+
+
+def main(arguments=None):
+    """
+    Command line entry point of ``python -m src.report_rendering``.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m src.report_rendering', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('users', help='directory with one habits JSON file per user')
+    parser.add_argument('output', help='directory the charts are written to')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg'], dest='formats')
+    parser.add_argument('--processes', type=int, help='number of worker processes')
+    parser.add_argument('--calendar', type=int, metavar='YEAR', help='also render the calendar heatmap of this year')
+    arguments = parser.parse_args(arguments)
+
+    users = {
+        name[:-len('.json')]: os.path.join(arguments.users, name)
+        for name in sorted(os.listdir(arguments.users)) if name.endswith('.json')
+    }
+    reports, failures = render_user_reports(users, arguments.output, arguments.formats, arguments.processes,
+                                            arguments.calendar)
+    print('Rendered {} chart sets to {}'.format(len(reports), arguments.output))
+    for user, error in sorted(failures.items()):
+        print('Failed to render {}: {}'.format(user, error))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+from calendar import monthrange
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+
+import numpy as np
+
+from src.streak_engine import completion_matrix, joined_completion_bits
+
+# Ordinal of 1970-01-01, the epoch of NumPy datetime64 values.
+EPOCH_ORDINAL = 719163
+
+
+# Valid days of weekly (Monday is 0) and monthly schedules.
+WEEKDAYS = range(7)
+MONTH_DAYS = range(1, 32)
+
+# Interned schedule bitmasks and the day tuples they stand for, shared by all
+# habits with the same schedule.
+_INTERNED_MASKS = {}
+_SCHEDULE_DAYS = {}
+
+
+def schedule_mask(days, valid_days):
+    """
+    Converts a list of schedule days to an interned bitmask with bit ``day`` set per day.
+
+    Args:
+        days (iterable): Weekdays (0 to 6) or days of the month (1 to 31).
+        valid_days (range): WEEKDAYS or MONTH_DAYS.
+
+    Returns:
+        int: The bitmask. Equal schedules return the same int object.
+
+    Raises:
+        ValueError: If a day is not in ``valid_days``.
+    """
+    mask = 0
+    for day in days:
+        if day not in valid_days:
+            raise ValueError('Schedule day {} is not between {} and {}.'.format(day, valid_days[0], valid_days[-1]))
+        mask |= 1 << day
+    return _INTERNED_MASKS.setdefault(mask, mask)
+
+
+def schedule_days(mask):
+    """
+    Converts a schedule bitmask back to its days.
+
+    Args:
+        mask (int): The bitmask created by schedule_mask.
+
+    Returns:
+        tuple: The sorted days, shared between all callers with the same mask.
+    """
+    days = _SCHEDULE_DAYS.get(mask)
+    if days is None:
+        days = _SCHEDULE_DAYS[mask] = tuple(day for day in range(mask.bit_length()) if mask >> day & 1)
+    return days
+
+
+def to_ordinals(dates):
+    """
+    Converts dates to an array of day ordinals.
+
+    Args:
+        dates (iterable): Dates or datetimes, or a NumPy datetime64 array.
+
+    Returns:
+        np.ndarray: The day ordinal of each date.
+    """
+    if isinstance(dates, np.ndarray) and dates.dtype.kind == 'M':
+        return dates.astype('datetime64[D]').astype(np.int64) + EPOCH_ORDINAL
+    return np.fromiter((day.toordinal() for day in dates), dtype=np.int64)
+
+
+def weekdays_of(ordinals):
+    """
+    Returns the weekday (0 for Monday, ..., 6 for Sunday) of day ordinals.
+
+    Args:
+        ordinals (np.ndarray): Day ordinals.
+
+    Returns:
+        np.ndarray: The weekday of each ordinal.
+    """
+    return (ordinals - 1) % 7
+
+
+def days_of_month(ordinals):
+    """
+    Returns the day of the month (1 to 31) of day ordinals.
+
+    Args:
+        ordinals (np.ndarray): Day ordinals.
+
+    Returns:
+        np.ndarray: The day of the month of each ordinal.
+    """
+    days = (np.asarray(ordinals) - EPOCH_ORDINAL).astype('datetime64[D]')
+    return (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+
+
+def next_due_ordinal(schedule_key, ordinal):
+    """
+    Returns the first due day of a schedule on or after a day.
+
+    Args:
+        schedule_key (tuple): The schedule as returned by ``Habit.schedule_key()``.
+        ordinal (int): Ordinal of the first day to consider.
+
+    Returns:
+        int: The ordinal of the due day, or None when the schedule has no due days.
+    """
+    kind = schedule_key[0]
+    if kind == 'weekly':
+        weekday = (ordinal - 1) % 7
+        deltas = [(day - weekday) % 7 for day in schedule_key[1] if 0 <= day <= 6]
+        return ordinal + min(deltas) if deltas else None
+    if kind == 'monthly':
+        days = [day for day in schedule_key[1] if 1 <= day <= 31]
+        if not days:
+            return None
+        current = date.fromordinal(ordinal)
+        year, month, after = current.year, current.month, current.day
+        # Every day of the month occurs within any 12 consecutive months.
+        for _ in range(13):
+            length = monthrange(year, month)[1]
+            due = [day for day in days if after <= day <= length]
+            if due:
+                return date(year, month, min(due)).toordinal()
+            year, month, after = year + month // 12, month % 12 + 1, 1
+        return None
+    return ordinal
+
+
+class ScheduleIndex:
+    """
+    Materializes and caches the due dates of habit schedules.
+
+    Due dates are stored as sorted arrays of day ordinals keyed by
+    ``(schedule_key, first_day, last_day)``. Habits with identical schedules
+    share one entry, so the work grows with the number of distinct schedules
+    rather than with the number of habits.
+
+    Attributes:
+        max_entries (int): Maximum number of cached due-date arrays.
+        block_size (int): Number of habits evaluated together in one matrix.
+
+    Methods:
+        due_ordinals(schedule_key, first_day, last_day): Returns the due day ordinals of a schedule in a range.
+        period_streaks(habits, first_day=None, last_day=None): Computes streaks and adherence against each habit's schedule.
+        due_counts(habits, first_day, last_day): Counts the due and the completed due dates of each habit in a range.
+    """
+
+    def __init__(self, max_entries=256, block_size=4096):
+        """
+        Initializes a ScheduleIndex.
+
+        Args:
+            max_entries (int): Maximum number of cached due-date arrays.
+            block_size (int): Number of habits evaluated together in one matrix.
+        """
+        self.max_entries = max_entries
+        self.block_size = block_size
+        self._cache = OrderedDict()
+
+    def due_ordinals(self, schedule_key, first_day, last_day):
+        """
+        Returns the due day ordinals of a schedule between two day ordinals (inclusive).
+
+        Args:
+            schedule_key (tuple): The schedule as returned by ``Habit.schedule_key()``.
+            first_day (int): Ordinal of the first day of the range.
+            last_day (int): Ordinal of the last day of the range.
+
+        Returns:
+            np.ndarray: Sorted, read-only array of due day ordinals.
+        """
+        key = (schedule_key, first_day, last_day)
+        due = self._cache.get(key)
+        if due is not None:
+            self._cache.move_to_end(key)
+            return due
+
+        days = np.arange(first_day, last_day + 1, dtype=np.int64)
+        kind = schedule_key[0]
+        if kind == 'weekly':
+            due = days[np.isin(weekdays_of(days), schedule_key[1])]
+        elif kind == 'monthly':
+            due = days[np.isin(days_of_month(days), schedule_key[1])]
+        else:
+            due = days
+        due.setflags(write=False)
+
+        self._cache[key] = due
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return due
+
+    def period_streaks(self, habits, first_day=None, last_day=None):
+        """
+        Computes streaks of consecutive satisfied due dates and adherence ratios.
+
+        A due date is satisfied when the habit was completed on it. Due dates
+        before a habit's start date are ignored. A due date that falls on the
+        last day of the range and is not completed yet does not break the
+        current streak, since the day is not over.
+
+        Args:
+            habits (list): List of Habit objects.
+            first_day (datetime, optional): First day of the range. Defaults to the earliest start date.
+            last_day (datetime, optional): Last day of the range. Defaults to the current date.
+
+        Returns:
+            tuple: ``(current, longest, adherence)`` NumPy arrays aligned with ``habits``.
+            Adherence is the share of due dates that were satisfied, or NaN when
+            nothing was due.
+        """
+        current = np.zeros(len(habits), dtype=np.int64)
+        longest = np.zeros(len(habits), dtype=np.int64)
+        adherence = np.full(len(habits), np.nan)
+        if not habits:
+            return current, longest, adherence
+
+        starts = np.fromiter((habit.start_date.toordinal() for habit in habits), dtype=np.int64, count=len(habits))
+        first = first_day.toordinal() if first_day else int(starts.min())
+        last = (last_day or datetime.now()).toordinal()
+
+        groups = defaultdict(list)
+        for position, habit in enumerate(habits):
+            groups[habit.schedule_key()].append(position)
+
+        bits, bit_offsets, bit_lengths, origins = joined_completion_bits(habits)
+        for schedule_key, group in groups.items():
+            due = self.due_ordinals(schedule_key, first, last)
+            if not len(due):
+                continue
+            # Work in blocks of habits to bound the size of the habits x due-dates matrices.
+            for block in range(0, len(group), self.block_size):
+                members = np.array(group[block:block + self.block_size])
+                self._evaluate_block(members, due, last, starts, bits, bit_offsets, bit_lengths, origins,
+                                     current, longest, adherence)
+
+        return current, longest, adherence
+
+    def due_counts(self, habits, first_day, last_day):
+        """
+        Counts the due dates of each habit in a date range and how many of them were completed.
+
+        Every block of habits sharing a schedule is evaluated as one habits x
+        due-dates matrix. Due dates before a habit's start date are not counted.
+
+        Args:
+            habits (list): List of Habit objects.
+            first_day (date or datetime): First day of the range.
+            last_day (date or datetime): Last day of the range, included.
+
+        Returns:
+            tuple: ``(due, completed)`` NumPy integer arrays aligned with ``habits``.
+        """
+        due_count = np.zeros(len(habits), dtype=np.int64)
+        completed = np.zeros(len(habits), dtype=np.int64)
+        first, last = first_day.toordinal(), last_day.toordinal()
+        if not habits or last < first:
+            return due_count, completed
+
+        groups = defaultdict(list)
+        for position, habit in enumerate(habits):
+            groups[habit.schedule_key()].append(position)
+
+        for schedule_key, group in groups.items():
+            due = self.due_ordinals(schedule_key, first, last)
+            if not len(due):
+                continue
+            columns = due - first
+            for block in range(0, len(group), self.block_size):
+                members = group[block:block + self.block_size]
+                block_habits = [habits[position] for position in members]
+                starts = np.fromiter((habit.start_date.toordinal() for habit in block_habits), dtype=np.int64,
+                                     count=len(block_habits))
+                active = due[None, :] >= starts[:, None]
+                satisfied = completion_matrix(block_habits, first, last)[:, columns] & active
+                due_count[members] = active.sum(axis=1)
+                completed[members] = satisfied.sum(axis=1)
+
+        return due_count, completed
+
+    @staticmethod
+    def _evaluate_block(members, due, last, starts, bits, bit_offsets, bit_lengths, origins,
+                        current, longest, adherence):
+        """
+        Fills the results of a block of habits sharing the same due dates.
+        """
+        # Habits x due-dates matrices of "due for this habit" and "completed".
+        offsets = due[None, :] - origins[members, None]
+        inside = (offsets >= 0) & (offsets < bit_lengths[members, None])
+        positions = np.where(inside, bit_offsets[members, None] + offsets, 0)
+        active = due[None, :] >= starts[members, None]
+        satisfied = inside & (bits[positions] == 1) & active
+
+        due_count = active.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            adherence[members] = np.where(due_count > 0, satisfied.sum(axis=1) / due_count, np.nan)
+
+        # Length of the run of satisfied due dates ending at each column.
+        counts = np.cumsum(satisfied, axis=1)
+        resets = np.maximum.accumulate(np.where(satisfied, 0, counts), axis=1)
+        runs = counts - resets
+        longest[members] = runs.max(axis=1)
+
+        # A due date on the last day that is still open does not break the streak.
+        pending = (due[-1] == last) & ~satisfied[:, -1]
+        previous = runs[:, -2] if len(due) > 1 else 0
+        current[members] = np.where(pending, previous, runs[:, -1])
+
+
+# Shared index used by the habit classes and the statistics functions.
+schedule_index = ScheduleIndex()
+
+
+def period_streaks(habits, first_day=None, last_day=None):
+    """
+    Computes schedule-aware streaks and adherence using the shared ScheduleIndex.
+
+    Args:
+        habits (list): List of Habit objects.
+        first_day (datetime, optional): First day of the range. Defaults to the earliest start date.
+        last_day (datetime, optional): Last day of the range. Defaults to the current date.
+
+    Returns:
+        tuple: ``(current, longest, adherence)`` NumPy arrays aligned with ``habits``.
+    """
+    return schedule_index.period_streaks(habits, first_day, last_day)
+
+
+def due_counts(habits, first_day, last_day):
+    """
+    Counts due and completed due dates per habit using the shared ScheduleIndex.
+
+    Args:
+        habits (list): List of Habit objects.
+        first_day (date or datetime): First day of the range.
+        last_day (date or datetime): Last day of the range, included.
+
+    Returns:
+        tuple: ``(due, completed)`` NumPy integer arrays aligned with ``habits``.
+    """
+    return schedule_index.due_counts(habits, first_day, last_day)
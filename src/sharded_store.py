@@ -0,0 +1,297 @@
+"""
+Stores the habits of many users in shard files and aggregates them in parallel.
+
+Every user is assigned to one of N shards by a stable hash of the user name;
+a shard is an ordinary habits JSON file whose records carry an extra
+``user`` field. Each shard file has a directory of its own, since saves lock
+the directory holding the file: writers of different shards never wait for
+each other. Loading and statistics run per shard in a process pool and
+the per-shard results are merged, so every core is used and each worker only
+holds one shard in memory at a time.
+"""
+import functools
+import heapq
+import json
+import os
+import zlib
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from src.habit_tracker import (VersionConflictError, file_version, habit_from_record, habit_to_record,
+                               save_records_to_json_file)
+from src.statistics_1 import daily_habits_longest_streak, struggle_ranking
+
+# Name of the file recording the number of shards of a store.
+MANIFEST = 'store.json'
+
+
+def shard_of(user, shards):
+    """
+    Returns the shard holding a user.
+
+    The hash is stable across processes and runs, unlike ``hash()``.
+
+    Args:
+        user (str): The user name.
+        shards (int): Number of shards.
+
+    Returns:
+        int: The shard number.
+    """
+    return zlib.crc32(user.encode('utf-8')) % shards
+
+
+def _read_shard(filename):
+    """
+    Reads the records of a shard and its version.
+
+    The version is taken before reading, so a save based on records that
+    changed while being read fails its version check.
+    """
+    version = file_version(filename)
+    with open(filename, 'r') as file:
+        return json.load(file), version
+
+
+def load_shard(filename):
+    """
+    Loads the habits of every user of a shard file.
+
+    Args:
+        filename (str): The shard file.
+
+    Returns:
+        dict: Habits per user name.
+    """
+    users = defaultdict(list)
+    for record in _read_shard(filename)[0]:
+        users[record['user']].append(habit_from_record(record))
+    return dict(users)
+
+
+def _map_shard(job):
+    filename, mapper, arguments = job
+    return mapper(load_shard(filename), *arguments)
+
+
+class ShardedStore:
+    """
+    Habits of many users partitioned into shard files.
+
+    Writes replace the records of the saved users in their shards with
+    optimistic version checks, retrying when another process saved the same
+    shard in between, so concurrent writers of different users do not lose
+    each other's updates.
+
+    Attributes:
+        directory (str): Directory holding the shard files.
+        shards (int): Number of shards.
+        processes (int): Worker processes used by parallel operations; None
+            uses the number of CPUs and 1 works in the current process.
+
+    Methods:
+        shard_filename(shard): Returns the file of a shard.
+        save_users(habits_by_user): Replaces the habits of users.
+        save_user(user, habits): Replaces the habits of one user.
+        load_user(user): Loads the habits of one user.
+        users(): Names of all stored users.
+        load_all(): Loads the habits of every user in parallel.
+        map_reduce(mapper, reducer, initial, *arguments): Runs a function per shard and merges the results.
+        longest_streak(): Longest streak among daily habits.
+        type_counts(): Number of habits per type.
+        struggle_report(first_day, last_day, threshold): Struggling habits of all users.
+    """
+
+    def __init__(self, directory, shards=16, processes=None):
+        """
+        Opens a sharded store, creating it with ``shards`` shards if needed.
+
+        The number of shards of an existing store is read from its manifest.
+
+        Args:
+            directory (str): Directory holding the shard files.
+            shards (int): Number of shards of a new store.
+            processes (int, optional): Worker processes used by parallel operations.
+        """
+        self.directory = directory
+        self.processes = processes
+        manifest = os.path.join(directory, MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, 'r') as file:
+                shards = json.load(file)['shards']
+        else:
+            # Shards are created empty, so every save can check their version.
+            for shard in range(shards):
+                os.makedirs(os.path.dirname(self.shard_filename(shard)), exist_ok=True)
+                save_records_to_json_file([], self.shard_filename(shard))
+            save_records_to_json_file({'shards': shards}, manifest)
+        self.shards = shards
+
+    def shard_filename(self, shard):
+        """
+        Returns the file of a shard, in a directory of its own.
+
+        Args:
+            shard (int): The shard number.
+
+        Returns:
+            str: Path of the shard file.
+        """
+        return os.path.join(self.directory, 'shard-{:03d}'.format(shard), 'habits.json')
+
+    def save_users(self, habits_by_user):
+        """
+        Replaces the stored habits of users, writing each touched shard once.
+
+        Args:
+            habits_by_user (dict): Habits per user name. An empty list removes the user.
+        """
+        by_shard = defaultdict(dict)
+        for user, habits in habits_by_user.items():
+            by_shard[shard_of(user, self.shards)][user] = [habit_to_record(habit) for habit in habits]
+
+        for shard, users in by_shard.items():
+            filename = self.shard_filename(shard)
+            while True:
+                records, version = _read_shard(filename)
+                records = [record for record in records if record['user'] not in users]
+                for user, user_records in users.items():
+                    records.extend(dict(record, user=user) for record in user_records)
+                try:
+                    save_records_to_json_file(records, filename, version)
+                    break
+                except VersionConflictError:
+                    # Another writer saved the shard; merge into its version.
+                    continue
+
+    def save_user(self, user, habits):
+        """
+        Replaces the stored habits of one user.
+
+        Args:
+            user (str): The user name.
+            habits (list): The user's habits.
+        """
+        self.save_users({user: habits})
+
+    def load_user(self, user):
+        """
+        Loads the habits of one user, reading only the user's shard.
+
+        Args:
+            user (str): The user name.
+
+        Returns:
+            list: The user's habits.
+        """
+        records = _read_shard(self.shard_filename(shard_of(user, self.shards)))[0]
+        return [habit_from_record(record) for record in records if record['user'] == user]
+
+    def users(self):
+        """
+        Returns the names of all stored users.
+
+        Returns:
+            list: User names, sorted.
+        """
+        return sorted(self.map_reduce(_shard_users, set.union, set()))
+
+    def _map(self, mapper, arguments):
+        jobs = [(self.shard_filename(shard), mapper, arguments) for shard in range(self.shards)]
+        if self.processes == 1:
+            return map(_map_shard, jobs)
+        processes = self.processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(min(processes, len(jobs))) as executor:
+            return list(executor.map(_map_shard, jobs))
+
+    def load_all(self):
+        """
+        Loads the habits of every user, opening the shards in parallel.
+
+        Returns:
+            dict: Habits per user name.
+        """
+        return self.map_reduce(_shard_habits, _merge_dicts, {})
+
+    def map_reduce(self, mapper, reducer, initial, *arguments):
+        """
+        Runs a function on every shard in the worker processes and merges the results.
+
+        Args:
+            mapper (callable): Called as ``mapper(habits_by_user, *arguments)`` for each
+                shard; it must be a module-level function so it can be sent to the workers.
+            reducer (callable): Merges two results, as ``reducer(merged, result)``.
+            initial: The result of an empty store.
+            *arguments: Extra arguments passed to the mapper.
+
+        Returns:
+            The merged result.
+        """
+        return functools.reduce(reducer, self._map(mapper, arguments), initial)
+
+    def longest_streak(self):
+        """
+        Finds the longest streak among the daily habits of all users.
+
+        Returns:
+            int: Length of the longest run of consecutive completed days.
+        """
+        return self.map_reduce(_shard_longest_streak, max, 0)
+
+    def type_counts(self):
+        """
+        Counts the habits of all users per type.
+
+        Returns:
+            Counter: Number of habits per type name.
+        """
+        return self.map_reduce(_shard_type_counts, Counter.__add__, Counter())
+
+    def struggle_report(self, first_day, last_day, threshold=1.0):
+        """
+        Ranks the habits of all users that missed due dates in a date range.
+
+        Every shard is ranked by statistics_1.struggle_report and the ranked
+        lists are merged.
+
+        Args:
+            first_day (date or datetime): First day of the range.
+            last_day (date or datetime): Last day of the range, included.
+            threshold (float): A habit struggles when it completed less than this share of its due dates.
+
+        Returns:
+            list: ``(user, name, due, completed)`` tuples, worst adherence first and,
+            among equal adherence, most missed due dates first.
+        """
+        ranked = self._map(_shard_struggle_report, (first_day, last_day, threshold))
+        return list(heapq.merge(*ranked, key=lambda row: (row[3] / row[2], row[3] - row[2])))
+
+
+def _merge_dicts(merged, result):
+    merged.update(result)
+    return merged
+
+
+def _shard_habits(users):
+    return users
+
+
+def _shard_users(users):
+    return set(users)
+
+
+def _shard_longest_streak(users):
+    return daily_habits_longest_streak([habit for habits in users.values() for habit in habits])
+
+
+def _shard_type_counts(users):
+    return Counter(type(habit).__name__ for habits in users.values() for habit in habits)
+
+
+def _shard_struggle_report(users, first_day, last_day, threshold):
+    owners = [user for user, habits in users.items() for _ in habits]
+    habits = [habit for user_habits in users.values() for habit in user_habits]
+    ranked, due, completed = struggle_ranking(habits, first_day, last_day, threshold)
+    return [(owners[position], habits[position].name, due_dates, completions)
+            for position, due_dates, completions in zip(ranked.tolist(), due.tolist(), completed.tolist())]
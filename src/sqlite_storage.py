@@ -0,0 +1,205 @@
+import json
+import sqlite3
+
+from datetime import datetime
+from src.DailyHabit import DailyHabit
+from src.WeeklyHabit import WeeklyHabit
+from src.MonthlyHabit import MonthlyHabit
+from src.statistics_1 import last_month_range, struggle_report
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS habits (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    start_day INTEGER NOT NULL,
+    weekdays TEXT,
+    target_days TEXT,
+    broken INTEGER NOT NULL,
+    streak_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS habits_by_type ON habits (type);
+CREATE TABLE IF NOT EXISTS completions (
+    habit_id INTEGER NOT NULL REFERENCES habits (id) ON DELETE CASCADE,
+    day INTEGER NOT NULL,
+    PRIMARY KEY (habit_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS completions_by_day ON completions (day, habit_id);
+"""
+
+# Columns of the habits table read by _habit_from_row. Habits are identified
+# by id, so several habits may share a name, as in the JSON files.
+HABIT_COLUMNS = 'id, name, type, start_date, weekdays, target_days, broken, streak_count'
+
+
+def connect(filename):
+    """
+    Opens a habits database, creating the schema if needed.
+
+    The database uses write-ahead logging so that readers do not block the writer.
+    Completion days are stored as day ordinals (``date.toordinal()``).
+
+    Args:
+        filename (str): The name of the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA foreign_keys=ON')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def save_habits_to_sqlite(habits, filename):
+    """
+    Saves a list of habit objects to a SQLite database, replacing its content.
+
+    All rows are written with executemany inside a single transaction.
+
+    Args:
+        habits (list): List of Habit objects to be saved.
+        filename (str): The name of the SQLite database file.
+
+    Returns:
+        None
+    """
+    habit_rows = []
+    completion_rows = []
+    for habit_id, habit in enumerate(habits, start=1):
+        habit_rows.append((
+            habit_id,
+            habit.name,
+            type(habit).__name__,
+            habit.start_date.isoformat(),
+            habit.start_date.toordinal(),
+            json.dumps(habit.weekdays) if isinstance(habit, WeeklyHabit) else None,
+            json.dumps(habit.target_days) if isinstance(habit, MonthlyHabit) else None,
+            int(habit.broken),
+            habit.streak_counter,
+        ))
+        completion_rows.extend((habit_id, day) for day in habit.completed_dates.ordinals())
+
+    connection = connect(filename)
+    try:
+        with connection:
+            connection.execute('DELETE FROM completions')
+            connection.execute('DELETE FROM habits')
+            connection.executemany('INSERT INTO habits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', habit_rows)
+            connection.executemany('INSERT INTO completions (habit_id, day) VALUES (?, ?)', completion_rows)
+    finally:
+        connection.close()
+
+
+def load_habits_from_sqlite(filename, habit_type=None):
+    """
+    Loads habit objects from a SQLite database.
+
+    The loaded habits are not dirty, like habits loaded from a JSON file.
+
+    Args:
+        filename (str): The name of the SQLite database file.
+        habit_type (type, optional): Only load habits of this type (DailyHabit, WeeklyHabit, MonthlyHabit).
+
+    Returns:
+        list: List of loaded Habit objects.
+    """
+    connection = connect(filename)
+    try:
+        query = 'SELECT {} FROM habits'.format(HABIT_COLUMNS)
+        parameters = ()
+        if habit_type is not None:
+            query += ' WHERE type = ?'
+            parameters = (_type_name(habit_type),)
+        habits = {row[0]: _habit_from_row(row) for row in connection.execute(query + ' ORDER BY id', parameters)}
+
+        completions = connection.execute(
+            'SELECT c.habit_id, c.day FROM completions c JOIN habits h ON h.id = c.habit_id' +
+            (' WHERE h.type = ?' if habit_type is not None else ''), parameters)
+        for habit_id, day in completions:
+            habits[habit_id].completed_dates.add_ordinal(day)
+    finally:
+        connection.close()
+
+    for habit in habits.values():
+        habit.dirty = False
+    return list(habits.values())
+
+
+def _habit_from_row(row):
+    """
+    Creates a habit object, without its completions, from a row of HABIT_COLUMNS.
+    """
+    _, name, type_name, start_date, weekdays, target_days, broken, streak_count = row
+    start_date = datetime.fromisoformat(start_date)
+    if type_name == 'WeeklyHabit':
+        habit = WeeklyHabit(name, start_date, json.loads(weekdays))
+    elif type_name == 'MonthlyHabit':
+        habit = MonthlyHabit(name, start_date, json.loads(target_days))
+    else:
+        habit = DailyHabit(name, start_date)
+    habit.broken = bool(broken)
+    habit.streak_counter = streak_count or 0
+    return habit
+
+
+def _type_name(habit_type):
+    """
+    Returns the stored type name of a habit class or type name.
+    """
+    return habit_type if isinstance(habit_type, str) else habit_type.__name__
+
+
+def habits_with_same_frequency_sql(filename, habit_type):
+    """
+    Retrieves names of habits with the same periodicity using the indexed habit type.
+
+    Args:
+        filename (str): The name of the SQLite database file.
+        habit_type (type): Type of Habit (DailyHabit, WeeklyHabit, MonthlyHabit).
+
+    Returns:
+        list: Names of habits with the specified periodicity.
+    """
+    connection = connect(filename)
+    try:
+        rows = connection.execute('SELECT name FROM habits WHERE type = ? ORDER BY id', (_type_name(habit_type),))
+        return [name for name, in rows]
+    finally:
+        connection.close()
+
+
+def find_habits_strugled_last_month_sql(filename, today=None):
+    """
+    Finds habits that were struggled with last month, reading only last month's completions.
+
+    The habits are ranked by statistics_1.struggle_report, so every habit type
+    is judged by the same rules and in the same order as in memory. Only the
+    habits started by the end of the month and the completions within the
+    month are read, the latter with a range scan of the ``(day, habit_id)`` index.
+
+    Args:
+        filename (str): The name of the SQLite database file.
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        list: Names of habits that were struggled with last month, worst first.
+    """
+    first_day, last_day = last_month_range(today)
+
+    connection = connect(filename)
+    try:
+        habits = {row[0]: _habit_from_row(row) for row in connection.execute(
+            'SELECT {} FROM habits WHERE start_day <= ? ORDER BY id'.format(HABIT_COLUMNS), (last_day.toordinal(),))}
+        completions = connection.execute('SELECT habit_id, day FROM completions WHERE day BETWEEN ? AND ?',
+                                         (first_day.toordinal(), last_day.toordinal()))
+        for habit_id, day in completions:
+            if habit_id in habits:
+                habits[habit_id].completed_dates.add_ordinal(day)
+    finally:
+        connection.close()
+
+    return [name for name, _, _ in struggle_report(list(habits.values()), first_day, last_day)]
@@ -1,19 +1,16 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import timedelta 
-import sys
-import os
+from datetime import date, datetime, timedelta
 
-# Get the absolute path of the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
+import numpy as np
 
-# Add the parent directory (root directory) to the Python path
-parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
-sys.path.append(parent_dir)
-
-from src.habit_tracker import load_habits_from_json_file
+from src import habit_tracker
 from src.Habit import *
 from src.DailyHabit import DailyHabit
+from src.schedule_index import EPOCH_ORDINAL, due_counts
+from src.streak_engine import completion_ordinals, compute_streaks, longest_streak
+
+# pandas and matplotlib are imported inside the functions that need them, so
+# that importing this module stays cheap for callers that never build a
+# DataFrame or draw a chart.
 
 def daily_habits_longest_streak(habits):
     """
@@ -25,13 +22,8 @@ def daily_habits_longest_streak(habits):
     Returns:
         int: Length of the longest streak among daily habits.
     """
-    max_streak = 0
-    for habit in habits:
-        if isinstance(habit, DailyHabit):
-            streak = habit.streak_counter
-            if streak is not None:
-                max_streak = max(max_streak, streak)
-    return max_streak
+    daily_habits = [habit for habit in habits if isinstance(habit, DailyHabit)]
+    return find_longest_run_streak_among_all_habits(daily_habits)
 
 def current_daily_habits(habits):
     """
@@ -46,26 +38,93 @@ def current_daily_habits(habits):
     current_daily_habits = [habit.name for habit in habits if isinstance(habit, DailyHabit)]
     return current_daily_habits
 
-def find_habits_strugled_last_month(habits):
+def last_month_range(today=None):
     """
-    Finds habits that were struggled with last month.
+    Returns the first and the last day of the calendar month before today.
+
+    Args:
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        tuple: ``(first_day, last_day)`` dates.
+    """
+    today = today or datetime.now()
+    last_day = today.replace(day=1) - timedelta(days=1)
+    return last_day.replace(day=1).date(), last_day.date()
+
+def last_weeks_range(weeks, today=None):
+    """
+    Returns the range of the given number of weeks that ends yesterday.
+
+    Args:
+        weeks (int): Number of weeks.
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        tuple: ``(first_day, last_day)`` dates.
+    """
+    last_day = (today or datetime.now()).date() - timedelta(days=1)
+    return last_day - timedelta(weeks=weeks) + timedelta(days=1), last_day
+
+def struggle_report(habits, first_day, last_day, threshold=1.0):
+    """
+    Ranks the habits that missed due dates in a date range.
+
+    Expected completions are the due dates of each habit's schedule within the
+    range and on or after its start date. All habits sharing a schedule are
+    evaluated together with NumPy, so the cost grows with the number of habits
+    times the length of the range, not with the whole completion history.
 
     Args:
         habits (list): List of Habit objects.
+        first_day (date or datetime): First day of the range.
+        last_day (date or datetime): Last day of the range, included.
+        threshold (float): A habit struggles when it completed less than this share of its due dates.
 
     Returns:
-        list: Names of habits that were struggled with last month.
+        list: ``(name, due, completed)`` tuples of the struggling habits, worst
+        adherence first and, among equal adherence, most missed due dates first.
     """
-    last_month = datetime.now().replace(day=1) - timedelta(days=1)
-    struggling_habits = []
+    ranked, due, completed = struggle_ranking(habits, first_day, last_day, threshold)
+    names = [habits[index].name for index in ranked.tolist()]
+    return list(zip(names, due.tolist(), completed.tolist()))
 
-    for habit in habits:
-        if isinstance(habit, DailyHabit):
-            last_month_completed_dates = [date for date in habit.completed_dates if date.month == last_month.month]
-            if len(last_month_completed_dates) < habit.streak_counter():
-                struggling_habits.append(habit.name)
+def struggle_ranking(habits, first_day, last_day, threshold=1.0):
+    """
+    Ranks the habits that missed due dates in a date range by position.
 
-    return struggling_habits
+    Args:
+        habits (list): List of Habit objects.
+        first_day (date or datetime): First day of the range.
+        last_day (date or datetime): Last day of the range, included.
+        threshold (float): A habit struggles when it completed less than this share of its due dates.
+
+    Returns:
+        tuple: ``(positions, due, completed)`` NumPy arrays of the struggling
+        habits in the order of struggle_report.
+    """
+    due, completed = due_counts(habits, first_day, last_day)
+    struggling = np.flatnonzero(completed < due * threshold)
+    adherence = completed[struggling] / due[struggling]
+    missed = due[struggling] - completed[struggling]
+    ranked = struggling[np.lexsort((-missed, adherence))]
+    return ranked, due[ranked], completed[ranked]
+
+def find_habits_strugled_last_month(habits, today=None):
+    """
+    Finds habits that were struggled with last month.
+
+    A habit struggled when it was not completed on every date its schedule
+    made due in the previous calendar month.
+
+    Args:
+        habits (list): List of Habit objects.
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        list: Names of habits that were struggled with last month, worst first.
+    """
+    return [name for name, _, _ in struggle_report(habits, *last_month_range(today))]
 
 def all_habits(habits):
     """
@@ -92,6 +151,25 @@ def habits_with_same_frequency(habits, habit_type):
     """
     return [habit.name for habit in habits if isinstance(habit, habit_type)]
 
+def daily_digest(date_index, day):
+    """
+    Retrieves names of the habits completed on a day, grouped by periodicity.
+
+    The habits are looked up in a DateIndex, so the cost depends on the number
+    of habits completed that day rather than on the whole completion history.
+
+    Args:
+        date_index (DateIndex): Index of the tracked habits.
+        day (date or datetime): The day.
+
+    Returns:
+        dict: Names of the completed habits per habit type name.
+    """
+    digest = {}
+    for habit in date_index.habits_on(day):
+        digest.setdefault(type(habit).__name__, []).append(habit.name)
+    return digest
+
 def find_longest_run_streak_among_all_habits(habits):
     """
     Finds the longest run streak among all habits.
@@ -102,11 +180,10 @@ def find_longest_run_streak_among_all_habits(habits):
     Returns:
         int: Length of the longest run streak among all habits.
     """
-    max_streak = 0
-    for habit in habits:
-        streak = habit.streak_counter()
-        max_streak = max(max_streak, streak)
-    return max_streak
+    if not habits:
+        return 0
+    _, longest = compute_streaks(habits)
+    return int(longest.max())
 
 def find_longest_run_streak_for_specific_habit(habit):
     """
@@ -118,40 +195,171 @@ def find_longest_run_streak_for_specific_habit(habit):
     Returns:
         int: Length of the longest run streak for the specified habit.
     """
-    return habit.streak_counter()
+    return longest_streak(habit)
 
-def load_habits_from_json_file():
+def load_habits_from_json_file(filename='habits.json'):
     """
     Loads habits from a JSON file.
 
+    Args:
+        filename (str): The name of the JSON file. Defaults to 'habits.json'.
+
     Returns:
         list: List of Habit objects.
     """
-    return load_habits_from_json_file('habits.json')
+    return habit_tracker.load_habits_from_json_file(filename)
 
 def create_dataframe_of_habit(habits):
     """
     Creates a pandas DataFrame containing information about each habit.
 
+    Every column is filled directly into a preallocated array; ``Name`` and
+    ``Type`` are categorical. The habits are not modified: ``Broken`` is
+    derived from the completions the same way ``check_break()`` does.
+
     Args:
         habits (list): List of Habit objects.
 
     Returns:
         pd.DataFrame: DataFrame with habit information.
     """
-    habit_data_list = []
-    for habit in habits:
-        habit_data = {
-            'Name': habit.name,
-            'Type': type(habit).__name__,
-            'Start Date': habit.start_date,
-            'End Date': habit.end_date,
-            'Completed Dates': len(habit.completed_dates),
-            'Streak Count': getattr(habit, 'streak_count', None),
-            'Broken': habit.check_break()
-        }
-        habit_data_list.append(habit_data)
-    return pd.DataFrame(habit_data_list)
+    import pandas as pd
+
+    count = len(habits)
+    types = {}
+    type_codes = np.fromiter((types.setdefault(type(habit).__name__, len(types)) for habit in habits),
+                             dtype=np.int32, count=count)
+    completed = np.fromiter((len(habit.completed_dates) for habit in habits), dtype=np.int64, count=count)
+    return pd.DataFrame({
+        'Name': pd.Categorical([habit.name for habit in habits]),
+        'Type': pd.Categorical.from_codes(type_codes, categories=list(types)),
+        'Start Date': np.fromiter((habit.start_date for habit in habits), dtype='datetime64[us]', count=count),
+        'End Date': np.fromiter((habit.end_date for habit in habits), dtype='datetime64[us]', count=count),
+        'Completed Dates': completed,
+        'Streak Count': np.fromiter((habit.streak_counter for habit in habits), dtype=np.int64, count=count),
+        'Broken': completed == 0,
+    })
+
+def create_dataframe_of_completions(habits):
+    """
+    Creates a long-format pandas DataFrame with one row per completed day of each habit.
+
+    The rows are assembled from the completion bitmaps of all habits in one
+    vectorized pass, without creating a Python object per completion.
+
+    Args:
+        habits (list): List of Habit objects.
+
+    Returns:
+        pd.DataFrame: DataFrame with the columns ``Habit`` (position of the
+        habit in ``habits``), ``Name`` (categorical) and ``Date``, sorted by
+        habit and date.
+    """
+    import pandas as pd
+
+    ordinals, owners = completion_ordinals(habits) if habits else (np.zeros(0, dtype=np.int64),) * 2
+    names = {}
+    name_codes = np.fromiter((names.setdefault(habit.name, len(names)) for habit in habits),
+                             dtype=np.int32, count=len(habits))
+    return pd.DataFrame({
+        'Habit': owners,
+        'Name': pd.Categorical.from_codes(name_codes[owners], categories=list(names)),
+        'Date': (ordinals - EPOCH_ORDINAL).astype('datetime64[D]'),
+    })
+
+def _plot_bars(data_frame, column, ax):
+    """
+    Draws one bar per habit name, leaving the axes empty when there are no habits.
+    """
+    if data_frame.empty:
+        # pandas cannot lay out a bar chart without rows.
+        return
+    data_frame.plot(kind='bar', x='Name', y=column, legend=False, ax=ax)
+
+def plot_completed_dates(data_frame_habit, ax):
+    """
+    Draws the number of completed dates for each habit as a bar chart.
+
+    Args:
+        data_frame_habit (pd.DataFrame): DataFrame with habit information.
+        ax (matplotlib.axes.Axes): The axes to draw on.
+    """
+    _plot_bars(data_frame_habit, 'Completed Dates', ax)
+    ax.set_title('Number of Completed Dates for Each Habit')
+    ax.set_xlabel('Habit Name')
+    ax.set_ylabel('Number of Completed Dates')
+
+def plot_daily_habits_streak_count(data_frame_daily_habits, ax):
+    """
+    Draws the streak count for daily habits as a bar chart.
+
+    Missing streak counts are drawn as 0. The DataFrame is not modified.
+
+    Args:
+        data_frame_daily_habits (pd.DataFrame): DataFrame with daily habit information.
+        ax (matplotlib.axes.Axes): The axes to draw on.
+    """
+    streak_counts = data_frame_daily_habits['Streak Count'].fillna(0)
+    _plot_bars(data_frame_daily_habits.assign(**{'Streak Count': streak_counts}), 'Streak Count', ax)
+    ax.set_title('Streak Count for Daily Habits')
+    ax.set_xlabel('Habit Name')
+    ax.set_ylabel('Streak Count')
+
+def plot_broken_habit(data_frame_habit, ax):
+    """
+    Draws the broken status for each habit as a bar chart.
+
+    Args:
+        data_frame_habit (pd.DataFrame): DataFrame with habit information.
+        ax (matplotlib.axes.Axes): The axes to draw on.
+    """
+    _plot_bars(data_frame_habit.assign(Broken=data_frame_habit['Broken'].astype(int)), 'Broken', ax)
+    ax.set_title('Broken Status for Each Habit')
+    ax.set_xlabel('Habit Name')
+    ax.set_ylabel('Broken (1 for True, 0 for False)')
+
+def plot_calendar_heatmap(year_view, year, ax):
+    """
+    Draws a year view of completion counts as a calendar heatmap.
+
+    Args:
+        year_view (np.ndarray): ``(WEEKS, 7)`` counts from CalendarHeatmap.year_view().
+        year (int): The year shown.
+        ax (matplotlib.axes.Axes): The axes to draw on.
+
+    Returns:
+        matplotlib.image.AxesImage: The drawn image, for adding a colorbar.
+    """
+    from src.calendar_heatmap import WEEKS, calendar_mask
+
+    # Cells outside the year are masked, so they stay blank.
+    counts = np.ma.masked_array(year_view, mask=~calendar_mask(year)).T
+    image = ax.imshow(counts, aspect='equal', cmap='Greens', vmin=0)
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+    new_years = date(year, 1, 1).weekday()
+    month_starts = [(date(year, month, 1).timetuple().tm_yday - 1 + new_years) // 7 for month in range(1, 13)]
+    ax.set_xticks(month_starts)
+    ax.set_xticklabels(['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
+    ax.set_xlim(-0.5, WEEKS - 0.5)
+    ax.set_title('Completed Habits per Day in {}'.format(year))
+    return image
+
+def view_calendar_heatmap(habits, year):
+    """
+    Visualizes the completions of habits in a year as a calendar heatmap.
+
+    Args:
+        habits (list): List of Habit objects.
+        year (int): The year shown.
+    """
+    import matplotlib.pyplot as plt
+    from src.calendar_heatmap import CalendarHeatmap
+
+    figure = plt.figure(figsize=(12, 3))
+    image = plot_calendar_heatmap(CalendarHeatmap(habits).year_view(year), year, figure.gca())
+    figure.colorbar(image, ax=figure.gca(), label='Completions')
+    plt.show()
 
 def view_completed_habits_calender(data_frame_habit):
     """
@@ -160,10 +368,9 @@ def view_completed_habits_calender(data_frame_habit):
     Args:
         data_frame_habit (pd.DataFrame): DataFrame with habit information.
     """
-    data_frame_habit.plot(kind='bar', x='Name', y='Completed Dates', legend=False)
-    plt.title('Number of Completed Dates for Each Habit')
-    plt.xlabel('Habit Name')
-    plt.ylabel('Number of Completed Dates')
+    import matplotlib.pyplot as plt
+
+    plot_completed_dates(data_frame_habit, plt.figure().gca())
     plt.show()
 
 def view_daily_habits_streak_count(data_frame_daily_habits):
@@ -173,12 +380,9 @@ def view_daily_habits_streak_count(data_frame_daily_habits):
     Args:
         data_frame_daily_habits (pd.DataFrame): DataFrame with daily habit information.
     """
-    data_frame_daily_habits['Streak Count'] = data_frame_daily_habits['Streak Count'].apply(lambda x: 0 if x is None else x)
-    
-    data_frame_daily_habits.plot(kind='bar', x='Name', y='Streak Count', legend=False)
-    plt.title('Streak Count for Daily Habits')
-    plt.xlabel('Habit Name')
-    plt.ylabel('Streak Count')
+    import matplotlib.pyplot as plt
+
+    plot_daily_habits_streak_count(data_frame_daily_habits, plt.figure().gca())
     plt.show()
 
 
@@ -189,9 +393,7 @@ def view_broken_habit(data_frame_habit):
     Args:
         data_frame_habit (pd.DataFrame): DataFrame with habit information.
     """
-    data_frame_habit['Broken'] = data_frame_habit['Broken'].astype(int)
-    data_frame_habit.plot(kind='bar', x='Name', y='Broken', legend=False)
-    plt.title('Broken Status for Each Habit')
-    plt.xlabel('Habit Name')
-    plt.ylabel('Broken (1 for True, 0 for False)')
+    import matplotlib.pyplot as plt
+
+    plot_broken_habit(data_frame_habit, plt.figure().gca())
     plt.show()
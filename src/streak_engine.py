@@ -0,0 +1,187 @@
+from datetime import datetime
+
+import numpy as np
+
+
+def joined_completion_bits(habits):
+    """
+    Unpacks the completion bitmaps of many habits into one array of bits.
+
+    The bitmaps are joined with a zero byte before, between and after them, so
+    a run of set bits never crosses from one habit into the next.
+
+    Args:
+        habits (list): List of Habit objects.
+
+    Returns:
+        tuple: ``(bits, bit_offsets, bit_lengths, origins)`` where ``bits`` is
+        the unpacked uint8 array, and the other NumPy arrays give for every habit
+        the position of its first bit in ``bits``, its number of bits and the
+        day ordinal of its first bit.
+    """
+    bitmaps = [habit.completed_dates for habit in habits]
+    bit_lengths = np.fromiter((len(bitmap.data) * 8 for bitmap in bitmaps), dtype=np.int64, count=len(bitmaps))
+    origins = np.fromiter((bitmap.origin for bitmap in bitmaps), dtype=np.int64, count=len(bitmaps))
+
+    buffer = np.frombuffer(b'\0' + b'\0'.join(bitmap.data for bitmap in bitmaps) + b'\0', dtype=np.uint8)
+    bits = np.unpackbits(buffer, bitorder='little')
+
+    bit_offsets = np.full(len(bitmaps), 8, dtype=np.int64)
+    np.cumsum(bit_lengths[:-1] + 8, out=bit_offsets[1:])
+    bit_offsets[1:] += 8
+    return bits, bit_offsets, bit_lengths, origins
+
+
+def completion_ordinals(habits):
+    """
+    Lists the completed day ordinals of many habits in one vectorized pass.
+
+    Args:
+        habits (list): List of Habit objects.
+
+    Returns:
+        tuple: ``(ordinals, owners)`` NumPy arrays giving every completed day
+        ordinal and the index of its habit, grouped by habit and in ascending
+        date order within each habit.
+    """
+    bits, bit_offsets, _, origins = joined_completion_bits(habits)
+    positions = np.flatnonzero(bits)
+    owners = np.searchsorted(bit_offsets, positions, side='right') - 1
+    return positions - bit_offsets[owners] + origins[owners], owners
+
+
+def completion_matrix(habits, first_day, last_day):
+    """
+    Builds a habits x days matrix of completions within a range of days.
+
+    Only the bytes of each bitmap that overlap the range are copied, so the
+    cost depends on the length of the range rather than on the whole history.
+
+    Args:
+        habits (list): List of Habit objects.
+        first_day (int): Ordinal of the first day of the range.
+        last_day (int): Ordinal of the last day of the range, included.
+
+    Returns:
+        np.ndarray: Boolean matrix with one row per habit and one column per day.
+    """
+    days = last_day - first_day + 1
+    # Bytes needed to cover the range starting at any bit of the first byte.
+    width = (days + 7) // 8 + 1
+    shifts = np.empty(len(habits), dtype=np.int64)
+    chunks = []
+    for row, habit in enumerate(habits):
+        bitmap = habit.completed_dates
+        shift = first_day - bitmap.origin
+        start = shift >> 3
+        shifts[row] = shift & 7
+        if start < 0:
+            chunk = bytes(min(-start, width)) + bitmap.data[:max(width + start, 0)]
+        else:
+            chunk = bitmap.data[start:start + width]
+        chunks.append(chunk.ljust(width, b'\0'))
+
+    packed = np.frombuffer(b''.join(chunks), dtype=np.uint8).reshape(len(habits), width)
+    bits = np.unpackbits(packed, axis=1, bitorder='little').view(bool)
+    if len(habits) and (shifts == shifts[0]).all():
+        return bits[:, shifts[0]:shifts[0] + days]
+    # Rows with the same bit shift are copied together as one slice.
+    matrix = np.empty((len(habits), days), dtype=bool)
+    for shift in range(8):
+        rows = np.flatnonzero(shifts == shift)
+        if len(rows):
+            matrix[rows] = bits[rows, shift:shift + days]
+    return matrix
+
+
+def completion_runs(habits):
+    """
+    Extracts the runs of consecutive completed days of many habits in one vectorized pass.
+
+    Run boundaries are found with a single difference over the bits returned by
+    ``joined_completion_bits``.
+
+    Args:
+        habits (list): List of Habit objects.
+
+    Returns:
+        tuple: ``(first_days, lengths, owners)`` NumPy arrays giving the first day
+        ordinal, the length and the habit index of every run, grouped by habit
+        and in ascending date order within each habit.
+    """
+    bits, bit_offsets, _, origins = joined_completion_bits(habits)
+    bits = bits.view(np.int8)
+    edges = np.flatnonzero(np.diff(bits))
+    run_starts, run_ends = edges[0::2] + 1, edges[1::2] + 1
+    owners = np.searchsorted(bit_offsets, run_starts, side='right') - 1
+    return run_starts - bit_offsets[owners] + origins[owners], run_ends - run_starts, owners
+
+
+def compute_streaks(habits, today=None):
+    """
+    Computes the current and the all-time longest streak of many habits at once.
+
+    A streak is a run of consecutive completed days. The current streak is the
+    run that reaches today or yesterday; an older run no longer counts as current.
+    Because the runs are derived from the stored completion dates, the result
+    does not depend on the order in which completions were recorded.
+
+    Args:
+        habits (list): List of Habit objects.
+        today (datetime, optional): The reference date for current streaks. Defaults to the current date.
+
+    Returns:
+        tuple: ``(current, longest)`` NumPy integer arrays aligned with ``habits``.
+    """
+    today = (today or datetime.now()).toordinal()
+    current = np.zeros(len(habits), dtype=np.int64)
+    longest = np.zeros(len(habits), dtype=np.int64)
+    if not habits:
+        return current, longest
+
+    first_days, lengths, owners = completion_runs(habits)
+    if not len(lengths):
+        return current, longest
+
+    # Runs are grouped by habit, so each habit's runs form one contiguous block.
+    first_run = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    habit_index = owners[first_run]
+    longest[habit_index] = np.maximum.reduceat(lengths, first_run)
+
+    # The current streak is the latest run starting no later than today,
+    # provided it reaches today or yesterday.
+    last_days = first_days + lengths - 1
+    eligible = np.where(first_days <= today, np.arange(len(lengths)), -1)
+    last_run = np.maximum.reduceat(eligible, first_run)
+    alive = last_run >= 0
+    alive[alive] = last_days[last_run[alive]] >= today - 1
+    runs = last_run[alive]
+    current[habit_index[alive]] = np.minimum(last_days[runs], today) - first_days[runs] + 1
+    return current, longest
+
+
+def longest_streak(habit):
+    """
+    Computes the all-time longest streak of a single habit.
+
+    Args:
+        habit (Habit): A specific Habit object.
+
+    Returns:
+        int: Length of the longest run of consecutive completed days.
+    """
+    return int(compute_streaks([habit])[1][0])
+
+
+def current_streak(habit, today=None):
+    """
+    Computes the current streak of a single habit.
+
+    Args:
+        habit (Habit): A specific Habit object.
+        today (datetime, optional): The reference date. Defaults to the current date.
+
+    Returns:
+        int: Length of the run of completed days ending today or yesterday.
+    """
+    return int(compute_streaks([habit], today)[0][0])
@@ -8,6 +8,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
 sys.path.append(parent_dir)
 
+import tempfile
 from datetime import datetime, timedelta
 
 from src.habit_tracker import load_habits_from_json_file, save_habits_to_json_file
@@ -78,3 +79,974 @@ def test_streak_count_update():
 # Run the test
 test_streak_count_update()
 
+def test_completion_bitmap():
+    habit = DailyHabit('Walk Daily', datetime(2024, 1, 10))
+    habit.mark_as_completed(datetime(2024, 1, 12))
+    habit.mark_as_completed(datetime(2024, 1, 20))
+    habit.mark_as_completed(datetime(2024, 3, 1))
+
+    assert datetime(2024, 1, 12).date() in habit.completed_dates
+    assert datetime(2024, 1, 13).date() not in habit.completed_dates
+    assert len(habit.completed_dates) == 3
+    assert habit.completed_dates.count_range(datetime(2024, 1, 12).date(), datetime(2024, 1, 20).date()) == 2
+
+    habit.mark_as_incomplete(datetime(2024, 1, 20))
+    assert list(habit.completed_dates) == [datetime(2024, 1, 12).date(), datetime(2024, 3, 1).date()]
+
+    # Dates earlier than the start date can still be stored when assigned directly
+    habit.completed_dates = {datetime(2023, 12, 25).date(), datetime(2024, 1, 11).date()}
+    assert habit.completed_dates == {datetime(2023, 12, 25).date(), datetime(2024, 1, 11).date()}
+
+def test_streak_engine():
+    from src.streak_engine import compute_streaks
+
+    start_date = datetime(2024, 1, 1)
+    habits = [DailyHabit('Run Daily', start_date), DailyHabit('Read Daily', start_date), DailyHabit('Idle Daily', start_date)]
+    # Completions recorded out of order must give the same streaks
+    for day in [5, 1, 2, 3, 9, 10, 4]:
+        habits[0].mark_as_completed(start_date + timedelta(days=day))
+    for day in [20, 18, 19]:
+        habits[1].mark_as_completed(start_date + timedelta(days=day))
+
+    current, longest = compute_streaks(habits, today=start_date + timedelta(days=20))
+    assert list(longest) == [5, 3, 0]
+    assert list(current) == [0, 3, 0]
+
+    current, _ = compute_streaks(habits, today=start_date + timedelta(days=11))
+    assert list(current) == [2, 0, 0]
+
+    # The stored streak count survives a save/load round trip
+    habits[0].streak_counter = 5
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.json')
+        save_habits_to_json_file(habits, filename)
+        assert load_habits_from_json_file(filename)[0].streak_counter == 5
+
+def test_period_streaks():
+    from src.schedule_index import ScheduleIndex
+
+    start_date = datetime(2024, 1, 1)  # A Monday
+    weekly_habit = WeeklyHabit('Swim Weekly', start_date, weekdays=[0, 2])
+    other_weekly_habit = WeeklyHabit('Yoga Weekly', start_date, weekdays=[2, 0])
+    monthly_habit = MonthlyHabit('Budget Monthly', start_date, target_days=[1, 15])
+
+    # Due dates: Jan 1, 3, 8, 10, 15, 17; Jan 8 is missed
+    for day in [1, 3, 10, 15, 17]:
+        weekly_habit.mark_as_completed(datetime(2024, 1, day))
+    for day in [(1, 1), (1, 15), (2, 1), (2, 15), (3, 1)]:
+        monthly_habit.mark_completed(datetime(2024, *day))
+
+    index = ScheduleIndex()
+    current, longest, adherence = index.period_streaks(
+        [weekly_habit, other_weekly_habit, monthly_habit], last_day=datetime(2024, 3, 15))
+    assert list(longest) == [3, 0, 5]
+    # Mar 15 is still open for the monthly habit, so its streak is not broken yet
+    assert list(current) == [0, 0, 5]
+    assert adherence[0] == 5 / 22
+    # Both weekly habits share a single cached schedule
+    assert len(index._cache) == 2
+
+    assert weekly_habit.get_streak_count(today=datetime(2024, 1, 17)) == 3
+    assert monthly_habit.get_streak_count(today=datetime(2024, 3, 1)) == 5
+
+def test_habit_journal():
+    from src.habit_journal import HabitJournal
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal_filename = os.path.join(directory, 'habits.journal')
+        snapshot_filename = os.path.join(directory, 'habits.json')
+
+        journal = HabitJournal(journal_filename, snapshot_filename, sync_every=2)
+        journal.load()
+        daily_habit = DailyHabit('Stretch Daily', datetime(2024, 1, 1))
+        weekly_habit = WeeklyHabit('Gym Weekly', datetime(2024, 1, 1), weekdays=[0, 2])
+        journal.add_habit(daily_habit)
+        journal.add_habit(weekly_habit)
+        daily_habit.mark_as_completed(datetime(2024, 1, 2))
+        daily_habit.mark_as_completed(datetime(2024, 1, 3))
+        weekly_habit.mark_as_completed(datetime(2024, 1, 3))
+        journal.close()
+        assert not os.path.exists(snapshot_filename)
+
+        journal = HabitJournal(journal_filename, snapshot_filename)
+        habits = {habit.name: habit for habit in journal.load()}
+        assert habits['Stretch Daily'].completed_dates == {datetime(2024, 1, 2).date(), datetime(2024, 1, 3).date()}
+        assert isinstance(habits['Gym Weekly'], WeeklyHabit)
+
+        # Compaction folds the journal into the snapshot and later changes are journaled again
+        journal.compact()
+        habits['Stretch Daily'].mark_as_incomplete(datetime(2024, 1, 2))
+        journal.close()
+        assert len(load_habits_from_json_file(snapshot_filename)[0].completed_dates) == 2
+
+        habits = {habit.name: habit for habit in HabitJournal(journal_filename, snapshot_filename).load()}
+        assert habits['Stretch Daily'].completed_dates == {datetime(2024, 1, 3).date()}
+
+        # A torn last record is cut off, so records appended after a crash are replayed
+        with open(journal_filename, 'a') as file:
+            file.write('{"op": "completed", "name": "Stretch')
+        journal = HabitJournal(journal_filename, snapshot_filename)
+        habits = {habit.name: habit for habit in journal.load()}
+        habits['Stretch Daily'].mark_as_completed(datetime(2024, 1, 4))
+        journal.close()
+        habits = {habit.name: habit for habit in HabitJournal(journal_filename, snapshot_filename).load()}
+        # Replay goes through the habit API and keeps the streak up to date
+        assert habits['Stretch Daily'].completed_dates == {datetime(2024, 1, 3).date(), datetime(2024, 1, 4).date()}
+        assert habits['Stretch Daily'].streak_counter == 2 and habits['Stretch Daily'].dirty
+
+def test_sqlite_storage():
+    from src.sqlite_storage import (find_habits_strugled_last_month_sql, habits_with_same_frequency_sql,
+                                    load_habits_from_sqlite, save_habits_to_sqlite)
+
+    start_date = datetime(2024, 1, 1)
+    consistent_habit = DailyHabit('Floss Daily', start_date)
+    lazy_habit = DailyHabit('Journal Daily', start_date)
+    monthly_habit = MonthlyHabit('Pay Rent Monthly', start_date, target_days=[1])
+    for day in range(1, 32):
+        consistent_habit.mark_as_completed(datetime(2024, 1, day))
+    lazy_habit.mark_as_completed(datetime(2024, 1, 5))
+    monthly_habit.mark_completed(datetime(2024, 1, 1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.db')
+        save_habits_to_sqlite([consistent_habit, lazy_habit, monthly_habit], filename)
+
+        habits = load_habits_from_sqlite(filename)
+        assert [habit.name for habit in habits] == ['Floss Daily', 'Journal Daily', 'Pay Rent Monthly']
+        assert len(habits[0].completed_dates) == 31
+        assert habits[2].target_days == (1,)
+        assert [habit.name for habit in load_habits_from_sqlite(filename, MonthlyHabit)] == ['Pay Rent Monthly']
+
+        assert habits_with_same_frequency_sql(filename, DailyHabit) == ['Floss Daily', 'Journal Daily']
+        assert find_habits_strugled_last_month_sql(filename, today=datetime(2024, 2, 10)) == ['Journal Daily']
+        assert not any(habit.dirty for habit in habits)
+
+        # Every habit type is ranked like the in-memory report, and names may repeat
+        from src.statistics_1 import find_habits_strugled_last_month
+        weekly_habit = WeeklyHabit('Journal Daily', start_date, [0, 3])
+        weekly_habit.mark_completed_many([datetime(2024, 1, 1), datetime(2024, 1, 4)])
+        habits = [consistent_habit, lazy_habit, monthly_habit, weekly_habit]
+        save_habits_to_sqlite(habits, filename)
+        assert [type(habit) for habit in load_habits_from_sqlite(filename)] == [DailyHabit, DailyHabit, MonthlyHabit, WeeklyHabit]
+        for today in (datetime(2024, 2, 10), datetime(2024, 3, 1)):
+            assert find_habits_strugled_last_month_sql(filename, today) == find_habits_strugled_last_month(habits, today)
+        assert find_habits_strugled_last_month_sql(filename, datetime(2024, 2, 10)) == ['Journal Daily', 'Journal Daily']
+
+def test_streaming_loader():
+    from src.habit_tracker import iter_habits_from_json_file, save_habits_to_ndjson_file
+
+    start_date = datetime(2024, 1, 1)
+    habits = [DailyHabit('Habit {}'.format(number), start_date) for number in range(50)]
+    habits.append(WeeklyHabit('Cycle Weekly', start_date, weekdays=[0]))
+    for habit in habits[:50]:
+        habit.mark_as_completed(datetime(2024, 1, 2))
+
+    with tempfile.TemporaryDirectory() as directory:
+        array_filename = os.path.join(directory, 'habits.json')
+        lines_filename = os.path.join(directory, 'habits.ndjson')
+        save_habits_to_json_file(habits, array_filename)
+        save_habits_to_ndjson_file(habits, lines_filename)
+
+        for filename in (array_filename, lines_filename):
+            loaded = list(iter_habits_from_json_file(filename))
+            assert [habit.name for habit in loaded] == [habit.name for habit in habits]
+            assert loaded[0]._completed_dates is None
+            assert loaded[0].completed_dates == {datetime(2024, 1, 2).date()}
+
+            weekly = list(iter_habits_from_json_file(filename, habit_type=WeeklyHabit))
+            assert [habit.name for habit in weekly] == ['Cycle Weekly']
+            assert [habit.name for habit in iter_habits_from_json_file(filename, names=['Habit 7'])] == ['Habit 7']
+
+        # Small chunks force records to be decoded across chunk boundaries
+        from src.habit_tracker import iter_habit_records
+        assert len(list(iter_habit_records(array_filename, chunk_size=7))) == 51
+
+def test_binary_snapshot():
+    from src.binary_snapshot import load_habits_from_binary_file, open_binary_snapshot, save_habits_to_binary_file
+
+    daily_habit = DailyHabit('Méditation Daily', datetime(2024, 1, 1, 7, 30))
+    weekly_habit = WeeklyHabit('Tennis Weekly', datetime(2024, 1, 1), weekdays=[5, 1])
+    monthly_habit = MonthlyHabit('Backup Monthly', datetime(2024, 1, 1), target_days=[28])
+    for day in [3, 1, 2]:
+        daily_habit.mark_as_completed(datetime(2024, 1, day, 8))
+    daily_habit.completed_dates.add(datetime(2023, 12, 31).date())
+    weekly_habit.mark_as_completed(datetime(2024, 1, 2))
+    weekly_habit.broken = True
+    daily_habit.streak_counter = 3
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.snapshot')
+        save_habits_to_binary_file([daily_habit, weekly_habit, monthly_habit], filename)
+
+        with open_binary_snapshot(filename) as snapshot:
+            assert len(snapshot) == 3
+            assert snapshot.name(0) == 'Méditation Daily'
+            assert list(snapshot.ordinals(0)) == [datetime(2023, 12, 31).toordinal() + day for day in range(4)]
+
+        loaded = load_habits_from_binary_file(filename)
+        assert loaded[0].start_date == datetime(2024, 1, 1, 7, 30)
+        assert loaded[0].completed_dates == daily_habit.completed_dates
+        assert loaded[0].streak_counter == 3
+        assert isinstance(loaded[1], WeeklyHabit) and loaded[1].weekdays == (1, 5) and loaded[1].broken
+        assert isinstance(loaded[2], MonthlyHabit) and loaded[2].target_days == (28,)
+        assert len(loaded[2].completed_dates) == 0
+        assert not any(habit.dirty for habit in loaded)
+
+        # Views may outlive close(), and saving replaces the file instead of truncating the mapped one
+        with open_binary_snapshot(filename) as snapshot:
+            ordinals = snapshot.ordinals(0)
+        save_habits_to_binary_file([monthly_habit], filename)
+        assert len(ordinals) == 4 and os.listdir(directory) == ['habits.snapshot']
+        assert [habit.name for habit in load_habits_from_binary_file(filename)] == ['Backup Monthly']
+
+def test_mark_completed_many():
+    import numpy as np
+
+    start_date = datetime(2024, 1, 1)
+    daily_habit = DailyHabit('Vitamins Daily', start_date)
+    rejected = daily_habit.mark_completed_many([datetime(2024, 1, 3), datetime(2023, 12, 31), datetime(2024, 1, 2), datetime(2024, 1, 4)])
+    assert rejected == [datetime(2023, 12, 31)]
+    assert len(daily_habit.completed_dates) == 3
+    assert daily_habit.get_streak_count() == 3
+    assert daily_habit.end_date == datetime(2024, 1, 4)
+
+    weekly_habit = WeeklyHabit('Climb Weekly', start_date, weekdays=[0, 2])
+    days = np.arange('2024-01-01', '2024-01-15', dtype='datetime64[D]')
+    rejected = weekly_habit.mark_completed_many(days)
+    assert len(rejected) == 10
+    assert sorted(weekly_habit.completed_dates) == [datetime(2024, 1, day).date() for day in (1, 3, 8, 10)]
+
+    monthly_habit = MonthlyHabit('Review Monthly', start_date, target_days=[1, 15])
+    changes = []
+    monthly_habit.add_listener(lambda habit, event, dates: changes.append((event, len(dates))))
+    rejected = monthly_habit.mark_completed_many([datetime(2024, month, day) for month in (1, 2) for day in (1, 2, 15)])
+    assert rejected == [datetime(2024, 1, 2), datetime(2024, 2, 2)]
+    assert len(monthly_habit.completed_dates) == 4
+    assert changes == [('completed', 4)]
+
+def test_import_time_budget():
+    import subprocess
+
+    # Importing the model, the storage and the statistics must not pull in pandas or matplotlib
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import src.main, src.habit_tracker, src.statistics_1\n"
+        "print(time.perf_counter() - start)\n"
+        "print(sorted(name for name in ('pandas', 'matplotlib') if name in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], cwd=parent_dir, capture_output=True, text=True, check=True)
+    elapsed, heavy_modules = output.stdout.splitlines()
+    assert heavy_modules == '[]'
+    assert float(elapsed) < 2.0
+
+def test_habit_statistics_cache():
+    from src.habit_statistics import HabitStatistics
+
+    start_date = datetime(2024, 1, 1)
+    walk_habit = DailyHabit('Walk Daily', start_date)
+    water_habit = DailyHabit('Water Daily', start_date)
+    weekly_habit = WeeklyHabit('Hike Weekly', start_date, weekdays=[5])
+    statistics = HabitStatistics([walk_habit, water_habit, weekly_habit])
+
+    assert statistics.all_habits() == ['Walk Daily', 'Water Daily', 'Hike Weekly']
+    assert statistics.current_daily_habits() == ['Walk Daily', 'Water Daily']
+    assert statistics.habits_with_same_frequency(WeeklyHabit) == ['Hike Weekly']
+    assert statistics.daily_habits_longest_streak() == 0
+
+    walk_habit.mark_completed_many([start_date + timedelta(days=day) for day in range(4)])
+    water_habit.mark_as_completed(start_date)
+    assert statistics.daily_habits_longest_streak() == 4
+
+    # Breaking the longest run lowers the maximum to the next best habit
+    walk_habit.mark_as_incomplete(start_date + timedelta(days=1))
+    assert statistics.daily_habits_longest_streak() == 2
+
+    statistics.remove_habit(walk_habit)
+    assert statistics.daily_habits_longest_streak() == 1
+    assert statistics.all_habits() == ['Water Daily', 'Hike Weekly']
+    walk_habit.mark_as_completed(start_date + timedelta(days=1))
+    assert statistics.daily_habits_longest_streak() == 1
+
+    data_frame = statistics.dataframe()
+    assert list(data_frame['Completed Dates']) == [1, 0]
+    water_habit.mark_as_completed(start_date + timedelta(days=1))
+    assert statistics.dataframe() is data_frame
+    assert list(data_frame['Completed Dates']) == [2, 0]
+
+    # Adding and removing habits appends and drops single rows
+    monthly_habit = MonthlyHabit('Budget Monthly', start_date, target_days=[1])
+    statistics.add_habit(monthly_habit)
+    statistics.remove_habit(water_habit)
+    data_frame = statistics.dataframe()
+    assert list(data_frame['Name']) == ['Hike Weekly', 'Budget Monthly']
+    assert list(data_frame['Type'].cat.categories) == ['WeeklyHabit', 'MonthlyHabit']
+    monthly_habit.mark_as_completed(start_date)
+    assert statistics.dataframe() is data_frame
+    assert list(data_frame['Completed Dates']) == [0, 1]
+
+def test_benchmark_population_and_comparison():
+    from benchmarks.population import generate_population
+    from benchmarks.suite import compare_results
+
+    population = generate_population(daily=30, weekly=20, monthly=10, days=60, seed=3)
+    again = generate_population(daily=30, weekly=20, monthly=10, days=60, seed=3)
+    assert [habit.completed_dates == other.completed_dates for habit, other in zip(population, again)] == [True] * 60
+    assert sum(isinstance(habit, WeeklyHabit) for habit in population) == 20
+    weekly_habit = population[30]
+    assert all(day.weekday() in weekly_habit.weekdays for day in weekly_habit.completed_dates)
+
+    baseline = {'results': [{'size': 10, 'case': 'load', 'seconds': 1.0, 'peak_bytes': 100},
+                            {'size': 10, 'case': 'save', 'seconds': 1.0, 'peak_bytes': 100}]}
+    current = {'results': [{'size': 10, 'case': 'load', 'seconds': 1.1, 'peak_bytes': 100},
+                           {'size': 10, 'case': 'save', 'seconds': 1.5, 'peak_bytes': 100}]}
+    regressions = compare_results(current, baseline, threshold=0.2)
+    assert len(regressions) == 1 and 'save' in regressions[0]
+    # Noisy timings get their measured spread on top of the threshold
+    current['results'][1]['spread'] = 0.4
+    assert compare_results(current, baseline, threshold=0.2) == []
+
+    from benchmarks.suite import measure
+    calls = []
+    result = measure(lambda: calls.append(1), trace_memory=False, repeat=3, min_time=0)
+    assert len(calls) == 4 and result['runs'] == 3 and result['min_seconds'] <= result['seconds']
+
+def test_instrumentation():
+    from src import habit_tracker, instrumentation
+
+    original_save = habit_tracker.save_habits_to_json_file
+    habit = DailyHabit('Sleep Early Daily', datetime(2024, 1, 1))
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.json')
+        instrumentation.registry.reset()
+        with instrumentation.enabled() as registry:
+            habit.mark_as_completed(datetime(2024, 1, 2))
+            # Names imported into this module are instrumented as well
+            save_habits_to_json_file([habit], filename)
+            load_habits_from_json_file(filename)
+
+        metrics = registry.as_dict()
+        assert metrics['Habit.mark_as_completed']['calls'] == 1
+        assert metrics['habit_tracker.save_habits_to_json_file']['bytes_written'] == os.path.getsize(filename)
+        assert metrics['habit_tracker.load_habits_from_json_file']['objects'] == 1
+        assert 'habit_calls_total{function="Habit.mark_as_completed"} 1' in registry.to_prometheus()
+
+    # Disabling restores the original functions
+    assert habit_tracker.save_habits_to_json_file is original_save
+    assert save_habits_to_json_file is original_save
+    assert not instrumentation.is_enabled()
+
+def test_slotted_habits():
+    start_date = datetime(2024, 1, 10)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [4, 0, 4])
+    other_weekly_habit = WeeklyHabit('Read Weekly', start_date, [0, 4])
+    monthly_habit = MonthlyHabit('Skills Monthly', start_date, [15, 1])
+
+    for habit in (daily_habit, weekly_habit, monthly_habit):
+        assert not hasattr(habit, '__dict__')
+    # Schedules are interned: habits with the same days share one key
+    assert weekly_habit.weekdays == (0, 4)
+    assert weekly_habit.schedule_key()[1] is other_weekly_habit.schedule_key()[1]
+    assert monthly_habit.target_days == (1, 15)
+    # Schedules change by assignment only, and days outside their range are refused
+    try:
+        weekly_habit.weekdays.append(2)
+        assert False, 'Expected an AttributeError'
+    except AttributeError:
+        pass
+    for make in (lambda: WeeklyHabit('Bad Weekly', start_date, [9]), lambda: MonthlyHabit('Bad Monthly', start_date, [0])):
+        try:
+            make()
+            assert False, 'Expected a ValueError'
+        except ValueError:
+            pass
+
+    assert daily_habit.end_date == start_date + timedelta(days=1)
+    assert weekly_habit.end_date == start_date + timedelta(weeks=1)
+    assert monthly_habit.end_date == datetime(2024, 1, 31, 23, 59, 59)
+
+    weekly_habit.mark_as_completed(datetime(2024, 1, 12))
+    try:
+        weekly_habit.mark_as_completed(datetime(2024, 1, 13))
+        assert False, "Saturday is not a scheduled weekday"
+    except ValueError:
+        pass
+    weekly_habit.weekdays = [5]
+    weekly_habit.mark_as_completed(datetime(2024, 1, 13))
+    assert len(weekly_habit.completed_dates) == 2
+
+    # The base class can still be instantiated and checks start days like the bulk API
+    from src.Habit import Habit
+    habit = Habit('Plain', datetime(2024, 1, 10, 12))
+    assert habit.end_date == datetime(2024, 1, 11, 12)
+    habit.mark_as_completed(datetime(2024, 1, 10, 8))
+    assert habit.mark_completed_many([datetime(2024, 1, 10, 8), datetime(2024, 1, 9, 23)]) == [datetime(2024, 1, 9, 23)]
+    try:
+        habit.mark_as_completed(datetime(2024, 1, 9, 23))
+        assert False, 'Expected a ValueError'
+    except ValueError:
+        pass
+
+def test_date_index():
+    from datetime import date
+    from src.date_index import DateIndex
+    from src.statistics_1 import daily_digest
+
+    start_date = datetime(2024, 1, 1)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0])
+    monthly_habit = MonthlyHabit('Skills Monthly', start_date, [15])
+    daily_habit.mark_completed_many([datetime(2024, 1, day) for day in (1, 2, 3, 15)])
+    weekly_habit.mark_as_completed(datetime(2024, 1, 15))
+
+    index = DateIndex([daily_habit, weekly_habit])
+    index.add_habit(monthly_habit)
+    assert index.habit_id(monthly_habit) == 2
+    assert index.names_on(date(2024, 1, 15)) == ['Sleep Early Daily', 'Exercise Weekly']
+    assert index.count_between(daily_habit, date(2024, 1, 2), date(2024, 1, 15)) == 3
+    assert index.days_between(daily_habit, date(2024, 1, 2), date(2024, 1, 3)) == [date(2024, 1, 2), date(2024, 1, 3)]
+
+    # Mutations reach the index through the habit listeners
+    monthly_habit.mark_completed(datetime(2024, 1, 15))
+    daily_habit.mark_as_incomplete(datetime(2024, 1, 15))
+    daily_habit.mark_as_incomplete(datetime(2024, 1, 2))
+    assert daily_digest(index, date(2024, 1, 15)) == {'WeeklyHabit': ['Exercise Weekly'], 'MonthlyHabit': ['Skills Monthly']}
+    between = index.completions_between(date(2024, 1, 2), date(2024, 1, 20))
+    assert list(between) == [date(2024, 1, 3), date(2024, 1, 15)]
+    assert between[date(2024, 1, 3)] == [daily_habit]
+
+    daily_habit.completed_dates = {date(2024, 1, 10)}
+    index.refresh(daily_habit)
+    assert index.names_on(date(2024, 1, 10)) == ['Sleep Early Daily']
+    assert index.habits_on(date(2024, 1, 3)) == []
+
+    index.remove_habit(weekly_habit)
+    weekly_habit.mark_as_completed(datetime(2024, 1, 22))
+    assert weekly_habit not in index and len(index) == 2
+    assert index.names_on(date(2024, 1, 15)) == ['Skills Monthly']
+
+    # New days are merged between the days already indexed, and batches of
+    # completions update the index in one step
+    other_habit = DailyHabit('Read Daily', start_date)
+    other_habit.mark_completed_many([datetime(2024, 1, day) for day in (12, 1, 20)])
+    index.add_habit(other_habit)
+    other_habit.mark_completed_many([datetime(2024, 1, day) for day in (5, 15, 25, 5)])
+    for day in (1, 25, 26):
+        other_habit.mark_as_incomplete(datetime(2024, 1, day))
+    between = index.completions_between(date(2024, 1, 1), date(2024, 1, 31))
+    assert list(between) == [date(2024, 1, day) for day in (5, 10, 12, 15, 20)]
+    assert between[date(2024, 1, 15)] == [monthly_habit, other_habit]
+    assert index.days_between(other_habit, date(2024, 1, 1), date(2024, 1, 31)) == [date(2024, 1, day) for day in (5, 12, 15, 20)]
+
+def test_struggle_report():
+    from datetime import date
+    from src.statistics_1 import find_habits_strugled_last_month, last_month_range, last_weeks_range, struggle_report
+
+    # The previous month of January 2024 is December 2023, not December 2024
+    assert last_month_range(datetime(2024, 1, 20)) == (date(2023, 12, 1), date(2023, 12, 31))
+    assert last_weeks_range(2, datetime(2024, 1, 15)) == (date(2024, 1, 1), date(2024, 1, 14))
+
+    start_date = datetime(2023, 12, 1)
+    perfect_daily = DailyHabit('Sleep Early Daily', start_date)
+    perfect_daily.mark_completed_many([start_date + timedelta(days=day) for day in range(31)])
+    lazy_daily = DailyHabit('Brush Teeth Daily', start_date)
+    lazy_daily.mark_completed_many([start_date + timedelta(days=day) for day in range(20)])
+    # Mondays of December 2023: 4, 11, 18, 25
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0])
+    weekly_habit.mark_completed_many([datetime(2023, 12, 4), datetime(2023, 12, 11)])
+    # Started mid-month, so only the 15th was due
+    monthly_habit = MonthlyHabit('Skills Monthly', datetime(2023, 12, 10), [1, 15])
+    monthly_habit.mark_completed(datetime(2023, 12, 15))
+    # Completions of another year do not count
+    old_weekly = WeeklyHabit('Read Weekly', datetime(2022, 12, 1), [0])
+    old_weekly.mark_completed_many([datetime(2022, 12, day) for day in (5, 12, 19, 26)])
+    habits = [perfect_daily, lazy_daily, weekly_habit, monthly_habit, old_weekly]
+
+    report = struggle_report(habits, date(2023, 12, 1), date(2023, 12, 31))
+    assert report == [('Read Weekly', 4, 0), ('Exercise Weekly', 4, 2), ('Brush Teeth Daily', 31, 20)]
+    assert find_habits_strugled_last_month(habits, today=datetime(2024, 1, 5)) == \
+        ['Read Weekly', 'Exercise Weekly', 'Brush Teeth Daily']
+    assert struggle_report(habits, date(2023, 12, 1), date(2023, 12, 31), threshold=0.6) == [('Read Weekly', 4, 0), ('Exercise Weekly', 4, 2)]
+
+def test_columnar_dataframes():
+    from src.statistics_1 import create_dataframe_of_completions, create_dataframe_of_habit
+
+    start_date = datetime(2024, 1, 1)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    daily_habit.mark_completed_many([datetime(2024, 1, 3), datetime(2024, 1, 1)])
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0])
+    weekly_habit.broken = False
+    monthly_habit = MonthlyHabit('Skills Monthly', start_date, [15])
+    monthly_habit.mark_completed(datetime(2024, 1, 15))
+    habits = [daily_habit, weekly_habit, monthly_habit]
+
+    data_frame = create_dataframe_of_habit(habits)
+    assert str(data_frame['Name'].dtype) == 'category' and str(data_frame['Type'].dtype) == 'category'
+    assert list(data_frame['Type']) == ['DailyHabit', 'WeeklyHabit', 'MonthlyHabit']
+    assert list(data_frame['Completed Dates']) == [2, 0, 1]
+    assert list(data_frame['Broken']) == [False, True, False]
+    assert data_frame['Start Date'][0] == start_date
+    # Building the frame does not mutate the habits
+    assert weekly_habit.broken is False
+
+    completions = create_dataframe_of_completions(habits)
+    assert list(completions['Habit']) == [0, 0, 2]
+    assert list(completions['Name']) == ['Sleep Early Daily', 'Sleep Early Daily', 'Skills Monthly']
+    assert list(completions['Date'].dt.day) == [1, 3, 15]
+    assert len(create_dataframe_of_completions([])) == 0
+
+def test_report_rendering():
+    from src.report_rendering import ReportRenderer, render_user_reports
+    from src.statistics_1 import create_dataframe_of_habit
+
+    start_date = datetime(2024, 1, 1)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    daily_habit.mark_as_completed(datetime(2024, 1, 2))
+    habits = [daily_habit, WeeklyHabit('Exercise Weekly', start_date, [0])]
+    data_frame = create_dataframe_of_habit(habits)
+    daily_frame = data_frame[data_frame['Type'] == 'DailyHabit']
+    expected = daily_frame.copy()
+
+    with tempfile.TemporaryDirectory() as directory:
+        renderer = ReportRenderer(formats=('png', 'svg'))
+        paths = renderer.render(daily_frame, os.path.join(directory, 'charts'), prefix='demo_')
+        assert len(paths) == 6 and all(os.path.getsize(path) > 0 for path in paths)
+        assert os.path.basename(paths[0]) == 'demo_completed_dates.png'
+        # Rendering does not write into the caller's DataFrame
+        assert daily_frame.equals(expected)
+
+        filename = os.path.join(directory, 'alice.json')
+        save_habits_to_json_file(habits, filename)
+        # Users without daily habits or without any habit still get their charts
+        weekly_only = os.path.join(directory, 'bob.json')
+        save_habits_to_json_file(habits[1:], weekly_only)
+        empty = os.path.join(directory, 'carol.json')
+        save_habits_to_json_file([], empty)
+        users = {'alice': filename, 'bob': weekly_only, 'carol': empty,
+                 'dave': os.path.join(directory, 'missing.json')}
+        for processes in (1, 2):
+            reports, failures = render_user_reports(users, directory, processes=processes)
+            assert sorted(os.listdir(os.path.join(directory, 'alice'))) == \
+                ['broken_status.png', 'completed_dates.png', 'daily_streak_count.png']
+            assert sorted(reports) == ['alice', 'bob', 'carol'] and len(reports['carol']) == 3
+            # One failing user does not stop the batch
+            assert list(failures) == ['dave'] and failures['dave'].startswith('FileNotFoundError')
+
+def test_calendar_heatmap():
+    from src.calendar_heatmap import CalendarHeatmap, calendar_cells, calendar_mask, heatmap_counts
+    from src.report_rendering import ReportRenderer
+
+    # 2024-01-01 is a Monday in week column 0; 2023-01-01 is a Sunday in week column 0
+    years, weeks, weekdays = calendar_cells([datetime(2024, 1, 1).toordinal(), datetime(2023, 1, 2).toordinal()])
+    assert list(years) == [2024, 2023] and list(weeks) == [0, 1] and list(weekdays) == [0, 0]
+    assert calendar_mask(2023)[0].tolist() == [False] * 6 + [True]
+    assert calendar_mask(2024).sum() == 366
+
+    start_date = datetime(2023, 12, 30)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    daily_habit.mark_completed_many([start_date + timedelta(days=day) for day in range(4)])
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0])
+    weekly_habit.mark_as_completed(datetime(2024, 1, 1))
+
+    years, counts = heatmap_counts([daily_habit, weekly_habit])
+    assert list(years) == [2023, 2024]
+    assert counts[0].sum() == 2 and counts[1].sum() == 3
+    assert counts[1][0, 0] == 2
+
+    heatmap = CalendarHeatmap([daily_habit, weekly_habit])
+    tile_2023 = heatmap.year_view(2023)
+    tile_2024 = heatmap.year_view(2024)
+    # A change in 2024 only recomputes the 2024 tile
+    weekly_habit.mark_as_completed(datetime(2024, 1, 8))
+    assert heatmap.year_view(2023) is tile_2023
+    assert heatmap.year_view(2024) is not tile_2024
+    assert heatmap.year_view(2024)[1, 0] == 1
+    assert heatmap.year_views([2023, 2024]).shape == (2, 54, 7)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = ReportRenderer(formats=('svg',)).render_calendar(heatmap.year_view(2024), 2024, directory)
+        assert [os.path.basename(path) for path in paths] == ['calendar_2024.svg']
+
+def test_due_scheduler():
+    import asyncio
+    from datetime import date
+    from src.due_scheduler import DueScheduler
+
+    start_date = datetime(2024, 1, 1)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    # Mondays and Fridays; 2024-01-03 is a Wednesday
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0, 4])
+    monthly_habit = MonthlyHabit('Skills Monthly', start_date, [31])
+    never_due = WeeklyHabit('Never Weekly', start_date, [])
+    daily_habit.mark_as_completed(datetime(2024, 1, 3))
+
+    scheduler = DueScheduler([daily_habit, weekly_habit, monthly_habit, never_due], today=datetime(2024, 1, 3))
+    assert scheduler.next_due(daily_habit) == date(2024, 1, 4)
+    assert scheduler.next_due(weekly_habit) == date(2024, 1, 5)
+    assert scheduler.next_due(monthly_habit) == date(2024, 1, 31)
+    assert scheduler.next_due(never_due) is None
+    assert scheduler.peek() == (daily_habit, date(2024, 1, 4))
+
+    # Completing a habit on its due day reschedules it
+    daily_habit.mark_as_completed(datetime(2024, 1, 4))
+    assert scheduler.next_due(daily_habit) == date(2024, 1, 5)
+    daily_habit.mark_as_incomplete(datetime(2024, 1, 4))
+    assert scheduler.next_due(daily_habit) == date(2024, 1, 4)
+
+    assert scheduler.pop_due_until(datetime(2024, 1, 4)) == [(daily_habit, date(2024, 1, 4))]
+    assert set(scheduler.pop_due_until(datetime(2024, 1, 5))) == {(daily_habit, date(2024, 1, 5)), (weekly_habit, date(2024, 1, 5))}
+    assert scheduler.next_due(weekly_habit) == date(2024, 1, 8)
+    # February has no 31st
+    scheduler.pop_due_until(datetime(2024, 1, 31))
+    assert scheduler.next_due(monthly_habit) == date(2024, 3, 31)
+
+    scheduler.remove_habit(daily_habit)
+    assert daily_habit not in scheduler and scheduler.peek() == (weekly_habit, date(2024, 2, 2))
+
+    reminders = []
+
+    async def remind(habit, due):
+        reminders.append((habit.name, due))
+
+    async def run_one_day():
+        task = asyncio.ensure_future(scheduler.run(remind, clock=lambda: datetime(2024, 2, 2, 8), interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run_one_day())
+    assert reminders == [('Exercise Weekly', date(2024, 2, 2))]
+
+def test_run_intervals():
+    from datetime import date
+    from src.RunIntervals import RunIntervals
+
+    runs = RunIntervals()
+    for ordinal in (5, 1, 3, 2, 7):
+        runs.add(ordinal)
+    assert runs.runs() == [(1, 3), (5, 5), (7, 7)] and runs.longest() == 3
+    runs.add(6)
+    assert runs.runs() == [(1, 3), (5, 7)]
+    runs.discard(2)
+    assert runs.runs() == [(1, 1), (3, 3), (5, 7)] and runs.longest() == 3
+    runs.discard(6)
+    assert runs.longest() == 1 and len(runs) == 4
+    assert runs.current(8) == 1 and runs.current(9) == 0
+
+    daily_habit = DailyHabit('Read Daily', datetime(2024, 1, 1))
+    # Backfilled days merge into the runs around them
+    for day in (4, 5, 1, 2):
+        daily_habit.mark_completed(date(2024, 1, day))
+    assert daily_habit.get_streak_count() == 2 and daily_habit.longest_streak() == 2
+    daily_habit.mark_completed(datetime(2024, 1, 3))
+    assert daily_habit.get_streak_count() == 5 and daily_habit.end_date == datetime(2024, 1, 5)
+    assert date(2024, 1, 3) in daily_habit.completed_dates
+    assert daily_habit.current_streak(datetime(2024, 1, 6)) == 5
+
+    daily_habit.mark_as_incomplete(datetime(2024, 1, 3))
+    assert daily_habit.streak_history() == [(date(2024, 1, 1), date(2024, 1, 2)), (date(2024, 1, 4), date(2024, 1, 5))]
+    daily_habit.mark_completed_many([datetime(2024, 1, day) for day in range(3, 11)])
+    assert daily_habit.get_streak_count() == 10 and daily_habit.longest_streak() == 10
+
+    # Changes made directly to the completion dates are picked up as well
+    daily_habit.completed_dates.add(date(2024, 1, 12))
+    daily_habit.completed_dates.discard(date(2024, 1, 2))
+    assert daily_habit.longest_streak() == 8
+    daily_habit.mark_completed(date(2024, 1, 11))
+    assert daily_habit.get_streak_count() == 10 and daily_habit.longest_streak() == 10
+
+    try:
+        daily_habit.mark_completed(datetime(2023, 12, 31))
+        assert False, 'Expected a ValueError'
+    except ValueError:
+        pass
+
+def test_habit_service():
+    import asyncio
+    import json
+    from src.habit_service import HabitService
+
+    start_date = datetime(2024, 1, 1)
+    habits = [DailyHabit('Sleep Early Daily', start_date), WeeklyHabit('Exercise Weekly', start_date, [0])]
+
+    async def session(filename):
+        service = HabitService(filename, flush_interval=60)
+        service.load()
+        host, port = await service.start()
+        clients = [await asyncio.open_connection(host, port) for _ in range(20)]
+
+        async def call(client, **request):
+            reader, writer = client
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            return json.loads(await reader.readline())
+
+        # Concurrent clients completing different days
+        responses = await asyncio.gather(*(
+            call(client, op='complete', name='Sleep Early Daily', date='2024-01-{:02d}'.format(day + 1), id=day)
+            for day, client in enumerate(clients[:5])
+        ))
+        assert [response['id'] for response in responses] == list(range(5)) and all(r['ok'] for r in responses)
+        assert await call(clients[5], op='streak', name='Sleep Early Daily', today='2024-01-06') == {
+            'current': 5, 'longest': 5, 'ok': True}
+        assert (await call(clients[6], op='complete', name='Exercise Weekly', date='2024-01-02'))['ok'] is False
+        assert (await call(clients[6], op='complete', name='Missing'))['error'] == "No habit named 'Missing'."
+        assert (await call(clients[7], op='stats'))['weekly'] == ['Exercise Weekly']
+
+        # Nothing is written until the write-behind cycle runs
+        with open(filename) as file:
+            assert json.load(file)[0]['completed_dates'] == []
+        assert await call(clients[8], op='flush') == {'ok': True, 'written': True}
+        assert await call(clients[8], op='flush') == {'ok': True, 'written': False}
+        await call(clients[9], op='incomplete', name='Sleep Early Daily', date='2024-01-05')
+
+        for _, writer in clients:
+            writer.close()
+        await service.stop()
+        return service.writes
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.json')
+        save_habits_to_json_file(habits, filename)
+        assert asyncio.run(session(filename)) == 2
+        loaded = load_habits_from_json_file(filename)
+        assert len(loaded[0].completed_dates) == 4 and loaded[0].streak_counter == 4
+
+        # A failed write-behind cycle keeps the changes and the next cycle retries them
+        async def failing_session():
+            service = HabitService(filename, flush_interval=0.01)
+            service.load()
+            service.filename = os.path.join(directory, 'missing', 'habits.json')
+            host, port = await service.start()
+            service.handle({'op': 'complete', 'name': 'Sleep Early Daily', 'date': '2024-01-06'})
+            await asyncio.sleep(0.05)
+            assert service.writes == 0 and not service._flusher.done()
+            # A failing flush request is answered, and the connection stays usable
+            reader, writer = await asyncio.open_connection(host, port)
+            for _ in range(2):
+                writer.write(b'{"op": "flush"}\n')
+                response = json.loads(await reader.readline())
+                assert response['ok'] is False and 'No such file' in response['error']
+            writer.close()
+            service.filename = filename
+            await asyncio.sleep(0.05)
+            await service.stop()
+            return service.writes
+
+        assert asyncio.run(failing_session()) == 1
+        assert len(load_habits_from_json_file(filename)[0].completed_dates) == 5
+
+        # Requests address habits by name, so duplicate names are refused
+        save_habits_to_json_file(habits + [DailyHabit('Sleep Early Daily', start_date)], filename)
+        try:
+            HabitService(filename).load()
+            assert False, 'Expected a ValueError'
+        except ValueError:
+            pass
+
+def test_atomic_saves():
+    import json
+    from src.coalescing_writer import CoalescingWriter
+    from src.habit_tracker import VersionConflictError, load_habits_with_version, save_records_to_json_file
+
+    daily_habit = DailyHabit('Sleep Early Daily', datetime(2024, 1, 1))
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'habits.json')
+        version = save_habits_to_json_file([daily_habit], filename)
+        # A failed save leaves the previous file and no temporary file behind
+        try:
+            save_records_to_json_file([{'name': object()}], filename)
+            assert False, 'Expected a TypeError'
+        except TypeError:
+            pass
+        assert [habit.name for habit in load_habits_from_json_file(filename)] == ['Sleep Early Daily']
+        assert os.listdir(directory) == ['habits.json']
+
+        # Optimistic version checks
+        habits, loaded_version = load_habits_with_version(filename)
+        assert loaded_version == version
+        other_version = save_habits_to_json_file(habits, filename, expected_version=loaded_version)
+        try:
+            save_habits_to_json_file(habits, filename, expected_version=loaded_version)
+            assert False, 'Expected a VersionConflictError'
+        except VersionConflictError:
+            pass
+
+        # Bursts of saves are merged into few writes of the latest state
+        with CoalescingWriter(filename, delay=0.05, version=other_version) as writer:
+            for day in range(1, 31):
+                daily_habit.mark_as_completed(datetime(2024, 1, day))
+                writer.save([daily_habit])
+            writer.flush()
+            assert writer.writes <= 2
+            with open(filename) as file:
+                assert len(json.load(file)[0]['completed_dates']) == 30
+
+            save_habits_to_json_file([daily_habit], filename)
+            writer.save([daily_habit])
+            try:
+                writer.flush()
+                assert False, 'Expected a VersionConflictError'
+            except VersionConflictError:
+                pass
+
+        # After a failed write nothing more is written, and close() reports the failure
+        import time
+        missing = os.path.join(directory, 'missing', 'habits.json')
+        writer = CoalescingWriter(missing)
+        writer.save([daily_habit])
+        while not writer._errors:
+            time.sleep(0.01)
+        writer.save([])
+        os.mkdir(os.path.dirname(missing))
+        try:
+            writer.close()
+            assert False, 'Expected a FileNotFoundError'
+        except FileNotFoundError:
+            pass
+        assert not os.path.exists(missing) and writer.writes == 0
+        os.rmdir(os.path.dirname(missing))
+
+        # Writers that are never closed write their pending saves at exit
+        import subprocess
+        import sys
+        script = ('from datetime import datetime; from src.DailyHabit import DailyHabit; '
+                  'from src.coalescing_writer import CoalescingWriter; '
+                  'CoalescingWriter({!r}, delay=0.5).save([DailyHabit("Exit", datetime(2024, 1, 1))])').format(filename)
+        subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert [habit.name for habit in load_habits_from_json_file(filename)] == ['Exit']
+
+        # Writers wait for the lock on the directory, and no lock file is left behind
+        import threading
+        from src.habit_tracker import locked
+        saved = threading.Event()
+        with locked(filename):
+            writer_thread = threading.Thread(target=lambda: (save_habits_to_json_file([daily_habit], filename), saved.set()))
+            writer_thread.start()
+            assert not saved.wait(0.1)
+        writer_thread.join()
+        assert saved.is_set() and os.listdir(directory) == ['habits.json']
+
+def test_segment_directory():
+    from src.habit_tracker import load_habits_with_version, segment_filename
+
+    start_date = datetime(2024, 1, 1)
+    habits = [DailyHabit('Sleep Early Daily', start_date), WeeklyHabit('Exercise / Gym', start_date, [0]),
+              MonthlyHabit('Skills Monthly', start_date, [1])]
+    assert all(habit.dirty for habit in habits)
+    with tempfile.TemporaryDirectory() as directory:
+        save_habits_to_json_file(habits, os.path.join(directory, 'habits.json'))
+        loaded = load_habits_from_json_file(os.path.join(directory, 'habits.json'))
+        assert not any(habit.dirty for habit in loaded)
+
+        segments = os.path.join(directory, 'segments')
+        os.mkdir(segments)
+        # Habits without a segment are written even when clean
+        save_habits_to_json_file(loaded, segments)
+        assert len(os.listdir(segments)) == 3
+
+        modified = os.stat(segment_filename(segments, 'Sleep Early Daily')).st_mtime_ns
+        loaded[0].mark_completed(datetime(2024, 1, 2))
+        assert loaded[0].dirty and not loaded[1].dirty
+        os.utime(segment_filename(segments, 'Exercise / Gym'), ns=(0, 0))
+        save_habits_to_json_file(loaded, segments)
+        assert not loaded[0].dirty
+        assert os.stat(segment_filename(segments, 'Sleep Early Daily')).st_mtime_ns >= modified
+        # Clean habits are not rewritten
+        assert os.stat(segment_filename(segments, 'Exercise / Gym')).st_mtime_ns == 0
+
+        # Habits left out of a save are removed
+        save_habits_to_json_file(loaded[:2], segments)
+        reloaded, version = load_habits_with_version(segments)
+        assert sorted(habit.name for habit in reloaded) == ['Exercise / Gym', 'Sleep Early Daily']
+        assert [habit.name for habit in reloaded] == ['Sleep Early Daily', 'Exercise / Gym']
+        assert reloaded[0].streak_counter == 1 and len(reloaded[0].completed_dates) == 1
+        save_habits_to_json_file(reloaded, segments, expected_version=version)
+
+        # Save order and habits with the same name are kept
+        duplicate = DailyHabit('Exercise / Gym', start_date)
+        save_habits_to_json_file([duplicate] + reloaded, segments)
+        reloaded = load_habits_from_json_file(segments)
+        assert [type(habit) for habit in reloaded] == [DailyHabit, DailyHabit, WeeklyHabit]
+        assert [habit.name for habit in reloaded] == ['Exercise / Gym', 'Sleep Early Daily', 'Exercise / Gym']
+
+        # Clean habits loaded from elsewhere replace the stale segments
+        fresh = load_habits_from_json_file(os.path.join(directory, 'habits.json'))
+        assert not fresh[0].dirty
+        save_habits_to_json_file(fresh[:1], segments)
+        assert len(load_habits_from_json_file(segments)[0].completed_dates) == 0
+
+def test_sharded_store():
+    from datetime import date
+    from src.sharded_store import ShardedStore, shard_of
+
+    start_date = datetime(2024, 1, 1)
+    users = {}
+    for user in range(10):
+        daily_habit = DailyHabit('Sleep Early Daily', start_date)
+        daily_habit.mark_completed_many([start_date + timedelta(days=day) for day in range(user + 1)])
+        users['user{}'.format(user)] = [daily_habit, WeeklyHabit('Exercise Weekly', start_date, [0])]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ShardedStore(os.path.join(directory, 'store'), shards=4, processes=1)
+        store.save_users(users)
+        assert ShardedStore(store.directory, shards=8).shards == 4
+        assert store.users() == sorted(users)
+        assert [habit.name for habit in store.load_user('user3')] == ['Sleep Early Daily', 'Exercise Weekly']
+        assert shard_of('user3', 4) == shard_of('user3', 4)
+
+        # Every shard has its own lock, so a writer holding one does not block the others
+        from src.habit_tracker import locked
+        other_user = next(user for user in users if shard_of(user, 4) != shard_of('user9', 4))
+        with locked(store.shard_filename(shard_of(other_user, 4))):
+            store.save_user('user9', users['user9'])
+
+        # Replacing one user leaves the others of the shard untouched
+        store.save_user('user9', users['user9'][:1])
+        assert len(store.load_user('user9')) == 1
+        assert len(store.load_all()) == 10
+
+        assert store.longest_streak() == 10
+        assert store.type_counts() == {'DailyHabit': 10, 'WeeklyHabit': 9}
+        report = store.struggle_report(date(2024, 1, 1), date(2024, 1, 10))
+        # Weekly habits were never completed; daily habits of user0 completed 1 of 10 days
+        assert {row[1:] for row in report[:9]} == {('Exercise Weekly', 2, 0)}
+        assert report[9] == ('user0', 'Sleep Early Daily', 10, 1) and len(report) == 18
+
+        parallel = ShardedStore(store.directory, processes=2)
+        assert parallel.type_counts() == store.type_counts()
+        assert parallel.struggle_report(date(2024, 1, 1), date(2024, 1, 10)) == report
+
+def test_compact_completions():
+    import json
+    import numpy as np
+    from src.completion_codec import decode_completions, decode_varints, encode_completions, encode_varints
+    from src.habit_tracker import iter_habits_from_json_file, save_habits_to_ndjson_file
+
+    values = np.array([0, 1, 127, 128, 300, 1 << 40])
+    assert encode_varints(values).tobytes()[:5] == bytes([0, 1, 127, 0x80, 1])
+    assert decode_varints(encode_varints(values).tobytes()).tolist() == values.tolist()
+
+    start_date = datetime(2024, 1, 10)
+    daily_habit = DailyHabit('Sleep Early Daily', start_date)
+    daily_habit.completed_dates = {(start_date + timedelta(days=day)).date() for day in (-3, 0, 1, 2, 5, 400)}
+    weekly_habit = WeeklyHabit('Exercise Weekly', start_date, [0])
+    encoded = encode_completions([daily_habit, weekly_habit])
+    assert encoded[1] == ''
+    assert decode_completions(encoded[0], start_date).ordinals() == daily_habit.completed_dates.ordinals()
+    assert len(decode_completions(encoded[1], start_date)) == 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ('habits.json', 'habits.json.gz', 'habits.json.xz'):
+            filename = os.path.join(directory, name)
+            save_habits_to_json_file([daily_habit, weekly_habit], filename, compact=True)
+            loaded = load_habits_from_json_file(filename)
+            assert loaded[0].completed_dates == daily_habit.completed_dates
+            assert loaded[1].weekdays == (0,) and not loaded[1].completed_dates
+
+        with open(os.path.join(directory, 'habits.json')) as file:
+            assert 'completed_dates' not in json.load(file)[0]
+        filename = os.path.join(directory, 'habits.ndjson.gz')
+        save_habits_to_ndjson_file([daily_habit, weekly_habit], filename, compact=True)
+        assert [habit.completed_dates for habit in iter_habits_from_json_file(filename)] == [
+            daily_habit.completed_dates, weekly_habit.completed_dates]